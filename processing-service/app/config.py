@@ -1,4 +1,6 @@
 import os
+import importlib.util
+from pydantic import field_validator
 from pydantic_settings import BaseSettings
 from typing import List
 
@@ -11,20 +13,109 @@ class Settings(BaseSettings):
     gemini_api_key: str
     gemini_model: str = "gemini-3-pro-preview"
 
+    # Model Routing Configuration
+    gemini_fast_model: str = ""  # Faster tier for small batches (e.g. "gemini-2.5-flash"); empty disables tiering
+    gemini_fallback_model: str = ""  # Serves calls while a model is degraded; empty disables fallback
+    fast_model_max_chars: int = 60000  # Prompts up to this many characters go to the fast tier
+    fallback_after_failures: int = 2  # Consecutive timeouts/overload errors that mark a model degraded
+    fallback_cooldown_seconds: float = 300.0  # How long a degraded model is skipped
+    fallback_latency_p95: float = 0.0  # Also degrade a model whose rolling p95 latency exceeds this (0 disables)
+
+    # Backend Configuration
+    backend: str = "gcp"  # "memory" swaps Firestore, GCS and Gemini for the fakes in testing/ (source tree only)
+    fake_gemini_latency: float = 2.0  # Seconds per fake Gemini call (memory backend)
+    fake_gemini_profile: str = "none"  # Failure profile from testing.fakes.FAILURE_PROFILES (memory backend)
+
     # Processing Configuration
-    max_retry_attempts: int = 3
-    retry_delays: List[int] = [0, 30, 60]  # Exponential backoff in seconds
-    job_ttl: int = 86400  # Job TTL in seconds (24 hours)
+    max_retry_attempts: int = 3  # Job-level attempts (Cloud Tasks redeliveries or local re-runs)
+    retry_delays: List[int] = [0, 30, 60]  # Seconds before each local job attempt (Cloud Tasks uses its queue config)
+    gemini_max_attempts: int = 3  # Attempts per Gemini batch, for retryable errors only
+    gemini_retry_base_delay: float = 2.0  # Backoff ceiling for the first retry; doubles per attempt (full jitter)
+    gemini_retry_max_delay: float = 60.0  # Cap on one backoff, including server retry-after hints
+    job_deadline_seconds: int = 1500  # Retry budget for a Cloud Tasks delivery (below its 30 min dispatch deadline); local runs have none
+    job_ttl: int = 86400  # Finished jobs older than this are rolled into daily summaries and deleted (24 hours)
+    pdf_backend: str = "auto"  # "pypdf", "pdfium", "mupdf", or "auto" to calibrate and pick the fastest installed one
+    extraction_calibration_pages: int = 5  # Sample pages timed per backend during calibration
+    extraction_calibration_ttl: int = 3600  # Seconds a calibration is reused before the next document recalibrates
+    page_extract_timeout: float = 20.0  # Per-page extraction budget, enforced in killable worker processes; 0 extracts in-process without one
+    preprocess_enabled: bool = True  # Strip repeated headers/footers, TOC and near-empty pages before Gemini
+    preprocess_repeat_ratio: float = 0.3  # Share of pages a header/footer line must repeat on to be stripped
+    preprocess_min_page_chars: int = 40  # Pages with fewer characters left are dropped
+    dedup_enabled: bool = True  # Drop near-duplicate questions across batches before saving
+    dedup_threshold: float = 0.8  # Word-shingle Jaccard similarity at which two questions count as duplicates
+    cancel_poll_interval: float = 2.0  # Seconds between Firestore checks for cross-instance cancellation
+
+    # Gemini Concurrency Limiter Configuration
+    gemini_limiter_enabled: bool = True  # Share one AIMD concurrency limit across all jobs on the instance
+    gemini_concurrency_initial: int = 4  # Starting limit on in-flight Gemini calls
+    gemini_concurrency_min: int = 1
+    gemini_concurrency_max: int = 32  # Matches the Gemini worker thread pool
+    gemini_concurrency_backoff: float = 0.5  # Multiplicative decrease on 429s, overload and timeouts
+    gemini_latency_tolerance: float = 2.0  # Successes slower than this multiple of the latency baseline count as congestion
+
+    # Hedged Request Configuration
+    gemini_hedging_enabled: bool = False  # Send a duplicate request when a Gemini call runs unusually long
+    gemini_hedge_percentile: float = 95.0  # Hedge after this percentile of recent call latencies
+    gemini_hedge_max_fraction: float = 0.05  # Hedges allowed as a fraction of Gemini calls
+    gemini_hedge_min_samples: int = 20  # Recent latencies required before hedging starts
+
+    # Generation Cache Configuration
+    generation_cache_enabled: bool = True  # Reuse parsed questions for identical (model, prompts, batch text)
+    generation_cache_ttl: int = 604800  # Entry TTL in seconds (7 days)
+    generation_cache_max_bytes: int = 64 * 1024 * 1024  # Local in-process tier size bound
+    generation_cache_remote: bool = True  # Shared GCS tier under generation-cache/
+
+    # Job Status Cache Configuration
+    job_cache_ttl: float = 2.0  # Seconds a job read by the status endpoints is reused (0 disables)
+    job_cache_max_entries: int = 10000
+    job_status_max_ids: int = 100  # Job IDs accepted by one GET /jobs?ids= request
+
+    # Batch Submission Configuration
+    max_batch_documents: int = 100  # Documents accepted by one POST /jobs/process-batch (Firestore allows 500 writes per commit)
+    group_job_concurrency: int = 4  # Jobs of one group run at once when executed locally
+
+    # Question Bank Configuration
+    question_bank_enabled: bool = True  # Also save results as a few packed shard documents for fast exam loading
+    question_bank_shard_bytes: int = 512 * 1024  # JSON bytes per shard (Firestore caps documents at 1 MiB)
+
+    # Job Lifecycle Configuration
+    compaction_enabled: bool = True  # Periodically compact finished jobs older than job_ttl on each instance
+    compaction_interval: int = 3600  # Seconds between compaction runs (jittered per instance)
+    compaction_batch_size: int = 200  # Jobs per compaction transaction (Firestore allows 500 writes per commit)
+    compaction_max_batches: int = 50  # Transactions per run, so one run stays short
+    job_ttl_grace: int = 604800  # Firestore TTL deletes job records this long after job_ttl if never compacted (7 days)
+
+    # Document Preparation Configuration
+    page_index_enabled: bool = True  # Jobs read a prepared document's page index instead of downloading and extracting the PDF
 
     # File Configuration
     uploads_dir: str = "/uploads"  # Default for Docker, override for local
     gcs_bucket_name: str = "superexam-uploads"  # GCS Bucket for file storage
 
+    # Profiling Configuration
+    profiles_dir: str = ""  # Local directory for job profiles; empty uploads to GCS under profiles/
+    profile_interval: float = 0.001  # Sampling interval in seconds
+
+    # Record/Replay Configuration
+    record_gemini: bool = False  # Save every job's Gemini batches as a replayable cassette
+    cassette_dir: str = ""  # Local directory for cassettes; empty uploads to GCS under cassettes/
+
     # Server Configuration
     port: int = 8000
     host: str = "0.0.0.0"
     debug: bool = False
 
+    @field_validator("backend")
+    @classmethod
+    def _memory_backend_needs_source_tree(cls, backend: str) -> str:
+        # The fakes live in testing/, which the Dockerfile does not copy into the image
+        if backend == "memory" and importlib.util.find_spec("testing") is None:
+            raise ValueError(
+                "BACKEND=memory uses the test doubles in testing/, which only exist in the source tree "
+                "(they are not shipped in the service image); run from processing-service/ or use BACKEND=gcp"
+            )
+        return backend
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
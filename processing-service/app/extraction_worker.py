@@ -0,0 +1,167 @@
+"""
+Page text extraction backends, run in this process or in a child process.
+
+Kept outside app.services on purpose: importing app.services pulls in
+Firestore, GCS and Gemini clients, and a worker process (started as
+`python -m app.extraction_worker`) should only need a PDF library.
+PDFService drives the extraction; see PDFService.extract_text for the
+time budget, backend selection and recovery logic.
+"""
+import io
+import re
+import sys
+import time
+import pickle
+import importlib.util
+from multiprocessing.connection import Connection
+from pypdf import PdfReader
+
+# PDF literal strings shown with Tj / ' / " and string arrays shown with TJ
+_SHOW_TEXT = re.compile(rb"\((?:\\.|[^\\)])*\)\s*(?:Tj|'|\")|\[(?:\\.|[^\]])*\]\s*TJ", re.DOTALL)
+_LITERAL = re.compile(rb"\((?:\\.|[^\\)])*\)", re.DOTALL)
+_ESCAPES = {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"\b", b"f": b"\f"}
+_LINE_BREAKS = re.compile(rb"T\*|\bTd\b|\bTD\b|\bET\b")
+
+
+def _unescape(literal: bytes) -> bytes:
+    body = literal[1:-1]
+    return re.sub(rb"\\(\d{1,3}|.)", lambda m: (
+        bytes([int(m.group(1), 8) & 0xFF]) if m.group(1).isdigit() else _ESCAPES.get(m.group(1), m.group(1))
+    ), body, flags=re.DOTALL)
+
+
+def fast_extract(page) -> str:
+    """
+    Cheap fallback: pull literal strings straight out of a pypdf page's content stream.
+
+    Skips pypdf's font decoding and layout work, so it stays fast on
+    vector-heavy pages. Text in CID/Type0 fonts comes out garbled or empty;
+    this mode exists to salvage pages the full extractor cannot finish.
+    """
+    contents = page.get_contents()
+    if contents is None:
+        return ""
+    data = contents.get_data()
+    parts = []
+    for match in _SHOW_TEXT.finditer(data):
+        for literal in _LITERAL.findall(match.group(0)):
+            parts.append(_unescape(literal))
+        # A text move after the string usually means a new line
+        tail = data[match.end():match.end() + 12]
+        parts.append(b"\n" if _LINE_BREAKS.search(tail) else b"")
+    return b"".join(parts).decode("latin-1").strip()
+
+
+class PypdfDocument:
+    """Pure-Python pypdf backend (always available, the default)"""
+
+    def __init__(self, pdf_buffer: bytes):
+        self.reader = PdfReader(io.BytesIO(pdf_buffer))
+
+    def __len__(self) -> int:
+        return len(self.reader.pages)
+
+    def extract(self, index: int, mode: str = "full") -> str:
+        page = self.reader.pages[index]
+        return fast_extract(page) if mode == "fast" else page.extract_text()
+
+
+class PdfiumDocument:
+    """PDFium backend via pypdfium2 (optional, native)"""
+
+    def __init__(self, pdf_buffer: bytes):
+        import pypdfium2
+        self.pdf = pypdfium2.PdfDocument(pdf_buffer)
+
+    def __len__(self) -> int:
+        return len(self.pdf)
+
+    def extract(self, index: int, mode: str = "full") -> str:
+        page = self.pdf[index]
+        textpage = page.get_textpage()
+        try:
+            return textpage.get_text_range().replace("\r\n", "\n")
+        finally:
+            textpage.close()
+            page.close()
+
+
+class MupdfDocument:
+    """MuPDF backend via PyMuPDF (optional, native)"""
+
+    def __init__(self, pdf_buffer: bytes):
+        import pymupdf
+        self.doc = pymupdf.open(stream=pdf_buffer, filetype="pdf")
+
+    def __len__(self) -> int:
+        return len(self.doc)
+
+    def extract(self, index: int, mode: str = "full") -> str:
+        return self.doc[index].get_text()
+
+
+# Backend name -> (document class, module that must be installed)
+BACKENDS = {
+    "pypdf": (PypdfDocument, "pypdf"),
+    "pdfium": (PdfiumDocument, "pypdfium2"),
+    "mupdf": (MupdfDocument, "pymupdf"),
+}
+
+
+def available_backends() -> list[str]:
+    """Installed backends, native ones first and pypdf last"""
+    installed = [name for name, (_, module) in BACKENDS.items() if importlib.util.find_spec(module)]
+    return sorted(installed, key=lambda name: name == "pypdf")
+
+
+def open_document(backend: str, pdf_buffer: bytes):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown PDF backend '{backend}'. Options: {', '.join(BACKENDS)}")
+    return BACKENDS[backend][0](pdf_buffer)
+
+
+def extract_pages(
+    pdf_buffer: bytes,
+    indexes: list[int],
+    mode: str,
+    backend: str,
+    conn,
+):
+    """
+    Extract the given page indexes and stream each result to the caller.
+
+    Sends ("open",) once the document is open, so the caller's per-page
+    clock does not include startup; then ("page", index, text_or_None,
+    seconds) per page, where None means the page raised; then ("done",).
+    If the document cannot be opened, sends ("error", message) instead.
+    Fast mode always uses pypdf's content-stream scan. The worker process
+    is killed if one page runs past its budget.
+    """
+    try:
+        document = open_document("pypdf" if mode == "fast" else backend, pdf_buffer)
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+        conn.close()
+        return
+    conn.send(("open",))
+
+    for index in indexes:
+        page_start = time.perf_counter()
+        try:
+            text = document.extract(index, mode)
+        except Exception:
+            text = None
+        conn.send(("page", index, text, time.perf_counter() - page_start))
+    conn.send(("done",))
+    conn.close()
+
+
+def main():
+    """Worker process entry point: the request is pickled on stdin, results go to the fd in argv"""
+    conn = Connection(int(sys.argv[1]), readable=False)
+    pdf_buffer, indexes, mode, backend = pickle.load(sys.stdin.buffer)
+    extract_pages(pdf_buffer, indexes, mode, backend, conn)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,35 @@
+import asyncio
 import logging
 import uuid
 import time
+from contextlib import asynccontextmanager
+from typing import Optional
 from fastapi import FastAPI, HTTPException, Request, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.models import ProcessJobRequest, ProcessJobResponse, JobStatusResponse
+from app.models import (
+    ProcessJobRequest,
+    ProcessJobResponse,
+    JobStatusResponse,
+    JobStatusListResponse,
+    JobGroupStatusResponse,
+    JobOptions,
+    ProcessBatchRequest,
+    ProcessBatchResponse,
+    StatsResponse,
+    JobStatus,
+    ACTIVE_JOB_STATUSES,
+)
 from app.services import firestore_service
+from app.services.metrics import summarize_jobs, JOBS_COALESCED, STATUS_NOT_MODIFIED
+from app.services.job_cache import job_cache, etag_for, etag_matches
+from app.services.job_keys import request_key
+from app.services.lifecycle import cancel_updates
+from app.services.profiling import PROFILE_HEADER
+from app.services.cancellation import request_cancel
+from app.services.compactor import JobCompactor, job_compactor
 from app.config import settings
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 
 # Configure logging
 logging.basicConfig(
@@ -15,11 +38,25 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Periodic job compaction on every instance (see JobCompactor)
+    compaction = (
+        asyncio.create_task(job_compactor.run_periodically(settings.compaction_interval))
+        if job_compactor else None
+    )
+    yield
+    if compaction:
+        compaction.cancel()
+
+
 # Create FastAPI app
 app = FastAPI(
     title="SuperExam Processing Service",
     description="Background service for exam question generation from PDFs",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS middleware (configure for production)
@@ -48,50 +85,140 @@ def health_check(request: Request):
     return {"status": "healthy"}
 
 
+@app.get("/metrics")
+def metrics(request: Request):
+    """Prometheus metrics endpoint (stage latencies, retries, truncations)"""
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+def _check_process_rate_limits(client_ip: str):
+    """Check multiple rate limit windows for processing submissions"""
+    if not firestore_service.check_rate_limit(f"rate_limit:process:minute:{client_ip}", limit=1, window_seconds=60):
+        raise HTTPException(status_code=429, detail="Rate limit exceeded: 1 request per minute. Try again later.")
+
+    if not firestore_service.check_rate_limit(f"rate_limit:process:hour:{client_ip}", limit=10, window_seconds=3600):
+        raise HTTPException(status_code=429, detail="Rate limit exceeded: 10 requests per hour. Try again later.")
+
+    if not firestore_service.check_rate_limit(f"rate_limit:process:day:{client_ip}", limit=23, window_seconds=86400):
+        raise HTTPException(status_code=429, detail="Rate limit exceeded: 23 requests per day. Try again later.")
+
+
+def _load_prompts(options: JobOptions) -> tuple[str, str]:
+    system_prompt = firestore_service.get_prompt("system-prompts", options.system_prompt_id)
+    custom_prompt = firestore_service.get_prompt("custom-prompts", options.custom_prompt_id)
+    if not system_prompt or not custom_prompt:
+        raise HTTPException(status_code=404, detail="Prompts not found")
+    return system_prompt, custom_prompt
+
+
+def _request_key(doc_id: str, options: JobOptions, system_prompt: str, custom_prompt: str) -> str:
+    return request_key(
+        doc_id,
+        options.system_prompt_id,
+        options.custom_prompt_id,
+        system_prompt,
+        custom_prompt,
+        options.target_questions,
+        options.sampling.value,
+        options.progressive,
+    )
+
+
+def _new_job_data(job_id: str, doc_id: str, options: JobOptions, **extra) -> dict:
+    return {
+        "job_id": job_id,
+        "doc_id": doc_id,
+        "system_prompt_id": options.system_prompt_id,
+        "custom_prompt_id": options.custom_prompt_id,
+        "schema": options.schema,
+        "profile": options.profile,
+        "target_questions": options.target_questions,
+        "sampling_strategy": options.sampling.value,
+        "progressive": options.progressive,
+        "status": "pending",
+        "attempt": 0,
+        "max_attempts": settings.max_retry_attempts,
+        "created_at": int(time.time()),
+        **extra,
+    }
+
+
+@app.post("/documents/{doc_id}/prepare", status_code=202)
+def prepare_document(request: Request, doc_id: str, background_tasks: BackgroundTasks, force: bool = False):
+    """
+    Download and extract a document's PDF ahead of processing
+
+    Meant to be called right after upload. The extracted text and a page
+    index (per-page offsets, token estimates, blank and boilerplate flags)
+    are stored next to the PDF, and later jobs load them instead of
+    downloading and extracting the PDF. Prepared documents are skipped
+    unless force is set.
+
+    Rate limit: 10 requests per minute
+    """
+    client_ip = request.client.host if request.client else "unknown"
+    if not firestore_service.check_rate_limit(f"rate_limit:prepare:{client_ip}", limit=10, window_seconds=60):
+        raise HTTPException(status_code=429, detail="Rate limit exceeded. Try again later.")
+
+    doc = firestore_service.get_document(doc_id)
+    if not doc:
+        raise HTTPException(status_code=404, detail="Document not found")
+    if not doc.get("filePath"):
+        raise HTTPException(status_code=400, detail="File path missing for this document")
+    if doc.get("pageIndex") and not force:
+        return {"doc_id": doc_id, "message": "Document already prepared", "page_index": doc["pageIndex"]}
+
+    from app.services.processor import run_prepare_locally
+    background_tasks.add_task(run_prepare_locally, doc_id)
+    return {"doc_id": doc_id, "message": "Preparation started"}
+
+
 @app.post("/jobs/process", response_model=ProcessJobResponse)
 def create_process_job(request: Request, job_request: ProcessJobRequest, background_tasks: BackgroundTasks):
     """
     Create a new document processing job
 
+    Identical requests (same document, prompt IDs, prompt contents and
+    options) are coalesced: while a matching job is pending or processing,
+    its job_id is returned instead of starting another pipeline. Joining
+    does not count against the rate limits, so a double click or client
+    retry gets the running job rather than a 429; the limits are charged
+    only when a new job is about to be created.
+
     Rate limits:
     - 1 request per minute
     - 10 requests per hour
     - 23 requests per day
     """
     client_ip = request.client.host if request.client else "unknown"
+    system_prompt, custom_prompt = _load_prompts(job_request)
 
-    # Check multiple rate limit windows
-    if not firestore_service.check_rate_limit(f"rate_limit:process:minute:{client_ip}", limit=1, window_seconds=60):
-        raise HTTPException(status_code=429, detail="Rate limit exceeded: 1 request per minute. Try again later.")
-
-    if not firestore_service.check_rate_limit(f"rate_limit:process:hour:{client_ip}", limit=10, window_seconds=3600):
-        raise HTTPException(status_code=429, detail="Rate limit exceeded: 10 requests per hour. Try again later.")
+    key = _request_key(job_request.doc_id, job_request, system_prompt, custom_prompt)
+    existing_job_id = firestore_service.find_active_job(key)
+    if existing_job_id:
+        JOBS_COALESCED.inc()
+        logger.info(f"Coalesced request for document {job_request.doc_id} into job {existing_job_id}")
+        return ProcessJobResponse(job_id=existing_job_id, message="Job already in progress", deduplicated=True)
 
-    if not firestore_service.check_rate_limit(f"rate_limit:process:day:{client_ip}", limit=23, window_seconds=86400):
-        raise HTTPException(status_code=429, detail="Rate limit exceeded: 23 requests per day. Try again later.")
+    _check_process_rate_limits(client_ip)
 
     try:
         job_id = str(uuid.uuid4())
         
-        job_data = {
-            "job_id": job_id,
-            "doc_id": job_request.doc_id,
-            "system_prompt_id": job_request.system_prompt_id,
-            "custom_prompt_id": job_request.custom_prompt_id,
-            "schema": job_request.schema,
-            "status": "pending",
-            "attempt": 0,
-            "created_at": int(time.time()),
-        }
+        job_data = _new_job_data(job_id, job_request.doc_id, job_request)
 
-        firestore_service.create_job(job_id, job_data)
+        winner_id = firestore_service.create_job_once(key, job_id, job_data)
+        if winner_id != job_id:
+            # A concurrent duplicate created the job first
+            JOBS_COALESCED.inc()
+            return ProcessJobResponse(job_id=winner_id, message="Job already in progress", deduplicated=True)
 
         logger.info(f"Created job {job_id} for document {job_request.doc_id}")
 
         # Trigger processing immediately in background (Local)
         # In Prod, this would be a Cloud Task enqueued here
-        from app.services.processor import process_job_logic
-        background_tasks.add_task(process_job_logic, job_id)
+        from app.services.processor import run_job_locally
+        background_tasks.add_task(run_job_locally, job_id)
 
         return ProcessJobResponse(job_id=job_id)
 
@@ -102,41 +229,254 @@ def create_process_job(request: Request, job_request: ProcessJobRequest, backgro
         raise HTTPException(status_code=500, detail="Failed to create job")
 
 
-@app.get("/jobs/{job_id}", response_model=JobStatusResponse)
-def get_job_status(request: Request, job_id: str):
-    """
-    Get job status by ID
-    """
+def _not_modified(request: Request, response: Response, payload) -> Optional[Response]:
+    """Answer 304 when the client's If-None-Match covers payload; otherwise tag the response"""
+    etag = etag_for(payload)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        STATUS_NOT_MODIFIED.inc()
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return None
+
+
+def _check_status_rate_limit(request: Request):
     # Rate limit: 30 requests per minute
     client_ip = request.client.host if request.client else "unknown"
     if not firestore_service.check_rate_limit(f"rate_limit:status:{client_ip}", limit=30, window_seconds=60):
         raise HTTPException(status_code=429, detail="Rate limit exceeded. Try again later.")
 
-    job = firestore_service.get_job(job_id)
+
+@app.post("/jobs/process-batch", response_model=ProcessBatchResponse)
+def create_process_batch(request: Request, batch_request: ProcessBatchRequest, background_tasks: BackgroundTasks):
+    """
+    Create processing jobs for many documents with the same prompts and options
+
+    The whole submission counts once against the processing rate limits,
+    and not at all when every document already has a matching active job.
+    The prompts are read once and snapshotted on every job (so executors
+    skip those reads), and the jobs plus a group record are created in one
+    Firestore transaction. Documents that already have a matching active
+    job join it, as with POST /jobs/process. Track the submission with
+    GET /jobs/groups/{group_id}.
+    """
+    client_ip = request.client.host if request.client else "unknown"
+
+    doc_ids = list(dict.fromkeys(batch_request.doc_ids))
+    if len(doc_ids) > settings.max_batch_documents:
+        raise HTTPException(status_code=400, detail=f"At most {settings.max_batch_documents} documents per batch")
+
+    system_prompt, custom_prompt = _load_prompts(batch_request)
+    keys = [_request_key(doc_id, batch_request, system_prompt, custom_prompt) for doc_id in doc_ids]
+    # The group transaction settles which jobs win; this only decides whether the submission is charged
+    if not all(firestore_service.find_active_job(key) for key in keys):
+        _check_process_rate_limits(client_ip)
+
+    try:
+        group_id = str(uuid.uuid4())
+        entries = []
+        for doc_id, key in zip(doc_ids, keys):
+            job_id = str(uuid.uuid4())
+            job_data = _new_job_data(
+                job_id,
+                doc_id,
+                batch_request,
+                group_id=group_id,
+                system_prompt=system_prompt,
+                custom_prompt=custom_prompt,
+            )
+            entries.append((key, job_id, job_data))
+
+        winners = firestore_service.create_job_group(group_id, {
+            "group_id": group_id,
+            "doc_ids": doc_ids,
+            "system_prompt_id": batch_request.system_prompt_id,
+            "custom_prompt_id": batch_request.custom_prompt_id,
+            "created_at": int(time.time()),
+        }, entries)
+    except Exception as e:
+        logger.error(f"Failed to create job group: {e}")
+        raise HTTPException(status_code=500, detail="Failed to create jobs")
+
+    jobs = {}
+    joined = []
+    new_job_ids = []
+    for doc_id, (key, job_id, _) in zip(doc_ids, entries):
+        jobs[doc_id] = winners[key]
+        if winners[key] == job_id:
+            new_job_ids.append(job_id)
+        else:
+            joined.append(doc_id)
+    if joined:
+        JOBS_COALESCED.inc(len(joined))
+    logger.info(f"Created job group {group_id}: {len(new_job_ids)} new jobs, {len(joined)} joined running jobs")
+
+    # Trigger processing in background (Local)
+    # In Prod, this would enqueue one Cloud Task per new job
+    from app.services.processor import run_group_locally
+    background_tasks.add_task(run_group_locally, new_job_ids)
+
+    return ProcessBatchResponse(group_id=group_id, jobs=jobs, deduplicated=joined)
+
+
+@app.get("/jobs", response_model=JobStatusListResponse)
+def get_job_statuses(request: Request, response: Response, ids: str):
+    """
+    Get the status of several jobs at once: GET /jobs?ids=a,b,c
+
+    Counts as one request against the status rate limit, and jobs not in
+    the short-TTL job cache are read in one batched Firestore call.
+    Supports If-None-Match like GET /jobs/{job_id}.
+    """
+    job_ids = list(dict.fromkeys(job_id.strip() for job_id in ids.split(",") if job_id.strip()))
+    if not job_ids:
+        raise HTTPException(status_code=400, detail="No job IDs given")
+    if len(job_ids) > settings.job_status_max_ids:
+        raise HTTPException(status_code=400, detail=f"At most {settings.job_status_max_ids} job IDs per request")
+
+    _check_status_rate_limit(request)
+
+    jobs = job_cache.get_many(job_ids)
+    result = JobStatusListResponse(
+        jobs=[JobStatusResponse(**jobs[job_id]) for job_id in job_ids if jobs[job_id]],
+        missing=[job_id for job_id in job_ids if not jobs[job_id]],
+    )
+    payload = result.model_dump(mode="json")
+    return _not_modified(request, response, payload) or payload
+
+
+@app.get("/jobs/groups/{group_id}", response_model=JobGroupStatusResponse)
+def get_job_group_status(request: Request, response: Response, group_id: str):
+    """
+    Aggregate status of a batch submission: status counts, share of jobs
+    finished and questions produced, plus each job's status. A failed job
+    only counts as finished once it is marked not retryable; until then a
+    redelivery may still run it. Job reads are batched and cached like
+    GET /jobs?ids=, and If-None-Match is supported.
+    """
+    _check_status_rate_limit(request)
+
+    group = firestore_service.get_job_group(group_id)
+    if not group:
+        raise HTTPException(status_code=404, detail="Job group not found")
+
+    jobs = job_cache.get_many(group["job_ids"])
+    statuses = [JobStatusResponse(**jobs[job_id]) for job_id in group["job_ids"] if jobs[job_id]]
+    status_counts: dict[str, int] = {}
+    for job in statuses:
+        status_counts[job.status.value] = status_counts.get(job.status.value, 0) + 1
+    finished = sum(
+        1 for job in statuses
+        if job.status.value not in ACTIVE_JOB_STATUSES
+        and (job.status != JobStatus.FAILED or job.retryable is False)
+    )
+    job_count = len(group["job_ids"])
+
+    result = JobGroupStatusResponse(
+        group_id=group_id,
+        job_count=job_count,
+        status_counts=status_counts,
+        finished=finished,
+        progress=round(100 * finished / job_count, 1) if job_count else 100.0,
+        question_count=sum(job.question_count or 0 for job in statuses),
+        created_at=group.get("created_at", 0),
+        jobs=statuses,
+        missing=[job_id for job_id in group["job_ids"] if not jobs[job_id]],
+    )
+    payload = result.model_dump(mode="json")
+    return _not_modified(request, response, payload) or payload
+
+
+@app.get("/jobs/{job_id}", response_model=JobStatusResponse)
+def get_job_status(request: Request, response: Response, job_id: str):
+    """
+    Get job status by ID
+
+    Responses carry an ETag; a request with a matching If-None-Match
+    header gets 304 Not Modified. Job reads go through a short-TTL cache.
+    """
+    _check_status_rate_limit(request)
+
+    job = job_cache.get(job_id)
 
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
 
-    return JobStatusResponse(**job)
+    payload = JobStatusResponse(**job).model_dump(mode="json")
+    return _not_modified(request, response, payload) or payload
+
+
+@app.get("/stats", response_model=StatsResponse)
+def get_stats(request: Request, limit: int = 50):
+    """
+    Summarize recent jobs: status counts, durations, token usage and throughput
+    """
+    client_ip = request.client.host if request.client else "unknown"
+    if not firestore_service.check_rate_limit(f"rate_limit:stats:{client_ip}", limit=30, window_seconds=60):
+        raise HTTPException(status_code=429, detail="Rate limit exceeded. Try again later.")
+
+    jobs = firestore_service.list_recent_jobs(limit=max(1, min(limit, 500)))
+    return StatsResponse(**summarize_jobs(jobs))
+
+
+@app.get("/stats/daily")
+def get_daily_stats(request: Request, days: int = 30):
+    """
+    Daily summaries of compacted jobs, newest day first: job and question
+    counts, status counts, a duration histogram and token totals
+    """
+    client_ip = request.client.host if request.client else "unknown"
+    if not firestore_service.check_rate_limit(f"rate_limit:stats:{client_ip}", limit=30, window_seconds=60):
+        raise HTTPException(status_code=429, detail="Rate limit exceeded. Try again later.")
+
+    return {"days": firestore_service.list_job_summaries(days=max(1, min(days, 366)))}
+
+
+@app.post("/lifecycle/compact")
+async def compact_jobs():
+    """
+    Compact finished jobs older than job_ttl now.
+    Designed to be called by Cloud Scheduler, since Cloud Run may throttle
+    the in-process loop between requests.
+
+    Rate limit: 1 run per minute across all callers
+    """
+    if not firestore_service.check_rate_limit("rate_limit:compact", limit=1, window_seconds=60):
+        raise HTTPException(status_code=429, detail="Compaction ran recently. Try again later.")
+
+    compactor = job_compactor or JobCompactor.from_settings()
+    return await asyncio.to_thread(compactor.run_once)
 
 
 @app.delete("/jobs/{job_id}")
-def cancel_job(request: Request, job_id: str):
+def cancel_job(request: Request, job_id: str, keep_partial: bool = False):
     """
-    Cancel a pending job
+    Cancel a pending or in-progress job
+
+    Pending jobs, and failed jobs still waiting for a redelivery, are
+    cancelled immediately. In-progress jobs are flagged and stop
+    cooperatively (between pages, between batches, during retry backoff,
+    or by abandoning the in-flight Gemini call) within a few seconds.
+    With keep_partial=true, questions from completed batches are saved.
+    The status check and the write share one Firestore transaction.
     """
-    job = firestore_service.get_job(job_id)
+    job = firestore_service.cancel_job(job_id, keep_partial)
 
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
 
-    if job["status"] == "processing":
+    if not cancel_updates(job, keep_partial):
         raise HTTPException(
             status_code=400,
-            detail="Cannot cancel job in progress"
+            detail=f"Job already {job['status']}"
         )
 
-    firestore_service.update_job(job_id, {"status": "failed", "error": "Cancelled by user"})
+    if job["status"] == JobStatus.PROCESSING:
+        # Fast path when the job runs on this instance; others pick up the Firestore flag
+        running_here = request_cancel(job_id)
+        logger.info(f"Cancellation requested for job {job_id} (running on this instance: {running_here})")
+        return {"message": "Cancellation requested"}
+
+    firestore_service.update_status(job["doc_id"], status="failed", error="Cancelled by user")
     logger.info(f"Job {job_id} cancelled")
 
     return {"message": "Job cancelled"}
@@ -147,17 +487,29 @@ async def execute_job(request: Request, payload: dict):
     """
     Execute a processing job.
     Designed to be called by Cloud Tasks (Push Queue).
+
+    Send the X-Profile-Job: 1 header to capture a profile of this run.
+
+    Failures answer 500 (so Cloud Tasks redelivers) unless the job was
+    marked not retryable (a fatal error, or no attempts left); those answer
+    200 with status "failed" so the queue does not retry them. A failure
+    before the attempt recorded its outcome counts as retryable.
     """
     job_id = payload.get("job_id")
     if not job_id:
         raise HTTPException(status_code=400, detail="Missing job_id")
-        
+
+    profile = request.headers.get(PROFILE_HEADER, "").lower() in ("1", "true", "yes")
+
     try:
         from app.services.processor import process_job_logic
-        await process_job_logic(job_id)
+        await process_job_logic(job_id, profile=profile, deadline_seconds=settings.job_deadline_seconds)
         return {"status": "success", "job_id": job_id}
     except Exception as e:
         logger.error(f"Execution failed for job {job_id}: {e}")
+        job = firestore_service.get_job(job_id) or {}
+        if job.get("retryable") is False:
+            return {"status": "failed", "job_id": job_id, "error": str(e)}
         # Return 500 to trigger Cloud Tasks retry
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -8,18 +8,48 @@ class JobStatus(str, Enum):
     PROCESSING = "processing"
     COMPLETED = "completed"
     FAILED = "failed"
+    CANCELLED = "cancelled"
 
 
-class ProcessJobRequest(BaseModel):
-    doc_id: str
+# Jobs that a duplicate processing request may join
+ACTIVE_JOB_STATUSES = (JobStatus.PENDING.value, JobStatus.PROCESSING.value)
+
+
+class SamplingStrategy(str, Enum):
+    SEQUENTIAL = "sequential"  # Batches front to back
+    SPREAD = "spread"  # Batches spread evenly across the document
+
+
+class JobOptions(BaseModel):
+    """Processing options shared by single and batch submissions"""
     system_prompt_id: str
     custom_prompt_id: str
     schema: Optional[str] = None  # DEPRECATED: Schema now defined via Pydantic models in gemini_service.py
+    profile: bool = False  # Capture a sampling profile of the job run
+    target_questions: Optional[int] = Field(default=None, gt=0)  # Stop dispatching batches once this many questions exist
+    sampling: SamplingStrategy = SamplingStrategy.SEQUENTIAL  # Which batches to run first when a target is set
+    progressive: bool = False  # Commit each batch's questions as it finishes (document status "ready_partial")
+
+
+class ProcessJobRequest(JobOptions):
+    doc_id: str
 
 
 class ProcessJobResponse(BaseModel):
     job_id: str
     message: str = "Job queued successfully"
+    deduplicated: bool = False  # True when an identical in-flight job was returned instead
+
+
+class ProcessBatchRequest(JobOptions):
+    doc_ids: list[str] = Field(min_length=1)  # Documents processed with the same prompts and options
+
+
+class ProcessBatchResponse(BaseModel):
+    group_id: str
+    jobs: dict[str, str]  # doc_id -> job_id
+    deduplicated: list[str] = []  # doc_ids answered with an already running job
+    message: str = "Jobs queued successfully"
 
 
 class JobStatusResponse(BaseModel):
@@ -28,9 +58,48 @@ class JobStatusResponse(BaseModel):
     attempt: int
     max_attempts: int
     error: Optional[str] = None
+    error_reason: Optional[str] = None  # Error class from retry_policy.classify (e.g. http_429, blocked)
+    retryable: Optional[bool] = None  # Whether a failed job will be delivered again
     created_at: int
     started_at: Optional[int] = None
     completed_at: Optional[int] = None
+    timings: Optional[dict] = None  # Per-stage timing summary, set when the job finishes
+    usage: Optional[dict] = None  # Token usage and throughput, set when the job finishes
+    extraction: Optional[dict] = None  # Page numbers that were slow (fast-mode retry), skipped or failed
+    preprocessing: Optional[dict] = None  # Characters, tokens and pages removed before Gemini
+    sampling: Optional[dict] = None  # Batches run and skipped when a target question count was set
+    dedup: Optional[dict] = None  # Near-duplicate questions dropped across batches
+    profile_path: Optional[str] = None  # Location of the captured profile, for profiled jobs
+    cancel_requested: bool = False
+    questions_kept: Optional[int] = None  # Partial questions saved when a cancelled job kept them
+    questions_committed: Optional[int] = None  # Questions already visible on the document, for progressive jobs
+    question_count: Optional[int] = None  # Questions saved, set when the job completes
+    group_id: Optional[str] = None  # Batch submission the job belongs to
+
+
+class JobGroupStatusResponse(BaseModel):
+    group_id: str
+    job_count: int
+    status_counts: dict[str, int]
+    finished: int  # Jobs that completed, failed or were cancelled
+    progress: float  # Share of jobs finished, 0-100
+    question_count: int  # Questions saved by completed jobs
+    created_at: int
+    jobs: list[JobStatusResponse]
+    missing: list[str] = []  # Job IDs whose records no longer exist
+
+
+class JobStatusListResponse(BaseModel):
+    jobs: list[JobStatusResponse]
+    missing: list[str] = []  # Requested IDs with no job
+
+
+class StatsResponse(BaseModel):
+    job_count: int
+    status_counts: dict[str, int]
+    duration_seconds: dict[str, Optional[float]]
+    tokens: dict[str, int]
+    avg_tokens_per_second: Optional[float] = None
 
 
 class Question(BaseModel):
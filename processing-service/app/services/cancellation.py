@@ -0,0 +1,98 @@
+import time
+import logging
+import threading
+from typing import Optional
+from app.config import settings
+from app.services.firestore_service import firestore_service
+
+logger = logging.getLogger(__name__)
+
+# Granularity of cancellable waits (retry backoff, in-flight Gemini calls)
+WAIT_SLICE_SECONDS = 0.25
+
+
+class JobCancelled(Exception):
+    """Raised inside the pipeline when a job's cancellation has been requested"""
+
+    def __init__(self, job_id: str, partial_questions: Optional[list[dict]] = None):
+        super().__init__(f"Job {job_id} cancelled by user")
+        self.job_id = job_id
+        self.partial_questions = partial_questions or []
+
+
+class CancellationToken:
+    """
+    Cooperative cancellation flag for one running job.
+
+    Set locally by DELETE /jobs/{job_id} on the same instance, or picked up
+    from the job's 'cancel_requested' field in Firestore (polled at most
+    every settings.cancel_poll_interval seconds) when the request landed
+    on another instance.
+    """
+
+    def __init__(self, job_id: str, poll_interval: Optional[float] = None):
+        self.job_id = job_id
+        self.poll_interval = settings.cancel_poll_interval if poll_interval is None else poll_interval
+        self._event = threading.Event()
+        self._last_poll = time.monotonic()
+
+    def cancel(self):
+        self._event.set()
+
+    def is_cancelled(self) -> bool:
+        if self._event.is_set():
+            return True
+
+        now = time.monotonic()
+        if now - self._last_poll >= self.poll_interval:
+            self._last_poll = now
+            try:
+                job = firestore_service.get_job(self.job_id)
+                if job and job.get("cancel_requested"):
+                    logger.info(f"Cancellation of job {self.job_id} picked up from Firestore")
+                    self._event.set()
+            except Exception as e:
+                logger.warning(f"Cancellation poll failed for job {self.job_id}: {e}")
+
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self.is_cancelled():
+            raise JobCancelled(self.job_id)
+
+    def wait(self, seconds: float):
+        """Sleep for up to `seconds`, raising JobCancelled as soon as cancellation is seen"""
+        deadline = time.monotonic() + seconds
+        while True:
+            self.raise_if_cancelled()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            self._event.wait(min(WAIT_SLICE_SECONDS, remaining))
+
+
+_tokens: dict[str, CancellationToken] = {}
+_tokens_lock = threading.Lock()
+
+
+def register(job_id: str) -> CancellationToken:
+    """Create and track the token for a job starting on this instance"""
+    token = CancellationToken(job_id)
+    with _tokens_lock:
+        _tokens[job_id] = token
+    return token
+
+
+def unregister(job_id: str):
+    with _tokens_lock:
+        _tokens.pop(job_id, None)
+
+
+def request_cancel(job_id: str) -> bool:
+    """Signal a job running on this instance. Returns False if it is not running here."""
+    with _tokens_lock:
+        token = _tokens.get(job_id)
+    if token is None:
+        return False
+    token.cancel()
+    return True
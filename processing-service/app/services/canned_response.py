@@ -0,0 +1,31 @@
+from app.services.text_preprocessor import CHARS_PER_TOKEN
+
+
+class _Candidate:
+    def __init__(self, finish_reason: str):
+        self.finish_reason = finish_reason
+
+
+class _Usage:
+    def __init__(self, prompt_chars: int, output_chars: int):
+        self.prompt_token_count = prompt_chars // CHARS_PER_TOKEN
+        self.candidates_token_count = output_chars // CHARS_PER_TOKEN
+        self.thoughts_token_count = 0
+        self.total_token_count = self.prompt_token_count + self.candidates_token_count
+
+
+class CannedResponse:
+    """
+    Mimics the parts of google.genai's GenerateContentResponse we read.
+
+    Answers that do not come from Gemini (cassette replay, the fake client
+    of the memory backend) are wrapped in this; usage is estimated from
+    character counts.
+    """
+
+    def __init__(self, text: str, prompt_chars: int = 0, finish_reason: str = "STOP"):
+        self.text = text
+        self.parts = [text] if text else []
+        self.candidates = [_Candidate(finish_reason)]
+        self.prompt_feedback = None
+        self.usage_metadata = _Usage(prompt_chars, len(text))
@@ -0,0 +1,165 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Optional
+from app.config import settings
+from app.services.storage_service import storage_service
+from app.services.canned_response import CannedResponse
+
+logger = logging.getLogger(__name__)
+
+
+def prompt_hash(prompt: str) -> str:
+    """Stable identifier for a prompt, so cassettes never store document text"""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+class CassetteRecorder:
+    """
+    Records each Gemini batch of one job: prompt hash, page range, the
+    model the batch was routed to, raw response text, finish_reason and
+    latency. Saved as JSON Lines, with a header line describing the job.
+    """
+
+    def __init__(self, job_id: str, doc_id: str):
+        self.job_id = job_id
+        self.header = {
+            "type": "header",
+            "job_id": job_id,
+            "doc_id": doc_id,
+            "recorded_at": int(time.time()),
+        }
+        self.entries: list[dict] = []
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        batch_num: int,
+        page_range: tuple[Optional[int], Optional[int]],
+        prompt: str,
+        response_text: str,
+        finish_reason: Optional[str],
+        latency: float,
+        usage: dict,
+        model: str,
+    ):
+        with self._lock:
+            self.entries.append({
+                "type": "batch",
+                "batch": batch_num,
+                "start_page": page_range[0],
+                "end_page": page_range[1],
+                "model": model,
+                "prompt_hash": prompt_hash(prompt),
+                "prompt_chars": len(prompt),
+                "response_text": response_text,
+                "finish_reason": finish_reason,
+                "latency": round(latency, 4),
+                "usage": usage,
+            })
+
+    def dumps(self) -> str:
+        with self._lock:
+            lines = [self.header] + sorted(self.entries, key=lambda e: e["batch"])
+        return "\n".join(json.dumps(line) for line in lines) + "\n"
+
+    def save(self) -> str:
+        """
+        Write the cassette to settings.cassette_dir when set, otherwise to
+        the uploads bucket under cassettes/. Returns the location.
+        """
+        filename = f"{self.job_id}.jsonl"
+        data = self.dumps()
+        if settings.cassette_dir:
+            os.makedirs(settings.cassette_dir, exist_ok=True)
+            path = os.path.join(settings.cassette_dir, filename)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(data)
+        else:
+            path = storage_service.upload_bytes(
+                f"cassettes/{filename}", data.encode("utf-8"), content_type="application/jsonl"
+            )
+        logger.info(f"Saved cassette with {len(self.entries)} batches to {path}")
+        return path
+
+
+def load_cassette(path: str) -> tuple[dict, list[dict]]:
+    """
+    Load a cassette from a local path or gs://bucket/... URI.
+
+    Returns:
+        Tuple of (header, batch entries in batch order). Cassettes recorded
+        before entries carried their model get the header's model on each.
+    """
+    if path.startswith("gs://"):
+        object_path = path.split("/", 3)[3]
+        text = storage_service.download_bytes(object_path).decode("utf-8")
+    else:
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+
+    header: dict = {}
+    entries: list[dict] = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if record.get("type") == "header":
+            header = record
+        else:
+            entries.append(record)
+    for entry in entries:
+        entry.setdefault("model", header.get("model"))
+    entries.sort(key=lambda e: e["batch"])
+    return header, entries
+
+
+class ReplayGeminiClient:
+    """
+    Gemini client that answers from a recorded cassette.
+
+    Responses are matched by prompt hash; prompts that changed since the
+    recording (e.g. after a preprocessing change) fall back to recording
+    order, so pipeline changes can still be measured against real
+    responses. Timing is "original" (sleep the recorded latency times
+    time_scale) or "none". recorded_models counts the answers served per
+    model that originally produced them, since a replay is not routed.
+    """
+
+    def __init__(self, entries: list[dict], timing: str = "original", time_scale: float = 1.0):
+        if timing not in ("original", "none"):
+            raise ValueError("timing must be 'original' or 'none'")
+        self.entries = entries
+        self.timing = timing
+        self.time_scale = time_scale
+        self.by_hash = {e["prompt_hash"]: e for e in entries}
+        self.hash_hits = 0
+        self.order_hits = 0
+        self.recorded_models: dict[str, int] = {}
+        self._next = 0
+        self._lock = threading.Lock()
+        self.models = self
+
+    def generate_content(self, model: str, contents: str, config: Optional[dict] = None) -> CannedResponse:
+        with self._lock:
+            entry = self.by_hash.get(prompt_hash(contents))
+            if entry is not None:
+                self.hash_hits += 1
+            else:
+                if self._next >= len(self.entries):
+                    raise ValueError("Cassette exhausted: more Gemini calls than recorded batches")
+                entry = self.entries[self._next]
+                self.order_hits += 1
+            self._next += 1
+            self.recorded_models[entry["model"]] = self.recorded_models.get(entry["model"], 0) + 1
+
+        if self.timing == "original" and entry["latency"]:
+            time.sleep(entry["latency"] * self.time_scale)
+        return CannedResponse(
+            entry["response_text"],
+            prompt_chars=entry.get("prompt_chars", len(contents)),
+            finish_reason=entry.get("finish_reason") or "STOP",
+        )
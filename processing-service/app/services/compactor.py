@@ -0,0 +1,72 @@
+import time
+import random
+import asyncio
+import logging
+from typing import Optional
+from app.config import settings
+from app.services.firestore_service import firestore_service
+from app.services.metrics import JOBS_COMPACTED
+
+logger = logging.getLogger(__name__)
+
+
+class JobCompactor:
+    """
+    Rolls finished jobs into daily summaries and deletes the raw records.
+
+    Jobs that finished more than retention_seconds ago are compacted
+    batch_size at a time, each batch in one transaction (see
+    FirestoreService.compact_jobs), at most max_batches per run. The jobs
+    collection then only holds recent records, so listing queries stay
+    cheap as volume grows. Every instance may run the loop; the
+    transactions keep concurrent runs from counting a job twice.
+    """
+
+    def __init__(self, store, retention_seconds: int, batch_size: int, max_batches: int):
+        self.store = store
+        self.retention_seconds = retention_seconds
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+
+    @classmethod
+    def from_settings(cls) -> "JobCompactor":
+        return cls(
+            firestore_service,
+            retention_seconds=settings.job_ttl,
+            batch_size=settings.compaction_batch_size,
+            max_batches=settings.compaction_max_batches,
+        )
+
+    def run_once(self, now: Optional[float] = None) -> dict:
+        """Compact what is due now; returns jobs compacted and transactions used"""
+        completed_before = int((now or time.time()) - self.retention_seconds)
+        compacted = 0
+        batches = 0
+        while batches < self.max_batches:
+            job_ids = self.store.list_compactable_jobs(completed_before, self.batch_size)
+            if not job_ids:
+                break
+            count = self.store.compact_jobs(job_ids, completed_before)
+            batches += 1
+            compacted += count
+            JOBS_COMPACTED.inc(count)
+            # A short page is the last one; an all-skipped page (jobs re-run since) would repeat forever
+            if count == 0 or len(job_ids) < self.batch_size:
+                break
+
+        if compacted:
+            logger.info(f"Compacted {compacted} jobs finished before {completed_before} in {batches} transactions")
+        return {"compacted": compacted, "batches": batches, "completed_before": completed_before}
+
+    async def run_periodically(self, interval: float):
+        """Run compaction every interval seconds, jittered so instances do not line up"""
+        while True:
+            await asyncio.sleep(interval * random.uniform(0.5, 1.0))
+            try:
+                await asyncio.to_thread(self.run_once)
+            except Exception as e:
+                logger.warning(f"Job compaction failed: {e}")
+
+
+# Singleton instance (None when disabled)
+job_compactor = JobCompactor.from_settings() if settings.compaction_enabled else None
@@ -0,0 +1,194 @@
+import time
+import logging
+import threading
+from collections import OrderedDict, deque
+from typing import Optional
+from app.config import settings
+from app.services.cancellation import CancellationToken, JobCancelled, WAIT_SLICE_SECONDS
+from app.services.retry_policy import classify
+from app.services.metrics import (
+    GEMINI_CONCURRENCY_LIMIT,
+    GEMINI_IN_FLIGHT,
+    GEMINI_QUEUE_DEPTH,
+    GEMINI_QUEUE_WAIT,
+)
+
+logger = logging.getLogger(__name__)
+
+# Error classes that signal the model is saturated rather than the request being bad
+OVERLOAD_REASONS = {"http_429", "http_503", "timeout"}
+
+# Weight of the newest success in the latency baseline
+LATENCY_EWMA_ALPHA = 0.2
+
+# Latencies are compared per this many prompt tokens; smaller prompts count as this size
+LATENCY_TOKEN_UNIT = 1000
+
+
+def outcome_for(error: Exception) -> str:
+    """Map a failed call to a limiter outcome: 'overload' or 'error'"""
+    return "overload" if classify(error).reason in OVERLOAD_REASONS else "error"
+
+
+class AdaptiveLimiter:
+    """
+    Process-wide AIMD limit on in-flight Gemini calls.
+
+    Each success adds 1/limit (about +1 per round trip); a 429, 503,
+    timeout or a success slower than latency_tolerance times the latency
+    baseline multiplies the limit by backoff, at most once per baseline
+    latency so one congestion event is not counted once per in-flight call.
+    Latency grows with prompt size, so it is compared per
+    LATENCY_TOKEN_UNIT prompt tokens, and every success moves the
+    baseline so it follows a lasting shift instead of flagging it forever.
+    Calls over the limit wait in per-job FIFO queues served round-robin,
+    so one large job cannot starve the others.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        min_limit: int,
+        max_limit: int,
+        backoff: float = 0.5,
+        latency_tolerance: float = 2.0,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self._limit = float(max(min_limit, min(initial, max_limit)))
+        self._in_flight = 0
+        self._latency_baseline: Optional[float] = None
+        self._last_decrease = 0.0
+        self._queues: OrderedDict[str, deque] = OrderedDict()
+        self._granted: set[int] = set()
+        self._next_ticket = 0
+        self._cond = threading.Condition()
+        self._publish()
+
+    @classmethod
+    def from_settings(cls) -> "AdaptiveLimiter":
+        return cls(
+            initial=settings.gemini_concurrency_initial,
+            min_limit=settings.gemini_concurrency_min,
+            max_limit=settings.gemini_concurrency_max,
+            backoff=settings.gemini_concurrency_backoff,
+            latency_tolerance=settings.gemini_latency_tolerance,
+        )
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def _publish(self):
+        GEMINI_CONCURRENCY_LIMIT.set(self.limit)
+        GEMINI_IN_FLIGHT.set(self._in_flight)
+        GEMINI_QUEUE_DEPTH.set(self.queue_depth)
+
+    def _dispatch(self):
+        """Hand free slots to queued calls, one job at a time in rotation (lock held)"""
+        while self._queues and self._in_flight < self.limit:
+            key, queue = next(iter(self._queues.items()))
+            self._granted.add(queue.popleft())
+            self._in_flight += 1
+            if queue:
+                self._queues.move_to_end(key)
+            else:
+                del self._queues[key]
+        self._cond.notify_all()
+
+    def acquire(self, key: str, cancel_token: Optional[CancellationToken] = None):
+        """
+        Block until a slot is free for a call made on behalf of `key` (a job ID).
+
+        Raises:
+            JobCancelled: If the job is cancelled while waiting
+        """
+        start = time.perf_counter()
+        with self._cond:
+            if not self._queues and self._in_flight < self.limit:
+                self._in_flight += 1
+                self._publish()
+                GEMINI_QUEUE_WAIT.observe(0.0)
+                return
+
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            self._queues.setdefault(key, deque()).append(ticket)
+            self._publish()
+            try:
+                while ticket not in self._granted:
+                    if cancel_token and cancel_token.is_cancelled():
+                        raise JobCancelled(cancel_token.job_id)
+                    self._cond.wait(WAIT_SLICE_SECONDS)
+                self._granted.discard(ticket)
+            except BaseException:
+                if ticket in self._granted:
+                    # Granted while giving up: hand the slot on
+                    self._granted.discard(ticket)
+                    self._in_flight -= 1
+                else:
+                    self._queues[key].remove(ticket)
+                    if not self._queues[key]:
+                        del self._queues[key]
+                self._dispatch()
+                raise
+            finally:
+                self._publish()
+        GEMINI_QUEUE_WAIT.observe(time.perf_counter() - start)
+
+    def try_acquire(self) -> bool:
+        """Take a slot only if one is free right now and nobody is queued"""
+        with self._cond:
+            if self._queues or self._in_flight >= self.limit:
+                return False
+            self._in_flight += 1
+            self._publish()
+            return True
+
+    def release(self, outcome: str, latency: Optional[float] = None, prompt_tokens: int = 0):
+        """
+        Return a slot and adjust the limit.
+
+        Args:
+            outcome: "success", "overload" (429/503/timeout) or "error" (no signal)
+            latency: Seconds the call took, for successes
+            prompt_tokens: Estimated prompt size of the call, to normalize its latency
+        """
+        with self._cond:
+            self._in_flight -= 1
+            congested = outcome == "overload"
+            if outcome == "success" and latency is not None:
+                normalized = latency / max(1.0, prompt_tokens / LATENCY_TOKEN_UNIT)
+                baseline = self._latency_baseline
+                if baseline is not None and normalized > baseline * self.latency_tolerance:
+                    congested = True
+                else:
+                    self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+                self._latency_baseline = (
+                    normalized if baseline is None
+                    else (1 - LATENCY_EWMA_ALPHA) * baseline + LATENCY_EWMA_ALPHA * normalized
+                )
+
+            if congested:
+                now = time.monotonic()
+                if now - self._last_decrease >= max(1.0, self._latency_baseline or 0.0):
+                    self._last_decrease = now
+                    self._limit = max(self.min_limit, self._limit * self.backoff)
+                    logger.info(f"Gemini concurrency limit lowered to {self.limit} ({outcome})")
+
+            self._dispatch()
+            self._publish()
+
+
+# Singleton instance (None when disabled)
+gemini_limiter = AdaptiveLimiter.from_settings() if settings.gemini_limiter_enabled else None
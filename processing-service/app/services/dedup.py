@@ -0,0 +1,142 @@
+import re
+import hashlib
+from collections import defaultdict
+
+# MinHash slots per signature, split into LSH bands
+NUM_SLOTS = 128
+
+# Word n-gram size for shingles
+SHINGLE_WORDS = 3
+
+# Chance that LSH compares a pair sitting exactly at the threshold
+MIN_RECALL = 0.95
+
+_EMPTY = 1 << 64
+_NON_WORD = re.compile(r"[^\w\s]+")
+_SPACE = re.compile(r"\s+")
+
+
+def normalize(question: dict) -> str:
+    """Comparable text of a parsed question: stem plus sorted choices, lowercased, punctuation dropped"""
+    choices = sorted(str(o.get("text", "")) for o in question.get("options", []) if isinstance(o, dict))
+    text = " ".join([str(question.get("questionText", ""))] + choices).lower()
+    return _SPACE.sub(" ", _NON_WORD.sub(" ", text)).strip()
+
+
+def shingles(text: str) -> frozenset[int]:
+    """64-bit hashes of the text's word n-grams (the whole text when it is shorter)"""
+    words = text.split()
+    grams = (
+        [text] if len(words) <= SHINGLE_WORDS
+        else [" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)]
+    )
+    return frozenset(
+        int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest(), "big") for gram in grams
+    )
+
+
+def jaccard(a: frozenset[int], b: frozenset[int]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def signature(shingle_set: frozenset[int], num_slots: int = NUM_SLOTS) -> tuple[int, ...]:
+    """
+    MinHash signature using one-permutation hashing.
+
+    Each shingle hash picks a slot and the rest of it competes for that
+    slot's minimum, so a signature costs one pass over the shingles.
+    Empty slots borrow from the next filled slot (rotation
+    densification), so every slot stays comparable. The share of equal
+    slots between two signatures estimates the Jaccard similarity.
+    """
+    slots = [_EMPTY] * num_slots
+    for h in shingle_set:
+        slot, value = h % num_slots, h // num_slots
+        if value < slots[slot]:
+            slots[slot] = value
+    if _EMPTY in slots and any(value != _EMPTY for value in slots):
+        for i in range(num_slots):
+            if slots[i] == _EMPTY:
+                step = 1
+                while slots[(i + step) % num_slots] == _EMPTY:
+                    step += 1
+                slots[i] = slots[(i + step) % num_slots] + step * _EMPTY
+    return tuple(slots)
+
+
+def lsh_bands(threshold: float, num_slots: int = NUM_SLOTS) -> tuple[int, int]:
+    """
+    (bands, rows) for the LSH index.
+
+    Pairs become candidates when any band of rows slots matches, which
+    happens with probability 1 - (1 - s^rows)^bands for similarity s.
+    Picks the most selective split that still makes a pair exactly at
+    threshold a candidate with probability MIN_RECALL. Candidates are
+    verified against the threshold, so extra candidates only cost time.
+    """
+    best = (num_slots, 1)
+    for rows in range(1, num_slots + 1):
+        if num_slots % rows:
+            continue
+        bands = num_slots // rows
+        if 1 - (1 - threshold ** rows) ** bands >= MIN_RECALL:
+            best = (bands, rows)
+    return best
+
+
+class NearDuplicateFilter:
+    """
+    Drops questions that are near-duplicates of ones already kept.
+
+    Questions are compared on normalize()d text via MinHash signatures;
+    an LSH index over signature bands finds candidates, so each question
+    is checked only against the few kept questions that share a band and
+    the whole pass stays near-linear. A candidate whose shingle Jaccard
+    similarity reaches threshold counts as a duplicate (checked exactly,
+    not from the signature estimate). The filter keeps its index between
+    calls, so batches can be filtered as they arrive.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_slots: int = NUM_SLOTS):
+        self.threshold = threshold
+        self.num_slots = num_slots
+        self.bands, self.rows = lsh_bands(threshold, num_slots)
+        self._buckets: list[defaultdict[tuple, list[int]]] = [defaultdict(list) for _ in range(self.bands)]
+        self._shingles: list[frozenset[int]] = []
+        self.seen = 0
+        self.dropped = 0
+
+    def _band_keys(self, sig: tuple[int, ...]):
+        for band in range(self.bands):
+            yield band, sig[band * self.rows:(band + 1) * self.rows]
+
+    def filter(self, questions: list[dict]) -> list[dict]:
+        """Return the questions that are not near-duplicates of any kept so far, and keep them"""
+        kept = []
+        for question in questions:
+            self.seen += 1
+            shingle_set = shingles(normalize(question))
+            sig = signature(shingle_set, self.num_slots)
+            candidates = set()
+            for band, key in self._band_keys(sig):
+                candidates.update(self._buckets[band].get(key, ()))
+            if any(jaccard(shingle_set, self._shingles[c]) >= self.threshold for c in candidates):
+                self.dropped += 1
+                continue
+
+            index = len(self._shingles)
+            self._shingles.append(shingle_set)
+            for band, key in self._band_keys(sig):
+                self._buckets[band][key].append(index)
+            kept.append(question)
+        return kept
+
+    def report(self) -> dict:
+        return {
+            "threshold": self.threshold,
+            "questions_before": self.seen,
+            "questions_after": self.seen - self.dropped,
+            "dropped": self.dropped,
+        }
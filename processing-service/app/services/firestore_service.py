@@ -1,14 +1,21 @@
 import firebase_admin
 from firebase_admin import firestore
-from typing import Optional
+from typing import Callable, Optional
+import json
 import time
 import os
 import logging
 from firebase_admin import firestore
 from app.config import settings
+from app.services.job_keys import is_joinable
+from app.services.lifecycle import cancel_updates, expire_at, is_compactable, job_expire_at, rollup_jobs
 
 logger = logging.getLogger(__name__)
 
+# Firestore caps one commit at 500 writes and a 10 MiB request; bulk writes are cut below both
+MAX_BATCH_WRITES = 500
+MAX_BATCH_BYTES = 8 * 1024 * 1024
+
 class FirestoreService:
     def __init__(self, collection_prefix: str = "superexam-"):
         # Log critical environment configuration on startup
@@ -25,8 +32,15 @@ class FirestoreService:
 
         self.db = firestore.client()
         self.prefix = collection_prefix
+        # Called with a job's ID after this instance writes it (the job status cache subscribes)
+        self.job_write_listeners: list[Callable[[str], None]] = []
         logger.info(f"Firestore initialized with project: {self.db.project}")
 
+    def _job_written(self, job_ids: list[str]):
+        for job_id in job_ids:
+            for listener in self.job_write_listeners:
+                listener(job_id)
+
     def _collection(self, name: str):
         """Get collection with prefix"""
         full_name = f"{self.prefix}{name}"
@@ -49,7 +63,8 @@ class FirestoreService:
             if not snapshot.exists:
                 transaction.set(ref, {
                     "count": 1,
-                    "reset_at": now + window_seconds
+                    "reset_at": now + window_seconds,
+                    "expireAt": expire_at(window_seconds, now)
                 })
                 return True
             
@@ -60,7 +75,8 @@ class FirestoreService:
                 # Window expired, reset
                 transaction.set(ref, {
                     "count": 1,
-                    "reset_at": now + window_seconds
+                    "reset_at": now + window_seconds,
+                    "expireAt": expire_at(window_seconds, now)
                 })
                 return True
             
@@ -136,7 +152,13 @@ class FirestoreService:
         doc_ref.update(update_data)
 
     def save_questions(self, doc_id: str, questions: list[dict]):
-        """Save generated questions to Firestore using batch write"""
+        """
+        Save generated questions to Firestore using batch write.
+
+        The document turns "ready" without a questionBank index, so readers
+        use these question documents until the new bank is saved instead of
+        the bank of an earlier run.
+        """
         logger.info(f"Saving {len(questions)} questions for {doc_id}")
         doc_ref = self._collection('documents').document(doc_id)
         batch = self.db.batch()
@@ -145,6 +167,7 @@ class FirestoreService:
         batch.update(doc_ref, {
             "status": "ready",
             "questionCount": len(questions),
+            "questionBank": firestore.DELETE_FIELD,
             "progress": firestore.DELETE_FIELD,
             "currentStep": firestore.DELETE_FIELD,
             "updatedAt": int(time.time() * 1000)
@@ -159,12 +182,194 @@ class FirestoreService:
         # Commit all changes atomically
         batch.commit()
 
+    def append_questions(self, doc_id: str, questions: list[dict], question_count: int, final: bool = False):
+        """
+        Commit one batch of questions for progressive jobs.
+
+        The document is marked "ready_partial" with the running
+        question_count, so exams can start while later batches generate;
+        final=True marks it "ready" and clears the progress fields and the
+        questionBank index of any earlier run (see save_questions).
+        """
+        logger.info(f"Committing {len(questions)} questions for {doc_id} ({question_count} total)")
+        doc_ref = self._collection('documents').document(doc_id)
+        batch = self.db.batch()
+
+        update_data = {
+            "status": "ready" if final else "ready_partial",
+            "questionCount": question_count,
+            "updatedAt": int(time.time() * 1000)
+        }
+        if final:
+            update_data["progress"] = firestore.DELETE_FIELD
+            update_data["currentStep"] = firestore.DELETE_FIELD
+            update_data["questionBank"] = firestore.DELETE_FIELD
+        batch.update(doc_ref, update_data)
+
+        questions_collection = doc_ref.collection('questions')
+        for q in questions:
+            batch.set(questions_collection.document(q["id"]), q)
+
+        batch.commit()
+
+    def save_question_bank(self, doc_id: str, shards: list[list[dict]], index: dict):
+        """
+        Write a packed question bank and point the document at it.
+
+        New shards are committed in as many batches as Firestore's request
+        limits require (MAX_BATCH_WRITES, MAX_BATCH_BYTES). The questionBank
+        index is written only after every new shard is stored, so readers
+        see either the old version or the complete new one. Shards of
+        earlier versions are deleted last; a reader still holding the old
+        index then falls back to the question documents.
+        """
+        logger.info(f"Saving question bank v{index['version']} for {doc_id} ({len(shards)} shards)")
+        doc_ref = self._collection('documents').document(doc_id)
+        bank_collection = doc_ref.collection('question_bank')
+        current_ids = {shard["id"] for shard in index["shards"]}
+
+        batch, writes, batch_bytes = self.db.batch(), 0, 0
+        for entry, questions in zip(index["shards"], shards):
+            shard_bytes = len(json.dumps(questions, separators=(",", ":")).encode("utf-8"))
+            if writes and (writes >= MAX_BATCH_WRITES or batch_bytes + shard_bytes > MAX_BATCH_BYTES):
+                batch.commit()
+                batch, writes, batch_bytes = self.db.batch(), 0, 0
+            batch.set(bank_collection.document(entry["id"]), {
+                "version": index["version"],
+                "start": entry["start"],
+                "questions": questions,
+            })
+            writes += 1
+            batch_bytes += shard_bytes
+        if writes:
+            batch.commit()
+
+        doc_ref.update({"questionBank": index})
+
+        stale_refs = [ref for ref in bank_collection.list_documents() if ref.id not in current_ids]
+        for start in range(0, len(stale_refs), MAX_BATCH_WRITES):
+            batch = self.db.batch()
+            for stale_ref in stale_refs[start:start + MAX_BATCH_WRITES]:
+                batch.delete(stale_ref)
+            batch.commit()
+
+    def set_page_index(self, doc_id: str, page_index: dict):
+        """Record the prepared page index artifact (location and summary) on the document"""
+        logger.info(f"Recording page index for {doc_id}: {page_index['path']}")
+        self._collection('documents').document(doc_id).update({"pageIndex": page_index})
+
     def create_job(self, job_id: str, job_data: dict):
         """Create a new job record in Firestore"""
         logger.info(f"Creating job: {job_id}")
         job_ref = self._collection('jobs').document(job_id)
         job_data['createdAt'] = int(time.time() * 1000)
+        job_data['expireAt'] = job_expire_at()
         job_ref.set(job_data)
+        self._job_written([job_id])
+
+    def find_active_job(self, request_key: str) -> Optional[str]:
+        """Return the ID of a pending/processing job created for this request key, if any"""
+        key_doc = self._collection('job_keys').document(request_key).get()
+        if not key_doc.exists:
+            return None
+
+        job_id = key_doc.to_dict().get("job_id")
+        job = self._collection('jobs').document(job_id).get()
+        if job.exists and is_joinable(job.to_dict()):
+            return job_id
+        return None
+
+    def create_job_once(self, request_key: str, job_id: str, job_data: dict) -> str:
+        """
+        Create a job unless an active job already exists for the request key.
+
+        The key check and job creation run in one transaction, so concurrent
+        duplicates (double clicks, client retries, other instances) all
+        resolve to a single job. Returns the ID of the job that won.
+        """
+        key_ref = self._collection('job_keys').document(request_key)
+        job_ref = self._collection('jobs').document(job_id)
+        transaction = self.db.transaction()
+
+        @firestore.transactional
+        def claim_in_transaction(transaction):
+            key_snapshot = key_ref.get(transaction=transaction)
+            if key_snapshot.exists:
+                existing_id = key_snapshot.to_dict().get("job_id")
+                existing = self._collection('jobs').document(existing_id).get(transaction=transaction)
+                if existing.exists and is_joinable(existing.to_dict()):
+                    return existing_id
+
+            now_ms = int(time.time() * 1000)
+            expiry = job_expire_at()
+            transaction.set(job_ref, {**job_data, "request_key": request_key, "createdAt": now_ms, "expireAt": expiry})
+            transaction.set(key_ref, {"job_id": job_id, "createdAt": now_ms, "expireAt": expiry})
+            return job_id
+
+        winner = claim_in_transaction(transaction)
+        if winner == job_id:
+            logger.info(f"Created job: {job_id}")
+        return winner
+
+    def create_job_group(self, group_id: str, group_data: dict, jobs: list[tuple[str, str, dict]]) -> dict[str, str]:
+        """
+        Create a job group and its jobs in one transaction.
+
+        Args:
+            group_id: ID of the group document
+            group_data: Group fields (prompt IDs, options); job_ids is filled in here
+            jobs: (request_key, job_id, job_data) per document
+
+        Returns:
+            {request_key: job_id serving it}. Keys that already have an
+            active job keep it, exactly as create_job_once would.
+        """
+        group_ref = self._collection('job_groups').document(group_id)
+        key_refs = [self._collection('job_keys').document(key) for key, _, _ in jobs]
+        transaction = self.db.transaction()
+
+        @firestore.transactional
+        def create_in_transaction(transaction):
+            existing = {
+                snapshot.id: snapshot.to_dict().get("job_id")
+                for snapshot in self.db.get_all(key_refs, transaction=transaction)
+                if snapshot.exists
+            }
+            existing_refs = [self._collection('jobs').document(job_id) for job_id in set(existing.values())]
+            joinable = {
+                snapshot.id
+                for snapshot in (self.db.get_all(existing_refs, transaction=transaction) if existing_refs else [])
+                if snapshot.exists and is_joinable(snapshot.to_dict())
+            }
+
+            now_ms = int(time.time() * 1000)
+            expiry = job_expire_at()
+            winners = {}
+            for key, job_id, job_data in jobs:
+                if existing.get(key) in joinable:
+                    winners[key] = existing[key]
+                    continue
+                transaction.set(
+                    self._collection('jobs').document(job_id),
+                    {**job_data, "request_key": key, "createdAt": now_ms, "expireAt": expiry},
+                )
+                transaction.set(
+                    self._collection('job_keys').document(key),
+                    {"job_id": job_id, "createdAt": now_ms, "expireAt": expiry},
+                )
+                winners[key] = job_id
+            transaction.set(group_ref, {
+                **group_data, "job_ids": list(winners.values()), "createdAt": now_ms, "expireAt": expiry,
+            })
+            return winners
+
+        winners = create_in_transaction(transaction)
+        logger.info(f"Created job group {group_id} with {len(winners)} jobs")
+        return winners
+
+    def get_job_group(self, group_id: str) -> Optional[dict]:
+        group = self._collection('job_groups').document(group_id).get()
+        return group.to_dict() if group.exists else None
 
     def get_job(self, job_id: str) -> Optional[dict]:
         """Get job data from Firestore"""
@@ -177,12 +382,149 @@ class FirestoreService:
         logger.warning(f"Job {job_id} NOT found in {job_ref.path}")
         return None
 
+    def get_jobs(self, job_ids: list[str]) -> dict[str, dict]:
+        """Get several jobs in one batched read; missing jobs are left out"""
+        refs = [self._collection('jobs').document(job_id) for job_id in job_ids]
+        return {snapshot.id: snapshot.to_dict() for snapshot in self.db.get_all(refs) if snapshot.exists}
+
+    def list_recent_jobs(self, limit: int = 50) -> list[dict]:
+        """List the most recently created jobs, newest first"""
+        query = (
+            self._collection('jobs')
+            .order_by('createdAt', direction=firestore.Query.DESCENDING)
+            .limit(limit)
+        )
+        return [job.to_dict() for job in query.stream()]
+
     def update_job(self, job_id: str, updates: dict):
         """Update job data in Firestore"""
         job_ref = self._collection('jobs').document(job_id)
         updates['updatedAt'] = int(time.time() * 1000)
         job_ref.update(updates)
+        self._job_written([job_id])
+
+    def start_job(self, job_id: str, updates: dict) -> bool:
+        """
+        Apply an attempt's PROCESSING update unless the job was cancelled.
+
+        The status check and the write share one transaction, so a cancel
+        landing just before the attempt starts is never overwritten.
+        Returns False, writing nothing, for a cancelled job.
+        """
+        job_ref = self._collection('jobs').document(job_id)
+        transaction = self.db.transaction()
+
+        @firestore.transactional
+        def start_in_transaction(transaction):
+            snapshot = job_ref.get(transaction=transaction)
+            if not snapshot.exists or snapshot.to_dict().get("status") == "cancelled":
+                return False
+            transaction.update(job_ref, {**updates, "updatedAt": int(time.time() * 1000)})
+            return True
+
+        started = start_in_transaction(transaction)
+        if started:
+            self._job_written([job_id])
+        return started
+
+    def cancel_job(self, job_id: str, keep_partial: bool = False) -> Optional[dict]:
+        """
+        Cancel a job, or flag it for cancellation if it is processing
+        (see lifecycle.cancel_updates), in one transaction.
+
+        Returns the job as it was before the cancel (None if it does not
+        exist); its status tells the caller which of the two happened, or
+        that the job could no longer be cancelled.
+        """
+        job_ref = self._collection('jobs').document(job_id)
+        transaction = self.db.transaction()
+
+        @firestore.transactional
+        def cancel_in_transaction(transaction):
+            snapshot = job_ref.get(transaction=transaction)
+            if not snapshot.exists:
+                return None
+            job = snapshot.to_dict()
+            updates = cancel_updates(job, keep_partial)
+            if updates:
+                transaction.update(job_ref, {**updates, "updatedAt": int(time.time() * 1000)})
+            return job
+
+        job = cancel_in_transaction(transaction)
+        if job is not None:
+            self._job_written([job_id])
+        return job
+
+    def list_compactable_jobs(self, completed_before: int, limit: int) -> list[str]:
+        """IDs of jobs that finished before the cutoff (epoch seconds), oldest first"""
+        query = (
+            self._collection('jobs')
+            .where(filter=firestore.FieldFilter("completed_at", "<", completed_before))
+            .order_by("completed_at")
+            .limit(limit)
+        )
+        return [snapshot.id for snapshot in query.select(["status", "completed_at"]).stream()]
+
+    def compact_jobs(self, job_ids: list[str], completed_before: int) -> int:
+        """
+        Roll finished jobs into daily summaries and delete them, in one transaction.
+
+        Jobs are re-read inside the transaction and only those still
+        present and finished before the cutoff are counted, so compactors
+        running on several instances never count a job twice. Summary
+        documents in job_summaries (one per UTC day) are updated with
+        server-side increments.
+
+        Returns:
+            Number of jobs compacted
+        """
+        refs = [self._collection('jobs').document(job_id) for job_id in job_ids]
+        transaction = self.db.transaction()
+
+        @firestore.transactional
+        def compact_in_transaction(transaction):
+            jobs = [
+                (snapshot.reference, snapshot.to_dict())
+                for snapshot in self.db.get_all(refs, transaction=transaction)
+                if snapshot.exists
+            ]
+            jobs = [(ref, job) for ref, job in jobs if is_compactable(job, completed_before)]
+            now_ms = int(time.time() * 1000)
+            for day, increments in rollup_jobs([job for _, job in jobs]).items():
+                transaction.set(
+                    self._collection('job_summaries').document(day),
+                    {**_as_increments(increments), "day": day, "updatedAt": now_ms},
+                    merge=True,
+                )
+            for ref, _ in jobs:
+                transaction.delete(ref)
+            return len(jobs)
+
+        compacted = compact_in_transaction(transaction)
+        self._job_written(job_ids)
+        return compacted
+
+    def list_job_summaries(self, days: int = 30) -> list[dict]:
+        """Daily job summaries, newest day first"""
+        query = (
+            self._collection('job_summaries')
+            .order_by('day', direction=firestore.Query.DESCENDING)
+            .limit(days)
+        )
+        return [summary.to_dict() for summary in query.stream()]
+
+
+def _as_increments(counts: dict) -> dict:
+    """Nested counts as Firestore Increment transforms, for merge writes"""
+    return {
+        key: _as_increments(value) if isinstance(value, dict) else firestore.Increment(value)
+        for key, value in counts.items()
+    }
 
 
 # Initialize with prefix from settings
-firestore_service = FirestoreService(settings.firestore_collection_prefix)
+if settings.backend == "memory":
+    from testing.fakes import InMemoryFirestoreService
+    firestore_service = InMemoryFirestoreService()
+else:
+    firestore_service = FirestoreService(settings.firestore_collection_prefix)
@@ -4,11 +4,39 @@ import logging
 import os
 import re
 from typing import Optional, Callable
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from google import genai
 from google.genai import types
 from pydantic import BaseModel, Field
 from app.config import settings
 from app.services.pdf_service import pdf_service
+from app.services.cassette import CassetteRecorder
+from app.services.cancellation import CancellationToken, JobCancelled, WAIT_SLICE_SECONDS
+from app.services.generation_cache import GenerationCache, generation_cache
+from app.services.concurrency_limiter import AdaptiveLimiter, gemini_limiter, outcome_for
+from app.services.hedging import HedgePolicy, hedge_policy
+from app.services.model_router import ModelRouter, model_router
+from app.services.profiling import follow
+from app.services.text_preprocessor import preprocess_text, CHARS_PER_TOKEN
+from app.services.sampling import batch_order, trim_questions
+from app.services.dedup import NearDuplicateFilter
+from app.models import SamplingStrategy
+from app.services.retry_policy import (
+    RetryPolicy,
+    GeminiBlockedError,
+    EmptyResponseError,
+    classify,
+)
+from app.services.metrics import (
+    JobStats,
+    BATCH_DURATION,
+    GEMINI_ERRORS,
+    GEMINI_HEDGES,
+    GEMINI_MODEL_CALLS,
+    GEMINI_RETRIES,
+    MAX_TOKENS_TRUNCATIONS,
+    QUESTIONS_DEDUPLICATED,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -16,8 +44,9 @@ logger = logging.getLogger(__name__)
 MAX_OUTPUT_TOKENS = 65536  # 64k max output tokens
 REQUEST_TIMEOUT_MS = 60 * 10 * 1000  # 10 minutes for large documents
 PAGES_PER_BATCH = 100  # Process 600 pages at a time
-MAX_RETRIES = 3
-RETRY_DELAY = 2  # seconds
+
+# Worker threads for cancellable Gemini calls; abandoned calls finish here and are discarded
+_gemini_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="gemini")
 
 
 class OptionSchema(BaseModel):
@@ -46,8 +75,38 @@ class QuestionsResponse(BaseModel):
     )
 
 
+def _extract_usage(response) -> dict:
+    """Read token counts from a Gemini response's usage metadata (0 when absent)"""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return {}
+    return {
+        "prompt_tokens": getattr(usage, "prompt_token_count", None) or 0,
+        "output_tokens": getattr(usage, "candidates_token_count", None) or 0,
+        "thoughts_tokens": getattr(usage, "thoughts_token_count", None) or 0,
+        "total_tokens": getattr(usage, "total_token_count", None) or 0,
+    }
+
+
 class GeminiService:
-    def __init__(self):
+    def __init__(
+        self,
+        client=None,
+        cache: Optional[GenerationCache] = None,
+        limiter: Optional[AdaptiveLimiter] = None,
+        hedger: Optional[HedgePolicy] = None,
+        router: Optional[ModelRouter] = None,
+    ):
+        self.cache = cache
+        self.limiter = limiter
+        self.hedger = hedger
+        self.router = router
+
+        if client is not None:
+            # Injected client (e.g. FakeGeminiClient for benchmarks and load tests)
+            self.client = client
+            return
+
         # Configure HTTP options with timeout
         http_options = types.HttpOptions(
             timeout=REQUEST_TIMEOUT_MS,
@@ -110,47 +169,203 @@ class GeminiService:
 
         return batches
 
-    def _call_gemini_with_retry(
+    def _generate(
+        self,
+        prompt: str,
+        cancel_token: Optional[CancellationToken] = None,
+        model: Optional[str] = None,
+        on_discarded: Optional[Callable[[object, float], None]] = None,
+    ):
+        """
+        Send one generate_content request to `model` (settings.gemini_model by default).
+
+        With a cancel token the call runs on a worker thread and is abandoned
+        (JobCancelled is raised) as soon as the job is cancelled, instead of
+        holding the job until Gemini answers.
+
+        With a limiter the call first waits for a concurrency slot (queued
+        fairly per job). The slot is returned when the call really finishes,
+        even if it was abandoned, since it still counts against quota.
+
+        With a hedge policy, a call still running after the policy's latency
+        percentile gets one duplicate request; the first success wins and the
+        other request is abandoned. The loser is still billed, so when it
+        finishes, on_discarded is called with its response and latency.
+        """
+        request = {
+            "model": model or settings.gemini_model,
+            "contents": prompt,
+            "config": {
+                "response_mime_type": "application/json",
+                "response_json_schema": QuestionsResponse.model_json_schema(),
+                "max_output_tokens": MAX_OUTPUT_TOKENS,
+            },
+        }
+        key = cancel_token.job_id if cancel_token else "default"
+        send = self.client.models.generate_content
+        if self.limiter is not None:
+            self.limiter.acquire(key, cancel_token)
+            send = self._limited_send
+
+        if cancel_token is None and self.hedger is None:
+            return send(**request)
+
+        if self.hedger is not None:
+            self.hedger.record_call()
+        start = time.perf_counter()
+        hedge_after = self.hedger.hedge_delay(request["model"]) if self.hedger is not None else None
+        primary = _gemini_executor.submit(follow(send), **request)
+        pending = [primary]
+        while True:
+            done, _ = wait(pending, timeout=WAIT_SLICE_SECONDS, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.remove(future)
+                if future.exception() is not None:
+                    if not pending:
+                        raise future.exception()
+                    # The other request may still succeed
+                    continue
+                self._abandon(pending)
+                if on_discarded is not None:
+                    self._when_discarded_finishes(pending, start, on_discarded)
+                if self.hedger is not None:
+                    self.hedger.observe(request["model"], time.perf_counter() - start)
+                    if future is not primary:
+                        GEMINI_HEDGES.labels(result="won").inc()
+                    elif pending:
+                        GEMINI_HEDGES.labels(result="lost").inc()
+                return future.result()
+
+            if cancel_token is not None and cancel_token.is_cancelled():
+                self._abandon(pending)
+                raise JobCancelled(cancel_token.job_id)
+
+            if hedge_after is not None and time.perf_counter() - start >= hedge_after:
+                hedge_after = None  # At most one hedge per call
+                self._send_hedge(request, pending)
+
+    def _send_hedge(self, request: dict, pending: list):
+        """Duplicate a slow request if the hedge budget and the concurrency limit allow it"""
+        if not self.hedger.try_hedge():
+            GEMINI_HEDGES.labels(result="throttled").inc()
+            return
+        if self.limiter is not None:
+            if not self.limiter.try_acquire():
+                # Saturated: a duplicate would only add load
+                GEMINI_HEDGES.labels(result="throttled").inc()
+                return
+            pending.append(_gemini_executor.submit(follow(self._limited_send), **request))
+        else:
+            pending.append(_gemini_executor.submit(follow(self.client.models.generate_content), **request))
+        GEMINI_HEDGES.labels(result="sent").inc()
+        logger.info("Hedged a slow Gemini request")
+
+    def _abandon(self, futures: list):
+        """
+        Drop requests whose result is no longer needed. Requests not yet
+        started are cancelled; running ones finish on the executor and are
+        discarded, since the sync client cannot interrupt an HTTP call.
+        """
+        for future in futures:
+            if future.cancel() and self.limiter is not None:
+                # Never started, so _limited_send will not return the slot
+                self.limiter.release("error")
+
+    @staticmethod
+    def _when_discarded_finishes(futures: list, start: float, on_discarded: Callable[[object, float], None]):
+        """Hand each abandoned request that is still running to on_discarded once it succeeds"""
+        def finished(future):
+            if future.exception() is None:
+                on_discarded(future.result(), time.perf_counter() - start)
+
+        for future in futures:
+            if not future.cancelled():
+                future.add_done_callback(finished)
+
+    def _limited_send(self, **request):
+        """Call Gemini while holding a limiter slot, feeding the outcome back to the limiter"""
+        start = time.perf_counter()
+        try:
+            response = self.client.models.generate_content(**request)
+        except Exception as e:
+            self.limiter.release(outcome_for(e))
+            raise
+        self.limiter.release("success", time.perf_counter() - start, len(request["contents"]) // CHARS_PER_TOKEN)
+        return response
+
+    def _call_gemini_with_retry(self, prompt: str, batch_num: int, total_batches: int, **kwargs) -> str:
+        """Call Gemini API with retry logic and return the response text (see _call_gemini)"""
+        text_response, _, _ = self._call_gemini(prompt, batch_num, total_batches, **kwargs)
+        return text_response
+
+    def _route(self, prompt: str) -> str:
+        return self.router.choose(len(prompt)) if self.router else settings.gemini_model
+
+    def _call_gemini(
         self,
         prompt: str,
         batch_num: int,
         total_batches: int,
         progress_callback: Optional[Callable[[str], None]] = None,
-    ) -> str:
+        stats: Optional[JobStats] = None,
+        page_range: tuple[Optional[int], Optional[int]] = (None, None),
+        recorder: Optional[CassetteRecorder] = None,
+        cancel_token: Optional[CancellationToken] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        model: Optional[str] = None,
+    ) -> tuple[str, str, bool]:
         """
         Call Gemini API with retry logic.
 
+        Only retryable errors (429, 5xx, timeouts) are retried, as decided by
+        the retry policy; safety blocks and other 4xx errors fail at once.
+
         Args:
             prompt: The full prompt to send
             batch_num: Current batch number (1-indexed)
             total_batches: Total number of batches
             progress_callback: Optional callback to update progress
+            stats: Optional per-job stats collector for timings and counters
+            page_range: (start_page, end_page) covered by this batch, for recording
+            recorder: Optional cassette recorder for successful responses
+            cancel_token: Optional token; cancellation aborts the call and any backoff
+            retry_policy: Per-job retry budget (defaults to one built from settings)
+            model: Model for the first attempt when the caller already routed the call
 
         Returns:
-            Raw JSON response text
+            (raw JSON response text, model that produced it, whether it hit MAX_TOKENS)
+
+        Raises:
+            JobDeadlineExceeded: If the job's time budget runs out before a retry
         """
         last_error: Exception | None = None
-
-        for attempt in range(1, MAX_RETRIES + 1):
+        stats = stats or JobStats()
+        retry_policy = retry_policy or RetryPolicy.from_settings()
+        max_attempts = retry_policy.max_attempts
+
+        for attempt in range(1, max_attempts + 1):
+            if attempt > 1:
+                retry_policy.check_deadline()
+            # Routed per attempt, so a retry after timeouts can land on the fallback model
+            if attempt > 1 or model is None:
+                model = self._route(prompt)
+            attempt_start = time.perf_counter()
+            response = None
+
+            # A losing hedge is billed too; defaults bind this attempt, since it may finish after the loop moves on
+            def record_discarded(discarded, seconds, tries=attempt, served=model):
+                stats.record_usage(batch_num, tries, _extract_usage(discarded), seconds, "hedge_lost", model=served)
             try:
                 if progress_callback:
                     progress_callback(
-                        f"Processing batch {batch_num}/{total_batches} (attempt {attempt}/{MAX_RETRIES})"
+                        f"Processing batch {batch_num}/{total_batches} (attempt {attempt}/{max_attempts})"
                     )
 
                 logger.info(
-                    f"Batch {batch_num}/{total_batches}, Attempt {attempt}/{MAX_RETRIES}: Sending {len(prompt)} chars"
+                    f"Batch {batch_num}/{total_batches}, Attempt {attempt}/{max_attempts}: Sending {len(prompt)} chars to {model}"
                 )
 
-                response = self.client.models.generate_content(
-                    model=settings.gemini_model,
-                    contents=prompt,
-                    config={
-                        "response_mime_type": "application/json",
-                        "response_json_schema": QuestionsResponse.model_json_schema(),
-                        "max_output_tokens": MAX_OUTPUT_TOKENS,
-                    },
-                )
+                response = self._generate(prompt, cancel_token, model=model, on_discarded=record_discarded)
 
                 # Log finish reason for debugging
                 finish_reason = None
@@ -160,6 +375,8 @@ class GeminiService:
                         if response.candidates[0]
                         else None
                     )
+                    # SDK returns a FinishReason enum whose str() is "FinishReason.X"
+                    finish_reason = getattr(finish_reason, "value", finish_reason)
                     logger.info(
                         f"Batch {batch_num}/{total_batches} finish_reason: {finish_reason}"
                     )
@@ -172,46 +389,88 @@ class GeminiService:
 
                 # Check for safety blocks or empty responses
                 if not response.parts:
-                    error_msg = "Gemini returned an empty response."
                     if (
                         hasattr(response, "prompt_feedback")
                         and response.prompt_feedback
                     ):
                         if response.prompt_feedback.block_reason:
-                            error_msg = f"Gemini blocked the request: {response.prompt_feedback.block_reason}"
-                    raise ValueError(error_msg)
+                            raise GeminiBlockedError(
+                                f"Gemini blocked the request: {response.prompt_feedback.block_reason}"
+                            )
+                    raise EmptyResponseError("Gemini returned an empty response.")
 
                 # Check for MAX_TOKENS - incomplete response
-                if finish_reason and str(finish_reason).upper() in [
+                truncated = bool(finish_reason) and str(finish_reason).upper() in [
                     "MAX_TOKENS",
                     "LENGTH",
-                ]:
+                ]
+                if truncated:
                     logger.warning(
                         f"Batch {batch_num}/{total_batches} hit MAX_TOKENS limit. "
                         f"Response may be incomplete ({len(response_text)} chars). "
                         f"Consider reducing batch size or splitting further."
                     )
+                    MAX_TOKENS_TRUNCATIONS.inc()
+                    stats.incr("max_tokens_truncations")
                     # Still return the partial response - we'll handle it in validation
 
+                elapsed = time.perf_counter() - attempt_start
+                BATCH_DURATION.labels(outcome="success").observe(elapsed)
+                stats.observe("generate", elapsed)
+                usage = _extract_usage(response)
+                stats.record_usage(batch_num, attempt, usage, elapsed, "success", model=model)
+                GEMINI_MODEL_CALLS.labels(model=model, outcome="success").inc()
+                if self.router:
+                    self.router.record(model, "success", elapsed)
+                if recorder:
+                    recorder.record(
+                        batch_num, page_range, prompt, response_text,
+                        str(finish_reason) if finish_reason else None, elapsed, usage, model,
+                    )
+
                 logger.info(
                     f"Batch {batch_num}/{total_batches} completed with finish_reason: {finish_reason}"
                 )
-                return response_text
+                return response_text, model, truncated
+
+            except JobCancelled:
+                raise
 
             except Exception as e:
                 last_error = e
+                elapsed = time.perf_counter() - attempt_start
+                BATCH_DURATION.labels(outcome="error").observe(elapsed)
+                stats.observe("generate", elapsed)
+                # Blocked/empty responses still bill tokens; API errors have no response
+                stats.record_usage(
+                    batch_num, attempt, _extract_usage(response), elapsed, "error", model=model
+                )
+                GEMINI_MODEL_CALLS.labels(model=model, outcome="error").inc()
+                if self.router:
+                    self.router.record(model, outcome_for(e))
                 logger.warning(
-                    f"Batch {batch_num}/{total_batches}, Attempt {attempt}/{MAX_RETRIES} failed: {e}"
+                    f"Batch {batch_num}/{total_batches}, Attempt {attempt}/{max_attempts} failed: {e}"
                 )
 
-                if attempt < MAX_RETRIES:
-                    delay = RETRY_DELAY * (2 ** (attempt - 1))  # Exponential backoff
-                    logger.info(f"Retrying in {delay} seconds...")
-                    time.sleep(delay)
-                else:
+                error_class = classify(e)
+                GEMINI_ERRORS.labels(
+                    reason=error_class.reason, retryable=str(error_class.retryable).lower()
+                ).inc()
+
+                delay = retry_policy.next_delay(attempt, e)
+                if delay is None:
                     logger.error(
-                        f"Batch {batch_num}/{total_batches} failed after {MAX_RETRIES} attempts"
+                        f"Batch {batch_num}/{total_batches} giving up after {attempt} attempt(s) ({error_class.reason})"
                     )
+                    break
+
+                GEMINI_RETRIES.inc()
+                stats.incr("retries")
+                logger.info(f"Retrying in {delay:.1f} seconds...")
+                if cancel_token:
+                    cancel_token.wait(delay)
+                else:
+                    time.sleep(delay)
 
         # This should never happen as we always catch exceptions, but satisfies type checker
         if last_error is None:
@@ -220,6 +479,52 @@ class GeminiService:
             )
         raise last_error
 
+    def _generate_batch(
+        self,
+        prompt_parts: tuple[str, str, str],
+        stats: JobStats,
+        prompt: str,
+        **call_kwargs,
+    ) -> list[dict]:
+        """
+        Return parsed questions for one batch, skipping Gemini on a cache hit.
+
+        The call is routed before the cache lookup and the model is part of
+        the key, so questions from the fast or fallback model are only reused
+        for calls routed to that same model. Only clean responses are cached:
+        a truncated one or one that failed schema validation is used for this
+        run but not replayed into later retries and resubmissions. Lookups
+        are skipped while a cassette recorder is attached, so the cassette
+        holds a real response for every batch.
+
+        Args:
+            prompt_parts: (system_prompt, custom_prompt, batch_text) the cache key is built from
+            stats: Per-job stats collector
+            prompt: Full prompt sent to Gemini
+            **call_kwargs: Other arguments for _call_gemini
+
+        Returns:
+            List of question dictionaries from _parse_gemini_response
+        """
+        model = self._route(prompt)
+        if self.cache is not None and call_kwargs.get("recorder") is None:
+            cached = self.cache.get(self.cache.key(model, *prompt_parts))
+            if cached is not None:
+                stats.incr("cache_hits")
+                logger.info(
+                    f"Batch {call_kwargs['batch_num']}/{call_kwargs['total_batches']} served from cache ({len(cached)} questions)"
+                )
+                return cached
+
+        text_response, served_by, truncated = self._call_gemini(prompt, stats=stats, model=model, **call_kwargs)
+        with stats.stage("parse"):
+            questions, validated = self._parse_questions(text_response)
+
+        if self.cache is not None and not truncated and validated:
+            # A retry may have been rerouted; file the result under the model that wrote it
+            self.cache.put(self.cache.key(served_by, *prompt_parts), questions)
+        return questions
+
     def _parse_gemini_response(self, text_response: str) -> list[dict]:
         """
         Parse and validate Gemini JSON response.
@@ -230,6 +535,16 @@ class GeminiService:
         Returns:
             List of question dictionaries
         """
+        return self._parse_questions(text_response)[0]
+
+    def _parse_questions(self, text_response: str) -> tuple[list[dict], bool]:
+        """
+        Parse a Gemini JSON response (see _parse_gemini_response).
+
+        Returns:
+            (question dictionaries, whether they passed schema validation
+            rather than coming from the fallback parser)
+        """
         logger.info(f"Parsing Gemini response ({len(text_response)} chars)")
 
         # Clean response (remove markdown code blocks if present)
@@ -248,7 +563,7 @@ class GeminiService:
             validated_response = QuestionsResponse.model_validate_json(json_string)
             question_count = len(validated_response.questions)
             logger.info(f"Successfully validated {question_count} questions")
-            return [q.model_dump() for q in validated_response.questions]
+            return [q.model_dump() for q in validated_response.questions], True
         except json.JSONDecodeError as e:
             logger.error(
                 f"Failed to parse JSON from Gemini: {e}. "
@@ -269,12 +584,12 @@ class GeminiService:
                     logger.warning(
                         f"Using fallback parsing, got {len(response_data['questions'])} questions"
                     )
-                    return response_data["questions"]
+                    return response_data["questions"], False
                 elif isinstance(response_data, list):
                     logger.warning(
                         f"Using fallback parsing (list format), got {len(response_data)} items"
                     )
-                    return response_data
+                    return response_data, False
                 else:
                     raise ValueError(
                         "Gemini response does not match expected structure"
@@ -284,28 +599,130 @@ class GeminiService:
                 logger.error(f"JSON string length: {len(json_string)} chars")
                 raise ValueError(f"Failed to parse Gemini response: {str(e)}")
 
+    def _transform_questions(
+        self,
+        raw_questions: list,
+        timestamp: Optional[int] = None,
+        start_index: int = 0,
+    ) -> list[dict]:
+        """
+        Transform parsed Gemini questions to the frontend Question shape and add unique IDs.
+
+        Args:
+            raw_questions: Question dictionaries from _parse_gemini_response
+            timestamp: Stamp used in the IDs (defaults to now)
+            start_index: Index of the first question, for IDs continuing an earlier batch
+
+        Returns:
+            List of processed question dictionaries
+        """
+        processed_questions = []
+        timestamp = timestamp or int(time.time())
+
+        for i, q in enumerate(raw_questions):
+            if not isinstance(q, dict):
+                raise ValueError(
+                    f"Gemini returned an invalid item at index {i}: expected dict, got {type(q).__name__}"
+                )
+
+            # Parse correctAnswer list (e.g., ["A"] or ["A", "C"])
+            correct_answers = q.get("correctAnswer", [])
+
+            # Transform to match Frontend 'Question' interface
+            processed_q = {
+                "id": f"q-{timestamp}-{start_index + i}",
+                "questionText": q.get("questionText", ""),
+                "correctAnswers": correct_answers,
+                "choices": q.get("options", []),
+            }
+
+            processed_questions.append(processed_q)
+
+        return processed_questions
+
+    @staticmethod
+    def _in_page_order(batch_results: dict[int, list]) -> list:
+        """Flatten per-batch questions in document order"""
+        return [q for position in sorted(batch_results) for q in batch_results[position]]
+
     def generate_questions(
         self,
-        pdf_buffer: bytes,
+        pdf_buffer: Optional[bytes],
         system_prompt: str,
         custom_prompt: str,
         schema: Optional[str] = None,
         progress_callback: Optional[Callable[[str], None]] = None,
+        stats: Optional[JobStats] = None,
+        recorder: Optional[CassetteRecorder] = None,
+        cancel_token: Optional[CancellationToken] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        target_questions: Optional[int] = None,
+        sampling: SamplingStrategy = SamplingStrategy.SEQUENTIAL,
+        batch_callback: Optional[Callable[[list[dict]], None]] = None,
+        id_stamp: Optional[int] = None,
+        page_index: Optional[dict] = None,
     ) -> list[dict]:
         """
         Generate exam questions from PDF using Gemini API with structured output.
         Supports batching for large documents with automatic retry on failure.
+        Near-duplicates of earlier questions are dropped as each batch is
+        parsed (settings.dedup_enabled / dedup_threshold).
+        With target_questions set, batches stop being dispatched once enough
+        questions exist and the result is trimmed to the target. With
+        batch_callback set, each batch's questions are handed over as soon as
+        they are parsed and the result is those questions in completion order.
+        With page_index set (a prepared document), its text is used and the
+        PDF is not read.
 
         Args:
-            pdf_buffer: The PDF file content as bytes
+            pdf_buffer: The PDF file content as bytes (None when page_index is given)
             system_prompt: System-level instructions for question generation
             custom_prompt: User-specific instructions for question generation
             schema: (IGNORED) Legacy parameter kept for API compatibility
             progress_callback: Optional callback function to report progress updates
+            stats: Optional per-job stats collector for stage timings
+            recorder: Optional cassette recorder capturing each batch's response
+            cancel_token: Optional token checked during extraction, between batches and during retries
+            retry_policy: Optional per-job retry budget shared by all batches
+            target_questions: Optional number of questions the job needs
+            sampling: Batch order when a target is set (sequential or spread across the document)
+            batch_callback: Optional callback receiving each batch's transformed questions (progressive mode);
+                a target is enforced per batch instead of by trimming at the end
+            id_stamp: Optional stamp for question IDs, so a re-run overwrites the questions it committed before
+            page_index: Optional page index artifact from document preparation (see page_index.py)
 
         Returns:
             List of processed question dictionaries matching frontend Question interface
+
+        Raises:
+            JobCancelled: If the job is cancelled; carries the questions generated so far
         """
+        stats = stats or JobStats()
+        retry_policy = retry_policy or RetryPolicy.from_settings()
+        id_stamp = id_stamp or int(time.time())
+
+        # Questions already handed to batch_callback, in commit order
+        committed: list[dict] = []
+
+        # One filter per job, so later batches are checked against every earlier one
+        dedup_filter = NearDuplicateFilter(settings.dedup_threshold) if settings.dedup_enabled else None
+
+        def deduplicate(batch_questions: list) -> list:
+            if not dedup_filter:
+                return batch_questions
+            dropped_before = dedup_filter.dropped
+            kept = dedup_filter.filter(batch_questions)
+            QUESTIONS_DEDUPLICATED.inc(dedup_filter.dropped - dropped_before)
+            stats.set_info("dedup", dedup_filter.report())
+            return kept
+
+        def commit(batch_questions: list):
+            if target_questions:
+                batch_questions = batch_questions[:max(0, target_questions - len(committed))]
+            transformed = self._transform_questions(batch_questions, id_stamp, start_index=len(committed))
+            if transformed:
+                batch_callback(transformed)
+                committed.extend(transformed)
 
         # Combine prompts
         prompt = f"""
@@ -315,21 +732,40 @@ class GeminiService:
 """
 
         try:
-            # Extract text from PDF
-            logger.info("Extracting text from PDF...")
-            if progress_callback:
-                progress_callback("Extracting text from PDF...")
+            if page_index:
+                # Extracted when the document was prepared
+                pdf_text = page_index["text"]
+                page_count = page_index["pageCount"]
+                stats.set_info("extraction", {**page_index["extraction"], "prepared": True})
+            else:
+                # Extract text from PDF
+                logger.info("Extracting text from PDF...")
+                if progress_callback:
+                    progress_callback("Extracting text from PDF...")
 
-            pdf_text = pdf_service.extract_text(pdf_buffer)
-            pdf_metadata = pdf_service.get_pdf_metadata(pdf_buffer)
-            page_count = pdf_metadata.get("page_count", 0)
+                with stats.stage("extract"):
+                    pdf_text = pdf_service.extract_text(pdf_buffer, cancel_token=cancel_token, stats=stats)
+                    pdf_metadata = pdf_service.get_pdf_metadata(pdf_buffer)
+                page_count = pdf_metadata.get("page_count", 0)
 
             logger.info(
                 f"PDF extraction complete: {page_count} pages, {len(pdf_text)} characters"
             )
 
+            # Strip boilerplate so batches carry only content pages
+            content_pages = page_count
+            if settings.preprocess_enabled:
+                with stats.stage("preprocess"):
+                    pdf_text, preprocessing = preprocess_text(
+                        pdf_text,
+                        min_repeat_ratio=settings.preprocess_repeat_ratio,
+                        min_page_chars=settings.preprocess_min_page_chars,
+                    )
+                stats.set_info("preprocessing", preprocessing)
+                content_pages = preprocessing["pages_after"]
+
             # Determine if batching is needed
-            use_batching = page_count > PAGES_PER_BATCH
+            use_batching = content_pages > PAGES_PER_BATCH
 
             if use_batching:
                 logger.info(
@@ -342,38 +778,80 @@ class GeminiService:
                 batches = self._split_text_by_pages(pdf_text, PAGES_PER_BATCH)
                 logger.info(f"Split into {len(batches)} batches")
 
-                all_questions = []
-                for batch_idx, (batch_text, start_page, end_page) in enumerate(
-                    batches, 1
-                ):
-                    logger.info(
-                        f"Processing batch {batch_idx}/{len(batches)}: pages {start_page}-{end_page}"
-                    )
-
-                    # Create batch-specific prompt
-                    batch_prompt = f"""{prompt}
+                # Questions per batch position, so output keeps page order whatever the dispatch order
+                batch_results: dict[int, list] = {}
+                collected = 0
+                order = batch_order(len(batches), sampling if target_questions else SamplingStrategy.SEQUENTIAL)
+                try:
+                    for position in order:
+                        if target_questions and collected >= target_questions:
+                            break
+                        if cancel_token:
+                            cancel_token.raise_if_cancelled()
+                        if batch_results:
+                            # Past the budget, leave the remaining batches to a redelivery
+                            retry_policy.check_deadline()
+
+                        batch_idx = position + 1
+                        batch_text, start_page, end_page = batches[position]
+
+                        logger.info(
+                            f"Processing batch {batch_idx}/{len(batches)}: pages {start_page}-{end_page}"
+                        )
+
+                        # Create batch-specific prompt
+                        batch_prompt = f"""{prompt}
 
 DOCUMENT CONTENT (Pages {start_page}-{end_page}):
 {batch_text}
 """
 
-                    # Call with retry
-                    text_response = self._call_gemini_with_retry(
-                        prompt=batch_prompt,
-                        batch_num=batch_idx,
-                        total_batches=len(batches),
-                        progress_callback=progress_callback,
-                    )
-
-                    # Parse batch response
-                    batch_questions = self._parse_gemini_response(text_response)
-                    all_questions.extend(batch_questions)
-
-                    logger.info(
-                        f"Batch {batch_idx}/{len(batches)} added {len(batch_questions)} questions (total: {len(all_questions)})"
+                        # Call with retry (or reuse cached questions for identical batches)
+                        batch_questions = self._generate_batch(
+                            prompt_parts=(system_prompt, custom_prompt, batch_text),
+                            stats=stats,
+                            prompt=batch_prompt,
+                            batch_num=batch_idx,
+                            total_batches=len(batches),
+                            progress_callback=progress_callback,
+                            page_range=(start_page, end_page),
+                            recorder=recorder,
+                            cancel_token=cancel_token,
+                            retry_policy=retry_policy,
+                        )
+                        batch_questions = deduplicate(batch_questions)
+                        batch_results[position] = batch_questions
+                        collected += len(batch_questions)
+                        if batch_callback:
+                            commit(batch_questions)
+
+                        logger.info(
+                            f"Batch {batch_idx}/{len(batches)} added {len(batch_questions)} questions (total: {collected})"
+                        )
+                except JobCancelled as cancelled:
+                    # Hand back what earlier batches produced so the caller can keep it
+                    raise JobCancelled(
+                        cancelled.job_id,
+                        partial_questions=committed if batch_callback else self._transform_questions(
+                            self._in_page_order(batch_results), id_stamp
+                        ),
                     )
 
-                raw_questions = all_questions
+                raw_questions = self._in_page_order(batch_results)
+                if target_questions:
+                    skipped = len(batches) - len(batch_results)
+                    stats.set_info("sampling", {
+                        "target_questions": target_questions,
+                        "strategy": sampling.value,
+                        "batches_total": len(batches),
+                        "batches_run": len(batch_results),
+                        "batches_skipped": skipped,
+                        "pages_run": [f"{batches[i][1]}-{batches[i][2]}" for i in sorted(batch_results)],
+                    })
+                    if skipped:
+                        logger.info(
+                            f"Target of {target_questions} questions reached after {len(batch_results)}/{len(batches)} batches"
+                        )
 
             else:
                 logger.info(
@@ -391,47 +869,54 @@ DOCUMENT CONTENT:
 {pdf_text}
 """
 
-                # Single request with retry
-                text_response = self._call_gemini_with_retry(
+                # Single request with retry (or cached questions)
+                raw_questions = self._generate_batch(
+                    prompt_parts=(system_prompt, custom_prompt, pdf_text),
+                    stats=stats,
                     prompt=full_prompt,
                     batch_num=1,
                     total_batches=1,
                     progress_callback=progress_callback,
+                    page_range=(1, page_count),
+                    recorder=recorder,
+                    cancel_token=cancel_token,
+                    retry_policy=retry_policy,
                 )
+                raw_questions = deduplicate(raw_questions)
+                if batch_callback:
+                    commit(raw_questions)
 
-                # Parse response
-                raw_questions = self._parse_gemini_response(text_response)
-
-            logger.info(f"Successfully generated {len(raw_questions)} questions")
-
-            # Transform and add unique IDs to questions
-            processed_questions = []
-            timestamp = int(time.time())
+            if dedup_filter and dedup_filter.dropped:
+                logger.info(f"Dropped {dedup_filter.dropped} near-duplicate questions")
 
-            for i, q in enumerate(raw_questions):
-                if not isinstance(q, dict):
-                    raise ValueError(
-                        f"Gemini returned an invalid item at index {i}: expected dict, got {type(q).__name__}"
-                    )
+            if batch_callback:
+                logger.info(f"Successfully generated {len(committed)} questions (committed progressively)")
+                return committed
 
-                # Parse correctAnswer list (e.g., ["A"] or ["A", "C"])
-                correct_answers = q.get("correctAnswer", [])
-
-                # Transform to match Frontend 'Question' interface
-                processed_q = {
-                    "id": f"q-{timestamp}-{i}",
-                    "questionText": q.get("questionText", ""),
-                    "correctAnswers": correct_answers,
-                    "choices": q.get("options", []),
-                }
-
-                processed_questions.append(processed_q)
+            raw_questions = trim_questions(raw_questions, target_questions, sampling)
+            logger.info(f"Successfully generated {len(raw_questions)} questions")
 
-            return processed_questions
+            return self._transform_questions(raw_questions, id_stamp)
 
+        except JobCancelled:
+            raise
         except Exception as e:
             logger.error(f"Error in generate_questions: {e}")
             raise e
 
 
-gemini_service = GeminiService()
+if settings.backend == "memory":
+    from testing.fakes import FakeGeminiClient
+    gemini_service = GeminiService(
+        client=FakeGeminiClient.from_profile(
+            settings.fake_gemini_profile, latency=settings.fake_gemini_latency
+        ),
+        cache=generation_cache,
+        limiter=gemini_limiter,
+        hedger=hedge_policy,
+        router=model_router,
+    )
+else:
+    gemini_service = GeminiService(
+        cache=generation_cache, limiter=gemini_limiter, hedger=hedge_policy, router=model_router
+    )
@@ -0,0 +1,135 @@
+import copy
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+from app.config import settings
+from app.services.storage_service import storage_service
+from app.services.metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    """
+    Two-tier cache of parsed Gemini questions per batch.
+
+    Keys combine the model, both prompts and the batch's page text, so a
+    re-run with the same prompts, or a changed document that shares most
+    pages, skips Gemini for every unchanged batch. The local tier is an
+    in-process LRU bounded by bytes; the GCS tier is shared by all
+    instances. The local tier hands out copies, so callers that edit the
+    questions (dedup, ID assignment) never change a cached entry. Both
+    honor the TTL; GCS entries are checked on read and expired or
+    unreadable objects are deleted then, so entries that are read again
+    do not pile up (a bucket lifecycle rule on the prefix removes the
+    ones never read again).
+    """
+
+    def __init__(self, ttl_seconds: int, max_bytes: int, remote=None, remote_prefix: str = "generation-cache/"):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.remote = remote
+        self.remote_prefix = remote_prefix
+        self._local: OrderedDict[str, tuple[float, int, list[dict]]] = OrderedDict()
+        self._local_bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model: str, system_prompt: str, custom_prompt: str, batch_text: str) -> str:
+        parts = [model, _sha256(system_prompt), _sha256(custom_prompt), _sha256(batch_text)]
+        return _sha256("\0".join(parts))
+
+    def _expired(self, stored_at: float) -> bool:
+        return time.time() - stored_at > self.ttl_seconds
+
+    def _put_local(self, key: str, stored_at: float, questions: list[dict], size: int):
+        with self._lock:
+            if key in self._local:
+                self._local_bytes -= self._local.pop(key)[1]
+            self._local[key] = (stored_at, size, questions)
+            self._local_bytes += size
+            while self._local_bytes > self.max_bytes and self._local:
+                _, (_, evicted_size, _) = self._local.popitem(last=False)
+                self._local_bytes -= evicted_size
+
+    def get(self, key: str) -> Optional[list[dict]]:
+        """Return cached questions for a batch key, or None on a miss"""
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None:
+                if self._expired(entry[0]):
+                    self._local_bytes -= self._local.pop(key)[1]
+                else:
+                    self._local.move_to_end(key)
+                    CACHE_LOOKUPS.labels(tier="local", result="hit").inc()
+                    return copy.deepcopy(entry[2])
+        CACHE_LOOKUPS.labels(tier="local", result="miss").inc()
+
+        if self.remote is None:
+            return None
+        path = f"{self.remote_prefix}{key}.json"
+        try:
+            data = self.remote.download_bytes(path)
+        except FileNotFoundError:
+            CACHE_LOOKUPS.labels(tier="remote", result="miss").inc()
+            return None
+        except Exception as e:
+            logger.warning(f"Generation cache read failed for {key}: {e}")
+            return None
+
+        try:
+            record = json.loads(data)
+            stored_at, questions = float(record["stored_at"]), record["questions"]
+            if not isinstance(questions, list):
+                raise ValueError("questions is not a list")
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Discarding unreadable generation cache entry {key}: {e}")
+            CACHE_LOOKUPS.labels(tier="remote", result="corrupt").inc()
+            self._delete_remote(path)
+            return None
+
+        if self._expired(stored_at):
+            CACHE_LOOKUPS.labels(tier="remote", result="expired").inc()
+            self._delete_remote(path)
+            return None
+        CACHE_LOOKUPS.labels(tier="remote", result="hit").inc()
+        self._put_local(key, stored_at, copy.deepcopy(questions), len(data))
+        return questions
+
+    def _delete_remote(self, path: str):
+        try:
+            self.remote.delete(path)
+        except Exception as e:
+            logger.warning(f"Generation cache delete failed for {path}: {e}")
+
+    def put(self, key: str, questions: list[dict]):
+        """Store a batch's parsed questions in both tiers; failures are logged, never raised"""
+        stored_at = time.time()
+        data = json.dumps({"stored_at": stored_at, "questions": questions}).encode("utf-8")
+        self._put_local(key, stored_at, copy.deepcopy(questions), len(data))
+        if self.remote is None:
+            return
+        try:
+            self.remote.upload_bytes(f"{self.remote_prefix}{key}.json", data, content_type="application/json")
+        except Exception as e:
+            logger.warning(f"Generation cache write failed for {key}: {e}")
+
+
+# Singleton instance (None when disabled)
+generation_cache = (
+    GenerationCache(
+        ttl_seconds=settings.generation_cache_ttl,
+        max_bytes=settings.generation_cache_max_bytes,
+        remote=storage_service if settings.generation_cache_remote else None,
+    )
+    if settings.generation_cache_enabled
+    else None
+)
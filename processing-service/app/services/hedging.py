@@ -0,0 +1,68 @@
+import threading
+from typing import Optional
+from app.config import settings
+from app.services.latency_stats import LatencyWindow
+
+
+class HedgePolicy:
+    """
+    Decides when a slow Gemini call gets a duplicate (hedged) request.
+
+    A hedge is sent once a call has run longer than the given percentile of
+    recent call latencies to the same model (after min_samples observations
+    of it), so routing traffic to a faster or slower model does not skew
+    the trigger. Hedges are paid
+    for from a token bucket: every call adds max_fraction of a token and a
+    hedge spends one, so hedges stay below max_fraction of traffic over time
+    with a small burst allowance.
+    """
+
+    def __init__(self, percentile: float, max_fraction: float, min_samples: int = 20, window: int = 200):
+        self.percentile = percentile
+        self.max_fraction = max_fraction
+        self.min_samples = min_samples
+        self.window = window
+        self.latencies: dict[str, LatencyWindow] = {}
+        self._tokens = 0.0
+        self._max_tokens = max(1.0, max_fraction * 20)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls) -> "HedgePolicy":
+        return cls(
+            percentile=settings.gemini_hedge_percentile,
+            max_fraction=settings.gemini_hedge_max_fraction,
+            min_samples=settings.gemini_hedge_min_samples,
+        )
+
+    def _window(self, model: str) -> LatencyWindow:
+        with self._lock:
+            return self.latencies.setdefault(model, LatencyWindow(self.window))
+
+    def observe(self, model: str, seconds: float):
+        """Record the latency a caller saw for one call to model"""
+        self._window(model).observe(seconds)
+
+    def record_call(self):
+        """Earn hedge budget for a primary call"""
+        with self._lock:
+            self._tokens = min(self._max_tokens, self._tokens + self.max_fraction)
+
+    def hedge_delay(self, model: str) -> Optional[float]:
+        """Seconds after which a call to model should be hedged, or None until enough samples exist"""
+        window = self._window(model)
+        if len(window) < self.min_samples:
+            return None
+        return window.percentile(self.percentile)
+
+    def try_hedge(self) -> bool:
+        """Spend budget for one hedge; False when hedging would exceed max_fraction"""
+        with self._lock:
+            if self._tokens < 1.0 - 1e-9:  # Tolerate float drift from fractional earnings
+                return False
+            self._tokens = max(0.0, self._tokens - 1.0)
+            return True
+
+
+# Singleton instance (None when disabled)
+hedge_policy = HedgePolicy.from_settings() if settings.gemini_hedging_enabled else None
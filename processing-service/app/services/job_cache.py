@@ -0,0 +1,113 @@
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+from app.config import settings
+from app.services.firestore_service import firestore_service
+from app.services.metrics import JOB_CACHE_LOOKUPS
+
+
+class JobCache:
+    """
+    Short-TTL in-process cache of job documents for the status endpoints.
+
+    Dashboards poll the same jobs every few seconds; within ttl_seconds a
+    poll is answered without touching Firestore. Misses for several jobs
+    are fetched with one batched read. Jobs that do not exist are cached
+    too, so polling a deleted job does not read on every request.
+    Job writes made through the store on this instance (status updates of
+    jobs running here, cancellation, compaction) invalidate the entry.
+    Writes made by other instances, such as Cloud Tasks deliveries served
+    elsewhere, show up once the entry expires, up to ttl_seconds later.
+    A read that was in flight when its job was invalidated is returned to
+    its caller but not cached, since it may predate the write.
+    """
+
+    def __init__(self, store, ttl_seconds: float, max_entries: int):
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, Optional[dict]]] = OrderedDict()
+        # Per job with reads in flight: how many reads, and how many invalidations since they started
+        self._in_flight: dict[str, int] = {}
+        self._invalidations: dict[str, int] = {}
+        self._lock = threading.Lock()
+        store.job_write_listeners.append(self.invalidate)
+
+    def get_many(self, job_ids: list[str]) -> dict[str, Optional[dict]]:
+        """Return {job_id: job or None} for every requested ID"""
+        found: dict[str, Optional[dict]] = {}
+        missing: list[str] = []
+        now = time.monotonic()
+        with self._lock:
+            for job_id in dict.fromkeys(job_ids):
+                entry = self._entries.get(job_id)
+                if entry is not None and entry[0] > now:
+                    found[job_id] = entry[1]
+                else:
+                    missing.append(job_id)
+        JOB_CACHE_LOOKUPS.labels(result="hit").inc(len(found))
+        if not missing:
+            return found
+
+        JOB_CACHE_LOOKUPS.labels(result="miss").inc(len(missing))
+        with self._lock:
+            started = {}
+            for job_id in missing:
+                self._in_flight[job_id] = self._in_flight.get(job_id, 0) + 1
+                started[job_id] = self._invalidations.get(job_id, 0)
+
+        fetched: dict[str, dict] = {}
+        try:
+            if len(missing) == 1:
+                job = self.store.get_job(missing[0])
+                fetched = {missing[0]: job} if job else {}
+            else:
+                fetched = self.store.get_jobs(missing)
+        finally:
+            expires_at = time.monotonic() + self.ttl_seconds
+            with self._lock:
+                for job_id in missing:
+                    found[job_id] = fetched.get(job_id)
+                    fresh = self._invalidations.get(job_id, 0) == started[job_id]
+                    if self.ttl_seconds > 0 and fresh:
+                        self._entries[job_id] = (expires_at, found[job_id])
+                        self._entries.move_to_end(job_id)
+                    self._in_flight[job_id] -= 1
+                    if not self._in_flight[job_id]:
+                        del self._in_flight[job_id]
+                        self._invalidations.pop(job_id, None)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return found
+
+    def get(self, job_id: str) -> Optional[dict]:
+        return self.get_many([job_id])[job_id]
+
+    def invalidate(self, job_id: str):
+        with self._lock:
+            self._entries.pop(job_id, None)
+            if job_id in self._in_flight:
+                self._invalidations[job_id] = self._invalidations.get(job_id, 0) + 1
+
+
+def etag_for(payload) -> str:
+    """Strong ETag over the JSON form of a response body"""
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return '"' + hashlib.sha256(body.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header covers etag (weak comparison, as RFC 9110 asks)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in candidates
+
+
+# Singleton instance
+job_cache = JobCache(firestore_service, settings.job_cache_ttl, settings.job_cache_max_entries)
@@ -0,0 +1,36 @@
+import hashlib
+from typing import Optional
+from app.models import ACTIVE_JOB_STATUSES
+
+
+def request_key(
+    doc_id: str,
+    system_prompt_id: str,
+    custom_prompt_id: str,
+    system_prompt: str,
+    custom_prompt: str,
+    target_questions: Optional[int] = None,
+    sampling: str = "sequential",
+    progressive: bool = False,
+) -> str:
+    """
+    Key identifying a unique processing request.
+
+    Includes the prompt contents, so editing a prompt after a job started
+    produces a new key (and a new job) rather than joining the old one.
+    A target question count, sampling strategy and progressive commits
+    are part of the key too, since they change what the job writes;
+    requests without them keep their original key.
+    """
+    content_hash = hashlib.sha256(f"{system_prompt}\0{custom_prompt}".encode("utf-8")).hexdigest()
+    raw = f"{doc_id}\0{system_prompt_id}\0{custom_prompt_id}\0{content_hash}"
+    if target_questions:
+        raw += f"\0{target_questions}\0{sampling}"
+    if progressive:
+        raw += "\0progressive"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def is_joinable(job: dict) -> bool:
+    """A duplicate request may join a job that is still running and not being cancelled"""
+    return job.get("status") in ACTIVE_JOB_STATUSES and not job.get("cancel_requested")
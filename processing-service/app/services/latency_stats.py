@@ -0,0 +1,24 @@
+import threading
+from collections import deque
+from typing import Optional
+from app.services.metrics import _percentile
+
+
+class LatencyWindow:
+    """Rolling window of the most recent call latencies, safe to share across threads"""
+
+    def __init__(self, size: int = 200):
+        self._samples: deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            values = list(self._samples)
+        return _percentile(values, pct)
@@ -0,0 +1,133 @@
+import time
+import datetime
+from typing import Optional
+from app.config import settings
+from app.models import JobStatus
+from app.services.metrics import USAGE_FIELDS
+
+# Jobs the compactor may roll up; pending and processing jobs are never touched
+FINISHED_STATUSES = (JobStatus.COMPLETED.value, JobStatus.FAILED.value, JobStatus.CANCELLED.value)
+
+# Upper bounds (seconds) of the job duration histogram kept in daily summaries
+DURATION_BUCKETS = (30, 60, 120, 300, 600, 1200)
+
+
+def expire_at(seconds: float, now: Optional[float] = None) -> datetime.datetime:
+    """
+    Value for an expireAt field, `seconds` from now.
+
+    Firestore TTL policies only act on timestamp fields, so this is a
+    datetime rather than the epoch integers used elsewhere.
+    """
+    now = datetime.datetime.now(datetime.timezone.utc) if now is None else (
+        datetime.datetime.fromtimestamp(now, datetime.timezone.utc)
+    )
+    return now + datetime.timedelta(seconds=seconds)
+
+
+def job_expire_at() -> datetime.datetime:
+    """TTL backstop for jobs, their keys and groups, in case the compactor never reaches them"""
+    return expire_at(settings.job_ttl + settings.job_ttl_grace)
+
+
+def _status(job: dict) -> str:
+    # Records written in-process may hold the JobStatus member itself
+    status = job.get("status")
+    return getattr(status, "value", str(status))
+
+
+def cancel_updates(job: dict, keep_partial: bool = False) -> Optional[dict]:
+    """
+    Writes that cancel a job, or None when it can no longer be cancelled.
+
+    Pending jobs and failed jobs still waiting for a redelivery are
+    cancelled outright (the executor skips CANCELLED jobs). Processing
+    jobs are flagged and stop cooperatively.
+    """
+    status = _status(job)
+    if status == JobStatus.PROCESSING.value:
+        return {"cancel_requested": True, "keep_partial": keep_partial}
+    if status == JobStatus.PENDING.value or (status == JobStatus.FAILED.value and job.get("retryable")):
+        return {
+            "status": JobStatus.CANCELLED,
+            "retryable": False,
+            "error": "Cancelled by user",
+            "completed_at": int(time.time()),
+        }
+    return None
+
+
+def is_compactable(job: dict, completed_before: int) -> bool:
+    """
+    Finished before the cutoff (epoch seconds).
+
+    The cutoff is job_ttl behind now, far past the last redelivery of a
+    retryable failure, so failed jobs are compacted like the others.
+    """
+    return (
+        _status(job) in FINISHED_STATUSES
+        and bool(job.get("completed_at"))
+        and job["completed_at"] < completed_before
+    )
+
+
+def summary_day(job: dict) -> str:
+    """UTC day (YYYY-MM-DD) a finished job is summarized under"""
+    completed = datetime.datetime.fromtimestamp(job["completed_at"], datetime.timezone.utc)
+    return completed.strftime("%Y-%m-%d")
+
+
+def _duration_bucket(seconds: float) -> str:
+    for bound in DURATION_BUCKETS:
+        if seconds <= bound:
+            return f"le_{bound}"
+    return f"over_{DURATION_BUCKETS[-1]}"
+
+
+def rollup_jobs(jobs: list[dict]) -> dict[str, dict]:
+    """
+    Daily summary increments for a set of finished jobs.
+
+    Every value is a count or a sum, so the increments of separate
+    compaction runs add up to the same summary however the jobs of one
+    day were split between runs. Durations keep a histogram instead of
+    percentiles for the same reason.
+
+    Returns:
+        {day: nested dict of numbers to add to that day's summary}
+    """
+    days: dict[str, dict] = {}
+    for job in jobs:
+        day = days.setdefault(summary_day(job), {
+            "job_count": 0,
+            "question_count": 0,
+            "status_counts": {},
+            "duration": {"count": 0, "total_seconds": 0, "buckets": {}},
+            "tokens": {field: 0 for field in (*USAGE_FIELDS, "failed_attempt_tokens")},
+        })
+        day["job_count"] += 1
+        day["question_count"] += job.get("question_count") or 0
+        status = _status(job)
+        day["status_counts"][status] = day["status_counts"].get(status, 0) + 1
+
+        if job.get("started_at"):
+            seconds = max(0, job["completed_at"] - job["started_at"])
+            duration = day["duration"]
+            duration["count"] += 1
+            duration["total_seconds"] += seconds
+            bucket = _duration_bucket(seconds)
+            duration["buckets"][bucket] = duration["buckets"].get(bucket, 0) + 1
+
+        usage = job.get("usage") or {}
+        for field in day["tokens"]:
+            day["tokens"][field] += usage.get(field, 0)
+    return days
+
+
+def add_counts(target: dict, increments: dict):
+    """Add nested increments into a summary in place (what Firestore Increment does server-side)"""
+    for key, value in increments.items():
+        if isinstance(value, dict):
+            add_counts(target.setdefault(key, {}), value)
+        else:
+            target[key] = target.get(key, 0) + value
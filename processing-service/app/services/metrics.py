@@ -0,0 +1,275 @@
+import time
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Optional
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+# Buckets span sub-second Firestore writes up to multi-minute Gemini batches
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200)
+
+STAGE_DURATION = Histogram(
+    "superexam_stage_duration_seconds",
+    "Duration of processing pipeline stages",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+BATCH_DURATION = Histogram(
+    "superexam_gemini_batch_duration_seconds",
+    "Latency of a single Gemini generate call for one batch attempt",
+    ["outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+PAGE_EXTRACT_DURATION = Histogram(
+    "superexam_pdf_page_extract_seconds",
+    "Time spent extracting text from a single PDF page",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+GEMINI_RETRIES = Counter(
+    "superexam_gemini_retries_total",
+    "Gemini batch attempts that failed and were retried",
+)
+GEMINI_ERRORS = Counter(
+    "superexam_gemini_errors_total",
+    "Failed Gemini batch attempts by error class",
+    ["reason", "retryable"],
+)
+MAX_TOKENS_TRUNCATIONS = Counter(
+    "superexam_gemini_max_tokens_total",
+    "Gemini responses cut short by the output token limit",
+)
+QUESTIONS_PRODUCED = Counter(
+    "superexam_questions_produced_total",
+    "Questions saved by completed jobs",
+)
+QUESTIONS_DEDUPLICATED = Counter(
+    "superexam_questions_deduplicated_total",
+    "Near-duplicate questions dropped before saving",
+)
+GEMINI_TOKENS = Counter(
+    "superexam_gemini_tokens_total",
+    "Gemini tokens consumed, including failed attempts",
+    ["kind", "outcome"],
+)
+CACHE_LOOKUPS = Counter(
+    "superexam_generation_cache_lookups_total",
+    "Generation cache lookups by tier and result",
+    ["tier", "result"],
+)
+JOB_CACHE_LOOKUPS = Counter(
+    "superexam_job_cache_lookups_total",
+    "Job status cache lookups by result",
+    ["result"],
+)
+STATUS_NOT_MODIFIED = Counter(
+    "superexam_status_not_modified_total",
+    "Job status responses answered with 304 Not Modified",
+)
+JOBS_COALESCED = Counter(
+    "superexam_jobs_coalesced_total",
+    "Processing requests answered with an already running job",
+)
+JOBS_COMPACTED = Counter(
+    "superexam_jobs_compacted_total",
+    "Finished job records rolled into daily summaries and deleted",
+)
+JOBS_FINISHED = Counter(
+    "superexam_jobs_finished_total",
+    "Processing jobs by final status",
+    ["status"],
+)
+GEMINI_MODEL_CALLS = Counter(
+    "superexam_gemini_model_calls_total",
+    "Gemini calls by the model that served them and outcome",
+    ["model", "outcome"],
+)
+GEMINI_HEDGES = Counter(
+    "superexam_gemini_hedges_total",
+    "Hedged Gemini requests by result (sent, won, lost, throttled)",
+    ["result"],
+)
+GEMINI_CONCURRENCY_LIMIT = Gauge(
+    "superexam_gemini_concurrency_limit",
+    "Current adaptive limit on in-flight Gemini calls for this instance",
+)
+GEMINI_IN_FLIGHT = Gauge(
+    "superexam_gemini_in_flight",
+    "Gemini calls currently in flight on this instance",
+)
+GEMINI_QUEUE_DEPTH = Gauge(
+    "superexam_gemini_queue_depth",
+    "Gemini calls waiting for a concurrency slot",
+)
+GEMINI_QUEUE_WAIT = Histogram(
+    "superexam_gemini_queue_wait_seconds",
+    "Time a Gemini call waited for a concurrency slot",
+    buckets=LATENCY_BUCKETS,
+)
+
+
+# Token counters captured from Gemini usage metadata
+USAGE_FIELDS = ("prompt_tokens", "output_tokens", "thoughts_tokens", "total_tokens")
+
+
+def _tokens_per_second(generated_tokens: int, seconds: float) -> float:
+    return round(generated_tokens / seconds, 2) if seconds > 0 else 0.0
+
+
+class JobStats:
+    """
+    Per-job accumulator for stage timings and event counts.
+
+    Every observation is also forwarded to the process-wide Prometheus
+    histograms, so the job summary and /metrics never disagree.
+    """
+
+    def __init__(self):
+        self.timings: dict[str, float] = {}
+        self.stage_counts: dict[str, int] = {}
+        self.counters: dict[str, int] = {}
+        self.attempts: list[dict] = []
+        self.info: dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a block of work under the given stage name"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def observe(self, name: str, seconds: float):
+        """Record a stage duration measured elsewhere"""
+        STAGE_DURATION.labels(stage=name).observe(seconds)
+        with self._lock:
+            self.timings[name] = self.timings.get(name, 0.0) + seconds
+            self.stage_counts[name] = self.stage_counts.get(name, 0) + 1
+
+    def incr(self, name: str, amount: int = 1):
+        """Increment a per-job event counter (retries, truncations, ...)"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set_info(self, name: str, value):
+        """Attach a per-job report (e.g. preprocessing savings) saved as a job field"""
+        with self._lock:
+            self.info[name] = value
+
+    def record_usage(
+        self,
+        batch_num: int,
+        attempt: int,
+        usage: dict,
+        seconds: float,
+        outcome: str,
+        model: Optional[str] = None,
+    ):
+        """
+        Record token usage for one Gemini attempt.
+
+        Failed attempts are kept too, so the cost of retries shows up in the
+        job totals. Throughput counts output plus thinking tokens, since both
+        are generated by the model within the measured latency.
+        """
+        generated = usage.get("output_tokens", 0) + usage.get("thoughts_tokens", 0)
+        entry = {
+            "batch": batch_num,
+            "attempt": attempt,
+            "outcome": outcome,
+            "model": model,
+            "seconds": round(seconds, 3),
+            **{field: usage.get(field, 0) for field in USAGE_FIELDS},
+            "tokens_per_second": _tokens_per_second(generated, seconds),
+        }
+        for field in USAGE_FIELDS:
+            if usage.get(field):
+                GEMINI_TOKENS.labels(kind=field, outcome=outcome).inc(usage[field])
+        with self._lock:
+            self.attempts.append(entry)
+
+    def usage_summary(self) -> dict:
+        """Aggregate token usage and throughput across all recorded attempts"""
+        with self._lock:
+            attempts = list(self.attempts)
+
+        totals = {field: sum(a[field] for a in attempts) for field in USAGE_FIELDS}
+        seconds = sum(a["seconds"] for a in attempts)
+        failed = [a for a in attempts if a["outcome"] != "success"]
+        generated = totals["output_tokens"] + totals["thoughts_tokens"]
+        return {
+            **totals,
+            "attempts": len(attempts),
+            "failed_attempts": len(failed),
+            "failed_attempt_tokens": sum(a["total_tokens"] for a in failed),
+            "generate_seconds": round(seconds, 3),
+            "tokens_per_second": _tokens_per_second(generated, seconds),
+            # Firestore map keys must be strings
+            "batch_models": {str(a["batch"]): a["model"] for a in attempts if a["outcome"] == "success" and a["model"]},
+            "batches": attempts,
+        }
+
+    def summary(self) -> dict:
+        """Compact, Firestore-friendly summary of this job's timings"""
+        with self._lock:
+            return {
+                "stages": {
+                    name: {
+                        "seconds": round(seconds, 3),
+                        "count": self.stage_counts.get(name, 0),
+                    }
+                    for name, seconds in self.timings.items()
+                },
+                "counters": dict(self.counters),
+            }
+
+
+def _percentile(values: list[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[index], 3)
+
+
+def summarize_jobs(jobs: list[dict]) -> dict:
+    """
+    Summarize a list of job records (as stored in Firestore) for /stats.
+
+    Only finished jobs contribute durations; usage totals come from the
+    'usage' field written by the processor.
+    """
+    status_counts: dict[str, int] = {}
+    durations: list[float] = []
+    throughputs: list[float] = []
+    totals = {field: 0 for field in USAGE_FIELDS}
+    failed_attempt_tokens = 0
+
+    for job in jobs:
+        status = str(job.get("status", "unknown"))
+        status_counts[status] = status_counts.get(status, 0) + 1
+
+        if job.get("started_at") and job.get("completed_at"):
+            durations.append(job["completed_at"] - job["started_at"])
+
+        usage = job.get("usage") or {}
+        for field in USAGE_FIELDS:
+            totals[field] += usage.get(field, 0)
+        failed_attempt_tokens += usage.get("failed_attempt_tokens", 0)
+        if usage.get("tokens_per_second"):
+            throughputs.append(usage["tokens_per_second"])
+
+    return {
+        "job_count": len(jobs),
+        "status_counts": status_counts,
+        "duration_seconds": {
+            "p50": _percentile(durations, 50),
+            "p95": _percentile(durations, 95),
+            "max": max(durations) if durations else None,
+        },
+        "tokens": {**totals, "failed_attempt_tokens": failed_attempt_tokens},
+        "avg_tokens_per_second": round(sum(throughputs) / len(throughputs), 2) if throughputs else None,
+    }
@@ -0,0 +1,120 @@
+import time
+import logging
+import threading
+from typing import Optional
+from app.config import settings
+from app.services.latency_stats import LatencyWindow
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRouter:
+    """
+    Picks the Gemini model for each call.
+
+    Batches whose prompt fits in fast_max_chars go to the fast tier (when
+    configured), everything else to the primary model. A model that sees
+    failure_threshold consecutive timeouts/overload errors, or whose recent
+    p95 latency exceeds latency_p95_limit, is marked degraded for
+    cooldown_seconds and its calls go to the fallback model instead.
+    Latencies are kept per model in rolling windows, so a fake client with
+    per-model latency drives the same decisions as production traffic.
+    """
+
+    def __init__(
+        self,
+        primary: str,
+        fast_model: str = "",
+        fallback_model: str = "",
+        fast_max_chars: int = 0,
+        failure_threshold: int = 2,
+        cooldown_seconds: float = 300.0,
+        latency_p95_limit: float = 0.0,
+        min_samples: int = 10,
+    ):
+        self.primary = primary
+        self.fast_model = fast_model
+        self.fallback_model = fallback_model
+        self.fast_max_chars = fast_max_chars
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.latency_p95_limit = latency_p95_limit
+        self.min_samples = min_samples
+        self.latencies: dict[str, LatencyWindow] = {}
+        self._failures: dict[str, int] = {}
+        self._degraded_until: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls) -> "ModelRouter":
+        return cls(
+            primary=settings.gemini_model,
+            fast_model=settings.gemini_fast_model,
+            fallback_model=settings.gemini_fallback_model,
+            fast_max_chars=settings.fast_model_max_chars,
+            failure_threshold=settings.fallback_after_failures,
+            cooldown_seconds=settings.fallback_cooldown_seconds,
+            latency_p95_limit=settings.fallback_latency_p95,
+        )
+
+    def _window(self, model: str) -> LatencyWindow:
+        with self._lock:
+            return self.latencies.setdefault(model, LatencyWindow())
+
+    def is_degraded(self, model: str) -> bool:
+        with self._lock:
+            return self._degraded_until.get(model, 0.0) > time.monotonic()
+
+    def choose(self, prompt_chars: int) -> str:
+        """Model for a call whose prompt is prompt_chars long"""
+        model = self.primary
+        if self.fast_model and prompt_chars <= self.fast_max_chars:
+            model = self.fast_model
+        if self.fallback_model and model != self.fallback_model and self.is_degraded(model):
+            return self.fallback_model
+        return model
+
+    def _degrade(self, model: str, reason: str):
+        """Mark a model degraded (lock held)"""
+        if not self.fallback_model or model == self.fallback_model:
+            return
+        self._degraded_until[model] = time.monotonic() + self.cooldown_seconds
+        self._failures[model] = 0
+        # Judge the model afresh once the cooldown ends
+        self.latencies[model] = LatencyWindow()
+        logger.warning(
+            f"Model {model} degraded ({reason}); routing to {self.fallback_model} for {self.cooldown_seconds:.0f}s"
+        )
+
+    def record(self, model: str, outcome: str, latency: Optional[float] = None):
+        """
+        Feed back the result of one call.
+
+        Args:
+            model: Model that served the call
+            outcome: "success", "overload" (429/503/timeout) or "error"
+            latency: Seconds the call took, for successes
+        """
+        window = self._window(model)
+        if outcome == "success" and latency is not None:
+            window.observe(latency)
+
+        with self._lock:
+            if outcome == "overload":
+                self._failures[model] = self._failures.get(model, 0) + 1
+                if self._failures[model] >= self.failure_threshold:
+                    self._degrade(model, f"{self._failures[model]} consecutive timeouts/overload errors")
+                return
+            if outcome == "success":
+                self._failures[model] = 0
+
+        if outcome == "success" and self.latency_p95_limit and len(window) >= self.min_samples:
+            p95 = window.percentile(95)
+            if p95 is not None and p95 > self.latency_p95_limit:
+                with self._lock:
+                    if self._degraded_until.get(model, 0.0) <= time.monotonic():
+                        self._degrade(model, f"p95 latency {p95:.1f}s over {self.latency_p95_limit:.1f}s")
+
+
+# Singleton instance
+model_router = ModelRouter.from_settings()
@@ -0,0 +1,110 @@
+import gzip
+import json
+import time
+from typing import Optional
+from app.services.text_preprocessor import PAGE_MARKER, CHARS_PER_TOKEN, preprocess_text
+
+# Bump when the artifact layout changes; jobs fall back to the PDF for unknown formats
+PAGE_INDEX_FORMAT = 1
+
+# Stored next to the PDF: "<filePath>.pages.json.gz"
+PAGE_INDEX_SUFFIX = ".pages.json.gz"
+
+
+def page_index_path(file_path: str) -> str:
+    return f"{file_path}{PAGE_INDEX_SUFFIX}"
+
+
+def build_page_index(
+    pdf_text: str,
+    page_count: int,
+    extraction: Optional[dict] = None,
+    min_repeat_ratio: float = 0.3,
+    min_page_chars: int = 40,
+) -> dict:
+    """
+    Page index artifact for an extracted document.
+
+    Holds the extracted text (as PDFService.extract_text returns it) and,
+    per page, the offset and length of the page's text within it and a
+    token estimate. Pages are listed in columns (offsets[i] is page i + 1)
+    to keep the artifact small. Blank pages yielded no text at all;
+    boilerplate pages are the ones preprocessing would drop (tables of
+    contents, and pages left near-empty once running headers and footers
+    are removed).
+
+    Args:
+        pdf_text: Marker-delimited extraction output
+        page_count: Pages in the PDF, including blank ones
+        extraction: Optional extraction report (backend, slow/skipped/failed pages)
+        min_repeat_ratio: Preprocessing setting used for the boilerplate flags
+        min_page_chars: Preprocessing setting used for the boilerplate flags
+    """
+    offsets = [0] * page_count
+    chars = [0] * page_count
+    markers = list(PAGE_MARKER.finditer(pdf_text))
+    for i, marker in enumerate(markers):
+        page = int(marker.group(1))
+        if not 1 <= page <= page_count:
+            continue
+        # Page text follows the marker's newline and ends before the "\n\n" joining the next page
+        start = marker.end() + 1
+        end = markers[i + 1].start() - 2 if i + 1 < len(markers) else len(pdf_text)
+        offsets[page - 1] = start
+        chars[page - 1] = max(0, end - start)
+
+    _, report = preprocess_text(pdf_text, min_repeat_ratio=min_repeat_ratio, min_page_chars=min_page_chars)
+    boilerplate = sorted(set(report["toc_pages_dropped"]) | set(report["empty_pages_dropped"]))
+
+    return {
+        "format": PAGE_INDEX_FORMAT,
+        "createdAt": int(time.time() * 1000),
+        "pageCount": page_count,
+        "chars": len(pdf_text),
+        "tokens": len(pdf_text) // CHARS_PER_TOKEN,
+        "offsets": offsets,
+        "pageChars": chars,
+        "pageTokens": [count // CHARS_PER_TOKEN for count in chars],
+        "blankPages": [page for page, count in enumerate(chars, start=1) if count == 0],
+        "boilerplatePages": boilerplate,
+        "extraction": extraction or {},
+        "text": pdf_text,
+    }
+
+
+def page_text(index: dict, page: int) -> str:
+    """Text of one page (1-based); empty for blank pages"""
+    start = index["offsets"][page - 1]
+    return index["text"][start:start + index["pageChars"][page - 1]]
+
+
+def summarize(index: dict, path: str) -> dict:
+    """Compact description stored on the document as pageIndex (everything but the text)"""
+    return {
+        "path": path,
+        "format": index["format"],
+        "createdAt": index["createdAt"],
+        "pageCount": index["pageCount"],
+        "chars": index["chars"],
+        "tokens": index["tokens"],
+        "blankPages": len(index["blankPages"]),
+        "boilerplatePages": len(index["boilerplatePages"]),
+    }
+
+
+def encode_page_index(index: dict) -> bytes:
+    return gzip.compress(json.dumps(index, separators=(",", ":")).encode("utf-8"))
+
+
+def decode_page_index(data: bytes) -> dict:
+    """
+    Raises:
+        ValueError: If the artifact is unreadable or written in another format
+    """
+    try:
+        index = json.loads(gzip.decompress(data))
+    except (OSError, ValueError) as e:
+        raise ValueError(f"Unreadable page index: {e}")
+    if index.get("format") != PAGE_INDEX_FORMAT:
+        raise ValueError(f"Unsupported page index format {index.get('format')}")
+    return index
@@ -1,25 +1,90 @@
 import io
+import os
+import sys
+import time
+import pickle
 import logging
-from typing import Optional
+import subprocess
+from dataclasses import dataclass, field
+from multiprocessing.connection import Connection
+from typing import Callable, Optional
 from pypdf import PdfReader
+from app.config import settings
+from app.extraction_worker import available_backends, open_document
+from app.services.metrics import JobStats, PAGE_EXTRACT_DURATION
+from app.services.cancellation import CancellationToken, JobCancelled, WAIT_SLICE_SECONDS
 
 logger = logging.getLogger(__name__)
 
+# Workers run `python -m app.extraction_worker` from here. A multiprocessing child would
+# re-import __main__ (app.main) and rebuild the Firestore, GCS and Gemini clients.
+_SERVICE_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@dataclass
+class WorkerResult:
+    """What one extraction worker produced before it finished, overran or failed"""
+
+    outcome: str  # "done", "timed out", "crashed" or "error"
+    opened: bool = False  # The document opened, so per-page timing started
+    texts: dict[int, Optional[str]] = field(default_factory=dict)
+    seconds: float = 0.0  # Summed per-page extraction time
+    error: Optional[str] = None
+
+
+# A calibration that saw less text than this (scanned or image-only samples) is not kept
+MIN_CALIBRATION_CHARS = 500
+
+
+def _sample_indexes(page_count: int, samples: int) -> list[int]:
+    """Page indexes spread evenly through the document"""
+    if page_count <= samples:
+        return list(range(page_count))
+    step = page_count / samples
+    return sorted({int(i * step + step / 2) for i in range(samples)})
+
+
 class PDFService:
     """Service for extracting text from PDF documents"""
 
-    def extract_text(self, pdf_buffer: bytes) -> str:
+    def __init__(self):
+        self._calibrated_backend: Optional[str] = None
+        self._calibrated_at = 0.0
+
+    def extract_text(
+        self,
+        pdf_buffer: bytes,
+        cancel_token: Optional[CancellationToken] = None,
+        stats: Optional[JobStats] = None,
+    ) -> str:
         """
         Extract text content from a PDF buffer.
 
+        The backend comes from settings.pdf_backend ("auto" calibrates once
+        per process and keeps the fastest usable backend). If a backend
+        cannot open the document or yields no text, the next installed
+        backend is tried.
+
+        With settings.page_extract_timeout set, no page may take longer
+        than the budget. Pages are extracted in a worker process, never in
+        this one: a thread stuck in a page cannot be stopped and would keep
+        the interpreter busy for every other job. A worker whose page
+        overruns is killed, the page is retried alone with a cheap
+        content-stream scan (and skipped if that also fails), and a fresh
+        worker carries on with the rest of the document.
+
         Args:
             pdf_buffer: The PDF file content as bytes
+            cancel_token: Optional token checked before each page
+            stats: Optional per-job stats; the backend used and slow, skipped
+                and failed page numbers are attached as 'extraction'
 
         Returns:
             Extracted text as a string
 
         Raises:
             ValueError: If PDF cannot be read or is empty
+            JobCancelled: If the job is cancelled during extraction
         """
         try:
             # Create a file-like object from bytes
@@ -27,20 +92,36 @@ class PDFService:
 
             # Read PDF
             reader = PdfReader(pdf_file)
+            page_count = len(reader.pages)
 
-            if len(reader.pages) == 0:
+            if page_count == 0:
                 raise ValueError("PDF has no pages")
 
-            # Extract text from all pages
-            text_parts = []
-            for page_num, page in enumerate(reader.pages, start=1):
+            page_texts: list[Optional[str]] = []
+            report: dict = {}
+            for backend in self._backend_chain(pdf_buffer, page_count):
                 try:
-                    page_text = page.extract_text()
-                    if page_text and page_text.strip():
-                        text_parts.append(f"--- Page {page_num} ---\n{page_text}")
-                except Exception as page_error:
-                    logger.warning(f"Failed to extract text from page {page_num}: {page_error}")
+                    if settings.page_extract_timeout > 0:
+                        page_texts, report = self._extract_with_budget(pdf_buffer, page_count, backend, cancel_token)
+                    else:
+                        page_texts, report = self._extract_in_process(pdf_buffer, page_count, backend, cancel_token)
+                except JobCancelled:
+                    raise
+                except Exception as backend_error:
+                    logger.warning(f"PDF backend {backend} failed, trying the next one: {backend_error}")
                     continue
+                if any(text and text.strip() for text in page_texts):
+                    break
+                logger.warning(f"PDF backend {backend} extracted no text, trying the next one")
+
+            if stats and report:
+                stats.set_info("extraction", report)
+
+            text_parts = [
+                f"--- Page {page_num} ---\n{page_text}"
+                for page_num, page_text in enumerate(page_texts, start=1)
+                if page_text and page_text.strip()
+            ]
 
             if not text_parts:
                 raise ValueError("No text could be extracted from PDF")
@@ -49,15 +130,257 @@ class PDFService:
             full_text = "\n\n".join(text_parts)
 
             # Log extraction stats
-            logger.info(f"Extracted {len(full_text)} characters from {len(reader.pages)} pages")
+            logger.info(f"Extracted {len(full_text)} characters from {page_count} pages with {report.get('backend')}")
             logger.info(f"First 200 chars: {full_text[:200]}")
 
             return full_text
 
+        except JobCancelled:
+            raise
         except Exception as e:
             logger.error(f"PDF text extraction failed: {e}")
             raise ValueError(f"Failed to extract text from PDF: {str(e)}")
 
+    def _backend_chain(self, pdf_buffer: bytes, page_count: int) -> list[str]:
+        """Installed backends in the order to try them, preferred one first"""
+        installed = available_backends()
+        preferred = settings.pdf_backend
+        if preferred == "auto":
+            expired = time.monotonic() - self._calibrated_at > settings.extraction_calibration_ttl
+            if self._calibrated_backend is None or expired:
+                preferred = self.calibrate(pdf_buffer, page_count)["selected"]
+            else:
+                preferred = self._calibrated_backend
+        elif preferred not in installed:
+            logger.warning(f"PDF backend {preferred} is not installed; using {installed[0]}")
+        return [preferred] + [b for b in installed if b != preferred] if preferred in installed else installed
+
+    def calibrate(self, pdf_buffer: bytes, page_count: Optional[int] = None) -> dict:
+        """
+        Time every installed backend on sample pages and keep the fastest usable one.
+
+        A backend is usable when it extracts at least half as many characters
+        as the most productive backend, so a fast backend that misses text
+        is not chosen. Samples run under the page budget, in worker
+        processes like extraction itself. The choice is
+        kept for settings.extraction_calibration_ttl seconds, and only when
+        the samples held at least MIN_CALIBRATION_CHARS characters: a
+        scanned document says nothing about speed on text, so it is only
+        used for itself.
+
+        Args:
+            pdf_buffer: A representative PDF
+            page_count: Page count if already known
+
+        Returns:
+            Dictionary of backend name -> {seconds, chars, usable, error}, plus
+            "selected" with the chosen backend
+        """
+        if page_count is None:
+            page_count = len(PdfReader(io.BytesIO(pdf_buffer)).pages)
+        indexes = _sample_indexes(page_count, settings.extraction_calibration_pages)
+
+        results: dict = {}
+        for backend in available_backends():
+            if settings.page_extract_timeout > 0:
+                run = self._run_worker(pdf_buffer, indexes, "full", backend, None)
+            else:
+                run = self._run_in_process(pdf_buffer, indexes, backend)
+            chars = sum(len((text or "").strip()) for text in run.texts.values())
+            complete = run.outcome == "done" and len(run.texts) == len(indexes)
+            results[backend] = {
+                "seconds": round(run.seconds, 4) if complete else None,
+                "chars": chars,
+                "error": run.error or (None if complete else run.outcome),
+            }
+
+        best_chars = max((r["chars"] for r in results.values()), default=0)
+        for result in results.values():
+            result["usable"] = result["seconds"] is not None and best_chars > 0 and result["chars"] >= best_chars / 2
+        usable = [name for name, r in results.items() if r["usable"]]
+        selected = min(usable, key=lambda name: results[name]["seconds"]) if usable else "pypdf"
+
+        if best_chars >= MIN_CALIBRATION_CHARS:
+            self._calibrated_backend = selected
+            self._calibrated_at = time.monotonic()
+        logger.info(
+            f"PDF backend calibration over {len(indexes)} pages selected {selected} "
+            f"({'kept' if best_chars >= MIN_CALIBRATION_CHARS else 'this document only'}): {results}"
+        )
+        return {**results, "selected": selected}
+
+    def _run_in_process(self, pdf_buffer: bytes, indexes: list[int], backend: str) -> WorkerResult:
+        """Extract pages in this process, with no time budget (used when the budget is disabled)"""
+        try:
+            document = open_document(backend, pdf_buffer)
+        except Exception as e:
+            return WorkerResult("error", error=f"{type(e).__name__}: {e}")
+        result = WorkerResult("done")
+        for index in indexes:
+            page_start = time.perf_counter()
+            try:
+                result.texts[index] = document.extract(index)
+            except Exception as page_error:
+                logger.warning(f"Failed to extract text from page {index + 1}: {page_error}")
+                result.texts[index] = None
+            result.seconds += time.perf_counter() - page_start
+        return result
+
+    def _extract_in_process(
+        self, pdf_buffer: bytes, page_count: int, backend: str, cancel_token: Optional[CancellationToken]
+    ) -> tuple[list[Optional[str]], dict]:
+        """Extract every page in this process, with no time budget"""
+        document = open_document(backend, pdf_buffer)
+        page_texts: list[Optional[str]] = []
+        failed_pages = []
+        for index in range(page_count):
+            if cancel_token:
+                cancel_token.raise_if_cancelled()
+            try:
+                page_start = time.perf_counter()
+                page_texts.append(document.extract(index))
+                PAGE_EXTRACT_DURATION.observe(time.perf_counter() - page_start)
+            except Exception as page_error:
+                logger.warning(f"Failed to extract text from page {index + 1}: {page_error}")
+                page_texts.append(None)
+                failed_pages.append(index + 1)
+        return page_texts, {"backend": backend, "slow_pages": [], "skipped_pages": [], "failed_pages": failed_pages}
+
+    def _extract_with_budget(
+        self, pdf_buffer: bytes, page_count: int, backend: str, cancel_token: Optional[CancellationToken]
+    ) -> tuple[list[Optional[str]], dict]:
+        """
+        Extract pages under a per-page time budget, in worker processes.
+
+        Raises:
+            ValueError: If the backend cannot open the document
+        """
+        page_texts: list[Optional[str]] = [None] * page_count
+        failed_pages: list[int] = []
+        slow_pages: list[int] = []
+        skipped_pages: list[int] = []
+
+        next_page = 0
+        while next_page < page_count:
+            run = self._run_worker(pdf_buffer, list(range(next_page, page_count)), "full", backend, cancel_token)
+            if run.outcome == "error":
+                raise ValueError(run.error)
+            for index, text in run.texts.items():
+                page_texts[index] = text
+                if text is None:
+                    logger.warning(f"Failed to extract text from page {index + 1}")
+                    failed_pages.append(index + 1)
+            if run.outcome == "done":
+                break
+
+            bad_page = next_page + len(run.texts)
+            logger.warning(
+                f"Page {bad_page + 1} {run.outcome} during extraction "
+                f"(budget {settings.page_extract_timeout}s); retrying with fast mode in a worker"
+            )
+            slow_pages.append(bad_page + 1)
+            retry = self._run_worker(pdf_buffer, [bad_page], "fast", backend, cancel_token)
+            page_texts[bad_page] = retry.texts.get(bad_page)
+            if not (page_texts[bad_page] or "").strip():
+                logger.warning(f"Skipping page {bad_page + 1}: no text within the extraction budget")
+                skipped_pages.append(bad_page + 1)
+            next_page = bad_page + 1
+
+        return page_texts, {
+            "backend": backend,
+            "slow_pages": slow_pages,
+            "skipped_pages": skipped_pages,
+            "failed_pages": failed_pages,
+        }
+
+    def _run_worker(
+        self,
+        pdf_buffer: bytes,
+        indexes: list[int],
+        mode: str,
+        backend: str,
+        cancel_token: Optional[CancellationToken],
+    ) -> WorkerResult:
+        """
+        Run one extraction worker process over the given page indexes, in order.
+
+        The worker only imports app.extraction_worker and a PDF library. It
+        is killed as soon as one page runs past settings.page_extract_timeout;
+        pages finished before that are kept.
+        """
+        read_fd, write_fd = os.pipe()
+        process = subprocess.Popen(
+            [sys.executable, "-m", "app.extraction_worker", str(write_fd)],
+            stdin=subprocess.PIPE,
+            pass_fds=(write_fd,),
+            cwd=_SERVICE_ROOT,
+        )
+        os.close(write_fd)
+        conn = Connection(read_fd, writable=False)
+        try:
+            try:
+                process.stdin.write(pickle.dumps((pdf_buffer, indexes, mode, backend)))
+                process.stdin.close()
+            except BrokenPipeError:
+                pass  # The worker died at startup; reported as a crash below
+
+            def next_message(timeout: float) -> Optional[tuple]:
+                return conn.recv() if conn.poll(timeout) else None
+
+            return self._collect(next_message, cancel_token)
+        finally:
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+            conn.close()
+
+    def _collect(
+        self,
+        next_message: Callable[[float], Optional[tuple]],
+        cancel_token: Optional[CancellationToken],
+    ) -> WorkerResult:
+        """
+        Gather one extraction run's messages (see extraction_worker.extract_pages).
+
+        Opening the document and each page get settings.page_extract_timeout
+        seconds apiece; the per-page clock starts once the document is open.
+        """
+        timeout = settings.page_extract_timeout
+        result = WorkerResult("done")
+        clock = time.monotonic()
+        while True:
+            if cancel_token:
+                cancel_token.raise_if_cancelled()
+            remaining = timeout - (time.monotonic() - clock)
+            if remaining <= 0:
+                if not result.opened:
+                    result.outcome, result.error = "error", f"Document did not open within {timeout}s"
+                else:
+                    result.outcome = "timed out"
+                return result
+            try:
+                message = next_message(min(WAIT_SLICE_SECONDS, remaining))
+            except EOFError:
+                result.outcome = "crashed"
+                return result
+            if message is None:
+                continue
+            if message[0] == "done":
+                return result
+            if message[0] == "error":
+                result.outcome, result.error = "error", message[1]
+                return result
+            if message[0] == "open":
+                result.opened = True
+                clock = time.monotonic()
+                continue
+
+            _, index, text, seconds = message
+            PAGE_EXTRACT_DURATION.observe(seconds)
+            result.texts[index] = text
+            result.seconds += seconds
+            clock = time.monotonic()
+
     def get_pdf_metadata(self, pdf_buffer: bytes) -> dict:
         """
         Extract metadata from a PDF buffer.
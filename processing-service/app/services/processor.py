@@ -1,16 +1,44 @@
+import asyncio
 import logging
 import time
+from typing import Optional
 from app.services import firestore_service, gemini_service
 from app.config import settings
-from app.models import JobStatus
-from google.cloud import storage
+from app.models import JobStatus, SamplingStrategy
+from app.services.metrics import JobStats, QUESTIONS_PRODUCED, JOBS_FINISHED
+from app.services.storage_service import storage_service
+from app.services.pdf_service import pdf_service
+from app.services.cassette import CassetteRecorder
+from app.services import cancellation
+from app.services.cancellation import JobCancelled
+from app.services.retry_policy import JobAlreadyRunning, RetryPolicy, classify
+from app.services.question_bank import pack_questions, build_index
+from app.services.page_index import (
+    build_page_index,
+    decode_page_index,
+    encode_page_index,
+    page_index_path,
+    summarize,
+)
 
 logger = logging.getLogger(__name__)
 
-async def process_job_logic(job_id: str):
+async def process_job_logic(job_id: str, profile: bool = False, deadline_seconds: Optional[float] = None):
     """
     Core processing logic for a single job.
     Designed to be called by an HTTP endpoint (Cloud Tasks).
+
+    The pipeline itself is blocking, so it runs on a worker thread to keep
+    the event loop free for status polls and cancellation requests.
+
+    Args:
+        job_id: ID of the job record in Firestore
+        profile: Run under the sampling profiler (also enabled by the job's 'profile' field)
+        deadline_seconds: Optional budget after which Gemini retries and new batches stop (Cloud Tasks deliveries)
+
+    Raises:
+        JobAlreadyRunning: If an earlier delivery is processing the job and
+            still within its budget (retryable, so the queue comes back later)
     """
     # Retrieve job from Firestore (replaces Redis)
     job = firestore_service.get_job(job_id)
@@ -18,103 +46,244 @@ async def process_job_logic(job_id: str):
         logger.error(f"Job {job_id} not found in Firestore")
         return False
 
+    if job.get("status") == JobStatus.CANCELLED:
+        logger.info(f"Job {job_id} was cancelled before it started, skipping")
+        return False
+
+    if job.get("status") == JobStatus.COMPLETED:
+        logger.info(f"Job {job_id} already completed, ignoring redelivery")
+        return True
+
+    budget = deadline_seconds or settings.job_deadline_seconds
+    if job.get("status") == JobStatus.PROCESSING and time.time() - job.get("started_at", 0) < budget:
+        # Another delivery is still working on it; a stale one (past its budget) is taken over
+        raise JobAlreadyRunning(f"Job {job_id} is already being processed (attempt {job.get('attempt')})")
+
+    max_attempts = job.get("max_attempts", settings.max_retry_attempts)
+    if job.get("attempt", 0) >= max_attempts:
+        # Redelivery after the last allowed attempt: stop here instead of failing again
+        logger.warning(f"Job {job_id} already used {job.get('attempt')}/{max_attempts} attempts, not retrying")
+        firestore_service.update_job(job_id, {"status": JobStatus.FAILED, "retryable": False})
+        JOBS_FINISHED.labels(status=JobStatus.FAILED.value).inc()
+        return False
+
+    if profile or job.get("profile"):
+        from app.services.profiling import run_profiled
+        return await asyncio.to_thread(run_profiled, job_id, lambda: _run_job(job_id, job, deadline_seconds))
+
+    return await asyncio.to_thread(_run_job, job_id, job, deadline_seconds)
+
+
+async def run_job_locally(job_id: str):
+    """
+    Local stand-in for Cloud Tasks delivery: runs a job and re-runs it after
+    retryable failures, waiting settings.retry_delays between attempts.
+    """
+    while True:
+        try:
+            return await process_job_logic(job_id)
+        except Exception:
+            job = firestore_service.get_job(job_id) or {}
+            if job.get("retryable") is False:
+                return False
+            attempt = job.get("attempt", 1)
+            delay = settings.retry_delays[min(attempt, len(settings.retry_delays) - 1)]
+            logger.info(f"Retrying job {job_id} in {delay}s (attempt {attempt + 1})")
+            await asyncio.sleep(delay)
+
+
+async def run_group_locally(job_ids: list[str]):
+    """
+    Local stand-in for Cloud Tasks fan-out of a batch submission: runs the
+    group's jobs settings.group_job_concurrency at a time, each with
+    run_job_locally's retries.
+    """
+    semaphore = asyncio.Semaphore(settings.group_job_concurrency)
+
+    async def run(job_id: str):
+        async with semaphore:
+            return await run_job_locally(job_id)
+
+    return await asyncio.gather(*(run(job_id) for job_id in job_ids), return_exceptions=True)
+
+
+def _run_job(job_id: str, job: dict, deadline_seconds: Optional[float] = None):
+    """Run the download -> extract -> generate -> save pipeline for a job record"""
+    token = cancellation.register(job_id)
+    try:
+        return _run_pipeline(job_id, job, token, deadline_seconds)
+    finally:
+        cancellation.unregister(job_id)
+
+
+def _run_pipeline(
+    job_id: str,
+    job: dict,
+    token: cancellation.CancellationToken,
+    deadline_seconds: Optional[float] = None,
+):
     doc_id = job["doc_id"]
     attempt = job.get("attempt", 0) + 1
+    max_attempts = job.get("max_attempts", settings.max_retry_attempts)
 
     logger.info(f"Processing job {job_id} for document {doc_id} (attempt {attempt})")
 
-    # Update job status to PROCESSING in Firestore
-    firestore_service.update_job(job_id, {
-        "status": JobStatus.PROCESSING,
-        "attempt": attempt,
-        "started_at": int(time.time())
-    })
+    stats = JobStats()
+    recorder = CassetteRecorder(job_id, doc_id) if settings.record_gemini else None
+
+    # Progressive jobs commit each batch; the document turns "ready_partial" after the first
+    progressive = bool(job.get("progressive"))
+    doc_status = "processing"
+    committed_count = 0
+
+    def set_progress(progress: int, current_step: str):
+        with stats.stage("status_write"):
+            firestore_service.update_status(doc_id, status=doc_status, progress=progress, current_step=current_step)
+
+    def commit_batch(batch_questions: list[dict]):
+        nonlocal doc_status, committed_count
+        committed_count += len(batch_questions)
+        with stats.stage("save"):
+            firestore_service.append_questions(doc_id, batch_questions, committed_count)
+        doc_status = "ready_partial"
+        with stats.stage("status_write"):
+            firestore_service.update_job(job_id, {"questions_committed": committed_count})
+
+    # Update job status to PROCESSING in Firestore, unless a cancel got there first
+    with stats.stage("status_write"):
+        started = firestore_service.start_job(job_id, {
+            "status": JobStatus.PROCESSING,
+            "attempt": attempt,
+            "started_at": int(time.time()),
+            # Unknown until this attempt ends; callers redeliver on an unknown outcome
+            "retryable": None,
+        })
+    if not started:
+        logger.info(f"Job {job_id} was cancelled before it started, skipping")
+        return False
 
     # Update Firestore - Starting
-    firestore_service.update_status(
-        doc_id,
-        status="processing",
-        progress=0,
-        current_step="Starting..."
-    )
+    set_progress(0, "Starting...")
 
     try:
         # Step 1: Get document metadata
-        firestore_service.update_status(doc_id, status="processing", progress=10, current_step="Reading metadata...")
+        set_progress(10, "Reading metadata...")
 
         doc = firestore_service.get_document(doc_id)
         if not doc or not doc.get("filePath"):
             raise ValueError("Document or file path not found in Firestore")
 
-        # Step 2: Read PDF file from GCS
-        firestore_service.update_status(doc_id, status="processing", progress=20, current_step="Downloading PDF...")
-        
-        try:
-            storage_client = storage.Client()
-            bucket = storage_client.bucket(settings.gcs_bucket_name)
-            blob = bucket.blob(doc["filePath"])
-            
-            if not blob.exists():
-                 raise FileNotFoundError(f"PDF file not found in GCS bucket {settings.gcs_bucket_name}: {doc['filePath']}")
+        # Step 2: Read the prepared page index, or else the PDF file from GCS
+        page_index = _load_page_index(doc_id, doc, stats)
+        pdf_buffer = None
+        if page_index is None:
+            set_progress(20, "Downloading PDF...")
 
-            pdf_buffer = blob.download_as_bytes()
-            logger.info(f"Downloaded PDF from GCS: {doc['filePath']} ({len(pdf_buffer)} bytes)")
+            try:
+                with stats.stage("download"):
+                    pdf_buffer = storage_service.download_bytes(doc["filePath"])
+                logger.info(f"Downloaded PDF from GCS: {doc['filePath']} ({len(pdf_buffer)} bytes)")
 
-        except Exception as gcs_error:
-            logger.error(f"GCS Download Error: {gcs_error}")
-            raise Exception(f"Failed to download file from storage: {str(gcs_error)}")
+            except Exception as gcs_error:
+                logger.error(f"GCS Download Error: {gcs_error}")
+                raise Exception(f"Failed to download file from storage: {str(gcs_error)}")
 
         # Step 3: Get prompts
-        firestore_service.update_status(doc_id, status="processing", progress=30, current_step="Loading prompts...")
+        set_progress(30, "Loading prompts...")
 
-        system_prompt = firestore_service.get_prompt("system-prompts", job["system_prompt_id"])
-        custom_prompt = firestore_service.get_prompt("custom-prompts", job["custom_prompt_id"])
+        with stats.stage("prompts"):
+            # Batch submissions snapshot the prompts on each job, so only older jobs read them here
+            system_prompt = job.get("system_prompt") or firestore_service.get_prompt("system-prompts", job["system_prompt_id"])
+            custom_prompt = job.get("custom_prompt") or firestore_service.get_prompt("custom-prompts", job["custom_prompt_id"])
 
         if not system_prompt or not custom_prompt:
             raise ValueError("Prompts not found")
 
         # Step 4: Extract text from PDF
-        firestore_service.update_status(doc_id, status="processing", progress=35, current_step="Extracting text...")
+        set_progress(35, "Extracting text...")
 
         # Step 5: Generate questions
-        firestore_service.update_status(doc_id, status="processing", progress=40, current_step="Generating questions...")
+        set_progress(40, "Generating questions...")
 
         logger.info(f"Calling Gemini API for job {job_id}")
 
         # Define progress callback to update Firestore in real-time
         def update_progress(message: str):
-            firestore_service.update_status(doc_id, status="processing", progress=50, current_step=message)
+            set_progress(50, message)
 
         questions = gemini_service.generate_questions(
             pdf_buffer=pdf_buffer,
             system_prompt=system_prompt,
             custom_prompt=custom_prompt,
             schema=job.get("schema"),
-            progress_callback=update_progress
+            progress_callback=update_progress,
+            stats=stats,
+            recorder=recorder,
+            cancel_token=token,
+            retry_policy=RetryPolicy.from_settings(deadline_seconds),
+            target_questions=job.get("target_questions"),
+            sampling=SamplingStrategy(job.get("sampling_strategy") or SamplingStrategy.SEQUENTIAL.value),
+            batch_callback=commit_batch if progressive else None,
+            id_stamp=job.get("created_at"),
+            page_index=page_index,
         )
+        if recorder:
+            _save_cassette(job_id, recorder)
 
         # Step 5: Save results
-        firestore_service.update_status(doc_id, status="processing", progress=90, current_step="Saving questions...")
-        firestore_service.save_questions(doc_id, questions)
+        set_progress(90, "Saving questions...")
+        with stats.stage("save"):
+            if progressive:
+                # Questions are already written; only flip the document to ready
+                firestore_service.append_questions(doc_id, [], len(questions), final=True)
+            else:
+                firestore_service.save_questions(doc_id, questions)
+        _save_question_bank(doc_id, questions, stats)
+        QUESTIONS_PRODUCED.inc(len(questions))
+        stats.incr("questions", len(questions))
 
         # Step 6: Mark complete
         firestore_service.update_job(job_id, {
             "status": JobStatus.COMPLETED,
-            "completed_at": int(time.time())
+            "completed_at": int(time.time()),
+            "question_count": len(questions),
+            "timings": stats.summary(),
+            "usage": stats.usage_summary(),
+            **stats.info
         })
-        logger.info(f"Job {job_id} completed successfully")
+        JOBS_FINISHED.labels(status=JobStatus.COMPLETED.value).inc()
+        logger.info(f"Job {job_id} completed successfully: {stats.summary()['stages']}")
         
         return True
 
+    except JobCancelled as cancelled:
+        if recorder and recorder.entries:
+            _save_cassette(job_id, recorder)
+        _finish_cancelled(job_id, doc_id, cancelled, stats)
+        return False
+
     except Exception as e:
         logger.error(f"Job {job_id} failed: {e}", exc_info=True)
+        if recorder and recorder.entries:
+            _save_cassette(job_id, recorder)
         
+        # Only transient failures with attempts left are worth another delivery
+        error_class = classify(e)
+        retryable = error_class.retryable and attempt < max_attempts
+        if not retryable:
+            JOBS_FINISHED.labels(status=JobStatus.FAILED.value).inc()
+
         # Try to update job status
         try:
             firestore_service.update_job(job_id, {
                 "status": JobStatus.FAILED,
                 "completed_at": int(time.time()),
-                "error": str(e)
+                "error": str(e),
+                "error_reason": error_class.reason,
+                "retryable": retryable,
+                "timings": stats.summary(),
+                "usage": stats.usage_summary(),
+                **stats.info
             })
             logger.info(f"Updated job {job_id} status to FAILED")
         except Exception as update_job_error:
@@ -133,3 +302,128 @@ async def process_job_logic(job_id: str):
 
         # Re-raise to let the caller (API) know it failed
         raise e
+
+
+def _load_page_index(doc_id: str, doc: dict, stats: JobStats) -> Optional[dict]:
+    """Page index of a prepared document, or None when the job has to read the PDF"""
+    summary = doc.get("pageIndex")
+    if not settings.page_index_enabled or not summary:
+        return None
+    try:
+        with stats.stage("download"):
+            page_index = decode_page_index(storage_service.download_bytes(summary["path"]))
+    except Exception as e:
+        logger.warning(f"Page index for {doc_id} unusable, reading the PDF instead: {e}")
+        return None
+    logger.info(f"Loaded page index for {doc_id}: {page_index['pageCount']} pages, {page_index['chars']} characters")
+    return page_index
+
+
+def prepare_document(doc_id: str) -> dict:
+    """
+    Download and extract a document's PDF ahead of any job and store its
+    page index next to the PDF (see page_index.py).
+
+    Uploaded files are never overwritten (each upload gets a unique
+    path), so an index stays valid for the life of the document.
+
+    Returns:
+        The pageIndex summary recorded on the document
+
+    Raises:
+        ValueError: If the document is missing or its PDF cannot be read
+        FileNotFoundError: If the PDF is not in storage
+    """
+    doc = firestore_service.get_document(doc_id)
+    if not doc or not doc.get("filePath"):
+        raise ValueError("Document or file path not found in Firestore")
+
+    stats = JobStats()
+    with stats.stage("download"):
+        pdf_buffer = storage_service.download_bytes(doc["filePath"])
+    with stats.stage("extract"):
+        pdf_text = pdf_service.extract_text(pdf_buffer, stats=stats)
+        page_count = pdf_service.get_pdf_metadata(pdf_buffer).get("page_count", 0)
+    with stats.stage("page_index"):
+        page_index = build_page_index(
+            pdf_text,
+            page_count,
+            extraction=stats.info.get("extraction"),
+            min_repeat_ratio=settings.preprocess_repeat_ratio,
+            min_page_chars=settings.preprocess_min_page_chars,
+        )
+        path = page_index_path(doc["filePath"])
+        storage_service.upload_bytes(path, encode_page_index(page_index), content_type="application/gzip")
+
+    summary = summarize(page_index, path)
+    firestore_service.set_page_index(doc_id, summary)
+    logger.info(f"Prepared document {doc_id}: {page_count} pages, {summary['chars']} characters ({stats.summary()['stages']})")
+    return summary
+
+
+async def run_prepare_locally(doc_id: str):
+    """Background preparation; a failure only means jobs read the PDF themselves"""
+    try:
+        return await asyncio.to_thread(prepare_document, doc_id)
+    except Exception as e:
+        logger.warning(f"Failed to prepare document {doc_id}: {e}")
+        return None
+
+
+def _save_cassette(job_id: str, recorder: CassetteRecorder):
+    """Persist a job's Gemini cassette; recording problems never fail the job"""
+    try:
+        path = recorder.save()
+        firestore_service.update_job(job_id, {"cassette_path": path})
+    except Exception as e:
+        logger.error(f"Failed to save cassette for job {job_id}: {e}")
+
+
+def _save_question_bank(doc_id: str, questions: list[dict], stats: JobStats):
+    """
+    Pack saved questions into shard documents.
+
+    Runs after the ready flip, which dropped the previous run's index, so
+    until this lands (or if it fails) readers use the per-question documents.
+    """
+    if not settings.question_bank_enabled or not questions:
+        return
+    try:
+        with stats.stage("question_bank"):
+            shards = pack_questions(questions, settings.question_bank_shard_bytes)
+            index = build_index(shards)
+            firestore_service.save_question_bank(doc_id, shards, index)
+    except Exception as e:
+        logger.warning(f"Failed to save question bank for {doc_id}: {e}")
+
+
+def _finish_cancelled(job_id: str, doc_id: str, cancelled: JobCancelled, stats: JobStats):
+    """Mark a cancelled job, keeping partial questions if the canceller asked for it"""
+    logger.info(f"Job {job_id} cancelled with {len(cancelled.partial_questions)} questions generated")
+    JOBS_FINISHED.labels(status=JobStatus.CANCELLED.value).inc()
+
+    job = firestore_service.get_job(job_id) or {}
+    kept = 0
+    if job.get("progressive") and cancelled.partial_questions:
+        # Already committed and possibly in use by exams: keep them
+        with stats.stage("save"):
+            firestore_service.append_questions(doc_id, [], len(cancelled.partial_questions), final=True)
+        kept = len(cancelled.partial_questions)
+    elif job.get("keep_partial") and cancelled.partial_questions:
+        with stats.stage("save"):
+            firestore_service.save_questions(doc_id, cancelled.partial_questions)
+        kept = len(cancelled.partial_questions)
+    if kept:
+        _save_question_bank(doc_id, cancelled.partial_questions, stats)
+    else:
+        firestore_service.update_status(doc_id, status="failed", error="Cancelled by user")
+
+    firestore_service.update_job(job_id, {
+        "status": JobStatus.CANCELLED,
+        "completed_at": int(time.time()),
+        "error": "Cancelled by user",
+        "questions_kept": kept,
+        "timings": stats.summary(),
+        "usage": stats.usage_summary(),
+        **stats.info
+    })
@@ -0,0 +1,127 @@
+import os
+import logging
+import functools
+import threading
+from contextvars import ContextVar
+from typing import Callable, Optional, TypeVar
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+PROFILE_HEADER = "X-Profile-Job"
+
+
+class _HelperSessions:
+    """Profiles recorded on other threads for one profiled job"""
+
+    def __init__(self):
+        self.sessions: list = []
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def add(self, session):
+        with self._lock:
+            # Abandoned work (hedges, overrunning pages) may finish after the job
+            if not self.closed and session is not None:
+                self.sessions.append(session)
+
+    def close(self) -> list:
+        with self._lock:
+            self.closed = True
+            return self.sessions
+
+
+# Set while a job runs under run_profiled, for the threads it hands work to
+_helper_sessions: ContextVar[Optional[_HelperSessions]] = ContextVar("helper_sessions", default=None)
+
+
+def follow(func: Callable[..., T]) -> Callable[..., T]:
+    """
+    Wrap work handed to another thread so it joins the current job's profile.
+
+    The sampling profiler only sees the thread it started on, so Gemini calls
+    on the executor would otherwise show up as time spent waiting. Wrap at
+    the point of hand-off (executor submit, thread target), on the job's
+    own thread. Returns func unchanged when no
+    profile is running, so unprofiled jobs pay nothing.
+    """
+    sessions = _helper_sessions.get()
+    if sessions is None:
+        return func
+
+    @functools.wraps(func)
+    def profiled(*args, **kwargs):
+        from pyinstrument import Profiler
+
+        profiler = Profiler(interval=settings.profile_interval, async_mode="disabled")
+        profiler.start()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            sessions.add(profiler.stop())
+
+    return profiled
+
+
+def save_profile(job_id: str, html: str) -> str:
+    """
+    Persist a rendered profile and return its location.
+
+    Writes to settings.profiles_dir when set (local runs), otherwise to
+    the uploads bucket under profiles/.
+    """
+    # Imported here: services that call follow() import this module
+    from app.services.storage_service import storage_service
+
+    filename = f"{job_id}.html"
+    if settings.profiles_dir:
+        os.makedirs(settings.profiles_dir, exist_ok=True)
+        path = os.path.join(settings.profiles_dir, filename)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(html)
+        return path
+
+    return storage_service.upload_bytes(
+        f"profiles/{filename}", html.encode("utf-8"), content_type="text/html"
+    )
+
+
+def run_profiled(job_id: str, func: Callable[[], T]) -> T:
+    """
+    Run a job function under the pyinstrument sampling profiler.
+
+    The profiler samples the calling thread, so this must run on the same
+    worker thread as the pipeline. Work the pipeline hands to other threads
+    through follow() is profiled there and merged into the saved profile.
+    Pages extracted in worker processes are not sampled; their time shows
+    as waiting, and slow pages are listed in the job's extraction report.
+
+    pyinstrument is imported here so jobs that are not profiled pay nothing.
+    The profile is saved and its path recorded on the job even when the job
+    fails, since failing jobs are often the ones worth looking at.
+    """
+    from pyinstrument import Profiler
+    from pyinstrument.renderers import HTMLRenderer
+    from pyinstrument.session import Session
+    from app.services import firestore_service
+
+    helpers = _HelperSessions()
+    context_token = _helper_sessions.set(helpers)
+    profiler = Profiler(interval=settings.profile_interval, async_mode="disabled")
+    profiler.start()
+    try:
+        return func()
+    finally:
+        session = profiler.stop()
+        _helper_sessions.reset(context_token)
+        # Samples are concatenated, so the merged profile is an aggregate, not a timeline
+        for helper_session in helpers.close():
+            session = Session.combine(session, helper_session)
+        try:
+            path = save_profile(job_id, HTMLRenderer().render(session))
+            firestore_service.update_job(job_id, {"profile_path": path})
+            logger.info(f"Saved profile for job {job_id} to {path}")
+        except Exception as save_error:
+            logger.error(f"Failed to save profile for job {job_id}: {save_error}")
@@ -0,0 +1,52 @@
+import json
+import time
+from typing import Optional
+
+# Bump when the shard or index layout changes, so readers can tell layouts apart
+QUESTION_BANK_FORMAT = 1
+
+
+def pack_questions(questions: list[dict], max_shard_bytes: int) -> list[list[dict]]:
+    """
+    Split questions into shards whose JSON stays under max_shard_bytes.
+
+    Firestore documents are capped at 1 MiB, so shards are sized well
+    below that. A single question larger than the budget gets a shard of
+    its own.
+    """
+    shards: list[list[dict]] = []
+    current: list[dict] = []
+    current_bytes = 0
+    for q in questions:
+        size = len(json.dumps(q, separators=(",", ":")).encode("utf-8"))
+        if current and current_bytes + size > max_shard_bytes:
+            shards.append(current)
+            current, current_bytes = [], 0
+        current.append(q)
+        current_bytes += size
+    if current:
+        shards.append(current)
+    return shards
+
+
+def build_index(shards: list[list[dict]], version: Optional[int] = None) -> dict:
+    """
+    Index stored on the parent document as questionBank.
+
+    Each shard entry records the position of its first question and how
+    many it holds, so a reader can turn positions (a page, or a random
+    sample) into the few shard documents it has to fetch (see
+    website/lib/db/question-bank.ts).
+    """
+    version = version or int(time.time() * 1000)
+    entries = []
+    start = 0
+    for i, shard in enumerate(shards):
+        entries.append({"id": f"v{version}-{i}", "start": start, "count": len(shard)})
+        start += len(shard)
+    return {
+        "format": QUESTION_BANK_FORMAT,
+        "version": version,
+        "questionCount": start,
+        "shards": entries,
+    }
@@ -0,0 +1,174 @@
+import re
+import time
+import random
+import logging
+from dataclasses import dataclass
+from typing import Optional
+import httpx
+from google.genai import errors
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# HTTP codes worth retrying: request timeout, rate limit, transient server errors
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class GeminiBlockedError(ValueError):
+    """Gemini refused the prompt (safety or policy block); retrying cannot help"""
+
+
+class EmptyResponseError(ValueError):
+    """Gemini returned no content without a block reason; usually transient"""
+
+
+class JobDeadlineExceeded(Exception):
+    """The job's time budget (settings.job_deadline_seconds) ran out"""
+
+
+class JobAlreadyRunning(Exception):
+    """A redelivery arrived while an earlier delivery is still within its time budget"""
+
+
+@dataclass
+class ErrorClass:
+    retryable: bool
+    reason: str
+    retry_after: Optional[float] = None
+
+
+def _parse_seconds(value) -> Optional[float]:
+    """Parse '37', '37s' or '1.5s' into seconds"""
+    if value is None:
+        return None
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)s?\s*", str(value))
+    return float(match.group(1)) if match else None
+
+
+def retry_after_hint(error: Exception) -> Optional[float]:
+    """
+    Seconds the server asked us to wait, from a Retry-After header or a
+    google.rpc.RetryInfo 'retryDelay' in the error details.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers:
+        hint = _parse_seconds(headers.get("retry-after"))
+        if hint is not None:
+            return hint
+
+    details = getattr(error, "details", None)
+    if isinstance(details, dict):
+        for detail in details.get("error", {}).get("details", []) or []:
+            if isinstance(detail, dict) and "retryDelay" in detail:
+                return _parse_seconds(detail["retryDelay"])
+    return None
+
+
+def classify(error: Exception) -> ErrorClass:
+    """
+    Sort an error from a Gemini call into retryable or fatal.
+
+    Retryable: 408/429/5xx API errors, timeouts, connection errors and empty
+    responses, a spent job deadline (a redelivery resumes the job, with
+    finished batches served from the generation cache) and a delivery that
+    found the job still running. Fatal: safety blocks, other 4xx (bad
+    request, schema, permissions) and anything unrecognised.
+    """
+    if isinstance(error, errors.APIError):
+        if error.code in RETRYABLE_STATUS_CODES:
+            return ErrorClass(True, f"http_{error.code}", retry_after_hint(error))
+        return ErrorClass(False, f"http_{error.code}")
+    if isinstance(error, (TimeoutError, httpx.TimeoutException)):
+        return ErrorClass(True, "timeout")
+    if isinstance(error, (ConnectionError, httpx.TransportError)):
+        return ErrorClass(True, "connection")
+    if isinstance(error, EmptyResponseError):
+        return ErrorClass(True, "empty_response")
+    if isinstance(error, GeminiBlockedError):
+        return ErrorClass(False, "blocked")
+    if isinstance(error, JobDeadlineExceeded):
+        return ErrorClass(True, "deadline")
+    if isinstance(error, JobAlreadyRunning):
+        return ErrorClass(True, "already_running")
+    return ErrorClass(False, type(error).__name__)
+
+
+class RetryPolicy:
+    """
+    Per-job retry budget for Gemini calls.
+
+    Each batch gets up to max_attempts tries, with full-jitter exponential
+    backoff (uniform in [0, base_delay * 2^(attempt-1)], capped at
+    max_delay). A server retry-after hint sets a floor on the wait. With a
+    deadline, no retry is started that would end past it and no new batch
+    is dispatched once it has passed, so a slow job ends its attempt
+    (retryably) and hands over to a Cloud Tasks redelivery, which resumes
+    from the generation cache; the redelivery is refused while the
+    earlier attempt is still within its budget, so the two never overlap.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int,
+        base_delay: float,
+        max_delay: float,
+        deadline_seconds: Optional[float] = None,
+        rng: Optional[random.Random] = None,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = time.monotonic() + deadline_seconds if deadline_seconds else None
+        self.rng = rng or random.Random()
+
+    @classmethod
+    def from_settings(cls, deadline_seconds: Optional[float] = None) -> "RetryPolicy":
+        """Policy from settings; the deadline is only set for Cloud Tasks deliveries"""
+        return cls(
+            max_attempts=settings.gemini_max_attempts,
+            base_delay=settings.gemini_retry_base_delay,
+            max_delay=settings.gemini_retry_max_delay,
+            deadline_seconds=deadline_seconds,
+        )
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left in the job budget, or None when unbounded"""
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+    def check_deadline(self):
+        """Called before a retry or a further batch; the job gives up (retryably) once its budget is spent"""
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise JobDeadlineExceeded(f"Job exceeded its {settings.job_deadline_seconds}s time budget")
+
+    def next_delay(self, attempt: int, error: Exception) -> Optional[float]:
+        """
+        Decide whether to retry after a failed attempt.
+
+        Args:
+            attempt: The attempt that just failed (1-indexed)
+            error: The exception it raised
+
+        Returns:
+            Seconds to wait before the next attempt, or None to give up
+        """
+        error_class = classify(error)
+        if not error_class.retryable:
+            logger.info(f"Not retrying fatal error ({error_class.reason}): {error}")
+            return None
+        if attempt >= self.max_attempts:
+            return None
+
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        delay = self.rng.uniform(0, ceiling)
+        if error_class.retry_after is not None:
+            delay = max(delay, min(error_class.retry_after, self.max_delay))
+
+        remaining = self.remaining()
+        if remaining is not None and delay >= remaining:
+            logger.info(f"Not retrying: {delay:.1f}s backoff exceeds the {remaining:.1f}s left in the job budget")
+            return None
+        return delay
@@ -0,0 +1,41 @@
+from typing import Optional
+from app.models import SamplingStrategy
+
+
+def batch_order(batch_count: int, strategy: SamplingStrategy) -> list[int]:
+    """
+    Order in which to dispatch batches (0-based indexes).
+
+    Sequential walks the document front to back. Spread visits the middle
+    first, then the quarter points, then the eighths and so on, so a job
+    that stops early has still sampled the whole document evenly.
+    """
+    if strategy != SamplingStrategy.SPREAD:
+        return list(range(batch_count))
+
+    order: list[int] = []
+    seen: set[int] = set()
+    parts = 1
+    while len(order) < batch_count:
+        for k in range(parts):
+            index = (2 * k + 1) * batch_count // (2 * parts)
+            if index not in seen:
+                seen.add(index)
+                order.append(index)
+        parts *= 2
+    return order
+
+
+def trim_questions(questions: list, target: Optional[int], strategy: SamplingStrategy) -> list:
+    """
+    Cut questions down to target.
+
+    Sequential keeps the first target questions; spread keeps an evenly
+    spaced subset so every sampled page range stays represented.
+    """
+    if not target or len(questions) <= target:
+        return questions
+    if strategy != SamplingStrategy.SPREAD:
+        return questions[:target]
+    step = len(questions) / target
+    return [questions[int((i + 0.5) * step)] for i in range(target)]
@@ -0,0 +1,59 @@
+import logging
+from typing import Optional
+from google.api_core.exceptions import NotFound
+from google.cloud import storage
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class StorageService:
+    """Thin wrapper around the GCS bucket used for uploads and artifacts"""
+
+    def __init__(self, bucket_name: str):
+        self.bucket_name = bucket_name
+        self._client: Optional[storage.Client] = None
+
+    def _bucket(self):
+        # Created lazily and reused: building a client per job re-reads credentials
+        if self._client is None:
+            self._client = storage.Client()
+        return self._client.bucket(self.bucket_name)
+
+    def exists(self, path: str) -> bool:
+        """Check whether an object exists in the bucket"""
+        return self._bucket().blob(path).exists()
+
+    def download_bytes(self, path: str) -> bytes:
+        """
+        Download an object as bytes.
+
+        Raises:
+            FileNotFoundError: If the object does not exist
+        """
+        blob = self._bucket().blob(path)
+        if not blob.exists():
+            raise FileNotFoundError(f"File not found in GCS bucket {self.bucket_name}: {path}")
+        return blob.download_as_bytes()
+
+    def upload_bytes(self, path: str, data: bytes, content_type: str = "application/octet-stream") -> str:
+        """Upload bytes to the bucket and return the gs:// URI"""
+        blob = self._bucket().blob(path)
+        blob.upload_from_string(data, content_type=content_type)
+        logger.info(f"Uploaded {len(data)} bytes to gs://{self.bucket_name}/{path}")
+        return f"gs://{self.bucket_name}/{path}"
+
+    def delete(self, path: str):
+        """Delete an object; a missing object is not an error"""
+        try:
+            self._bucket().blob(path).delete()
+        except NotFound:
+            pass
+
+
+# Singleton instance
+if settings.backend == "memory":
+    from testing.fakes import InMemoryStorageService
+    storage_service = InMemoryStorageService(settings.gcs_bucket_name)
+else:
+    storage_service = StorageService(settings.gcs_bucket_name)
@@ -0,0 +1,149 @@
+import re
+import logging
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+PAGE_MARKER = re.compile(r"--- Page (\d+) ---")
+
+# Rough Gemini tokenization ratio for English text, for reporting savings
+CHARS_PER_TOKEN = 4
+
+# Running headers and footers live in the first/last few lines of a page
+EDGE_LINES = 2
+
+PAGE_NUMBER_LINE = re.compile(r"^(page\s*)?\d{1,4}(\s*(of|/)\s*\d{1,4})?$", re.IGNORECASE)
+DOT_LEADER_LINE = re.compile(r"(\.{4,}|(\. ){3,}|…+)\s*\d{1,4}$")
+TRAILING_NUMBER_LINE = re.compile(r"\D\s\d{1,4}(\s*[,–-]\s*\d{1,4})*$")
+TOC_HEADING = re.compile(r"^(table of contents|contents|index)$", re.IGNORECASE)
+INLINE_SPACE = re.compile(r"[ \t ]+")
+
+
+def split_pages(pdf_text: str) -> list[tuple[int, str]]:
+    """Split marker-delimited extraction output into (page_num, text) pairs"""
+    parts = PAGE_MARKER.split(pdf_text)
+    return [(int(parts[i]), parts[i + 1]) for i in range(1, len(parts) - 1, 2)]
+
+
+def join_pages(pages: list[tuple[int, str]]) -> str:
+    return "\n\n".join(f"--- Page {num} ---\n{text}" for num, text in pages)
+
+
+def _normalize(line: str) -> str:
+    """Key for spotting repeats: case, spacing and numbers (page numbers, dates) ignored"""
+    return re.sub(r"\d+", "#", INLINE_SPACE.sub(" ", line.strip().lower()))
+
+
+def _edge_indexes(lines: list[str]) -> list[int]:
+    """Indexes of the first and last EDGE_LINES non-empty lines (one each on short pages)"""
+    filled = [i for i, line in enumerate(lines) if line.strip()]
+    edge = EDGE_LINES if len(filled) > 4 * EDGE_LINES else 1
+    return sorted(set(filled[:edge] + filled[-edge:]))
+
+
+def _is_toc_page(lines: list[str]) -> bool:
+    filled = [line.strip() for line in lines if line.strip()]
+    if len(filled) < 5:
+        return False
+    leaders = sum(1 for line in filled if DOT_LEADER_LINE.search(line))
+    if leaders / len(filled) >= 0.4:
+        return True
+    has_heading = any(TOC_HEADING.match(line) for line in filled[:EDGE_LINES])
+    numbered = sum(1 for line in filled if TRAILING_NUMBER_LINE.search(line))
+    return has_heading and numbered / len(filled) >= 0.5
+
+
+def _collapse_whitespace(text: str) -> str:
+    lines = [INLINE_SPACE.sub(" ", line).strip() for line in text.splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def preprocess_text(
+    pdf_text: str,
+    min_repeat_ratio: float = 0.3,
+    min_page_chars: int = 40,
+) -> tuple[str, dict]:
+    """
+    Shrink extracted PDF text before it is sent to Gemini.
+
+    Removes header/footer lines repeated on at least min_repeat_ratio of
+    the pages (numbers ignored, so "Page 12" matches "Page 13"), bare page
+    numbers, pages left with fewer than min_page_chars characters, and
+    table-of-contents/index pages, then collapses runs of whitespace. Page
+    markers of kept pages are preserved for batching.
+
+    Args:
+        pdf_text: Output of PDFService.extract_text
+        min_repeat_ratio: Share of pages a header/footer line must appear on
+        min_page_chars: Pages with less remaining text are dropped
+
+    Returns:
+        Tuple of (cleaned text, report with char/token savings and dropped pages).
+        If cleaning would leave nothing, the original text is returned.
+    """
+    pages = split_pages(pdf_text)
+    page_lines = [(num, text.splitlines()) for num, text in pages]
+
+    # Count each edge line once per page
+    edge_counts: Counter[str] = Counter()
+    for _, lines in page_lines:
+        edge_counts.update({_normalize(lines[i]) for i in _edge_indexes(lines)})
+    repeat_threshold = max(3, int(min_repeat_ratio * len(pages)))
+    boilerplate = {key for key, count in edge_counts.items() if key and count >= repeat_threshold}
+
+    kept: list[tuple[int, str]] = []
+    lines_removed = 0
+    empty_pages: list[int] = []
+    toc_pages: list[int] = []
+    for num, lines in page_lines:
+        if _is_toc_page(lines):
+            toc_pages.append(num)
+            continue
+
+        drop = {
+            i for i in _edge_indexes(lines)
+            if _normalize(lines[i]) in boilerplate or PAGE_NUMBER_LINE.match(lines[i].strip())
+        }
+        lines_removed += len(drop)
+        text = _collapse_whitespace("\n".join(line for i, line in enumerate(lines) if i not in drop))
+        if len(re.sub(r"\s", "", text)) < min_page_chars:
+            empty_pages.append(num)
+            continue
+        kept.append((num, text))
+
+    if not kept:
+        logger.warning("Preprocessing would remove every page; sending the raw text")
+        return pdf_text, _report(pdf_text, pdf_text, len(pages), len(pages), [], [], 0)
+
+    cleaned = join_pages(kept)
+    report = _report(pdf_text, cleaned, len(pages), len(kept), empty_pages, toc_pages, lines_removed, len(boilerplate))
+    logger.info(
+        f"Preprocessing kept {len(kept)}/{len(pages)} pages, "
+        f"{report['chars_after']}/{report['chars_before']} chars (~{report['tokens_saved']} tokens saved)"
+    )
+    return cleaned, report
+
+
+def _report(
+    before: str,
+    after: str,
+    pages_before: int,
+    pages_after: int,
+    empty_pages: list[int],
+    toc_pages: list[int],
+    lines_removed: int,
+    boilerplate_patterns: int = 0,
+) -> dict:
+    saved = len(before) - len(after)
+    return {
+        "chars_before": len(before),
+        "chars_after": len(after),
+        "chars_saved": saved,
+        "tokens_saved": saved // CHARS_PER_TOKEN,
+        "pages_before": pages_before,
+        "pages_after": pages_after,
+        "empty_pages_dropped": empty_pages,
+        "toc_pages_dropped": toc_pages,
+        "boilerplate_lines_removed": lines_removed,
+        "boilerplate_patterns": boilerplate_patterns,
+    }
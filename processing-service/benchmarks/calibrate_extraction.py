@@ -0,0 +1,44 @@
+"""
+Time every installed PDF extraction backend on sample pages. Run from processing-service/:
+
+    python -m benchmarks.calibrate_extraction --pdf doc.pdf --samples 10
+    python -m benchmarks.calibrate_extraction --pages 200   # synthetic PDF
+
+Prints per-backend seconds and characters extracted, and the backend that
+PDF_BACKEND=auto would select for this document.
+"""
+import argparse
+import json
+import logging
+import os
+
+os.environ.setdefault("BACKEND", "memory")
+os.environ.setdefault("GEMINI_API_KEY", "calibration")
+
+from app.config import settings
+from app.services.pdf_service import PDFService
+from benchmarks.synthetic_pdf import make_pdf
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate PDF extraction backends")
+    parser.add_argument("--pdf", help="PDF to calibrate on (default: synthetic)")
+    parser.add_argument("--pages", type=int, default=100, help="Pages in the synthetic PDF")
+    parser.add_argument("--samples", type=int, default=settings.extraction_calibration_pages)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    if args.pdf:
+        with open(args.pdf, "rb") as f:
+            pdf_buffer = f.read()
+    else:
+        pdf_buffer = make_pdf(args.pages)
+
+    settings.extraction_calibration_pages = args.samples
+    print(json.dumps(PDFService().calibrate(pdf_buffer), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Load-test harness for the FastAPI service on in-memory backends.
+
+Starts the app in-process with BACKEND=memory (fake Firestore, storage and
+Gemini), seeds a synthetic document and prompts, then drives /jobs/process,
+/jobs/execute and /jobs/{job_id} at stepped target request rates over real
+HTTP. Run from processing-service/:
+
+    python -m benchmarks.load_test --rates 2,5,10,20 --duration 20 --output load.json
+
+Each step reports achieved throughput, latency percentiles and in-flight
+concurrency; the first step that misses its target rate (or whose p95 blows
+past the baseline) is reported as the saturation point.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+import threading
+import time
+import uuid
+
+# Must be set before app modules read Settings
+os.environ.setdefault("BACKEND", "memory")
+os.environ.setdefault("GEMINI_API_KEY", "load-test")
+# Every request targets the same document; cache hits would hide the pipeline cost
+os.environ.setdefault("GENERATION_CACHE_ENABLED", "false")
+
+import httpx
+import uvicorn
+
+from app.main import app
+from app.config import settings
+from app.services import firestore_service
+from app.services.storage_service import storage_service
+from benchmarks.synthetic_pdf import make_pdf
+
+DOC_ID = "load-test-doc"
+SYSTEM_PROMPT_ID = "load-test-system"
+CUSTOM_PROMPT_ID = "load-test-custom"
+
+
+def seed_fixtures(pages: int):
+    """Seed the in-memory backends with one document and a prompt pair"""
+    file_path = f"load-test/{DOC_ID}.pdf"
+    storage_service.upload_bytes(file_path, make_pdf(pages), content_type="application/pdf")
+    firestore_service.put("documents", DOC_ID, {"filePath": file_path, "status": "uploaded"})
+    firestore_service.put("system-prompts", SYSTEM_PROMPT_ID, {"content": "You are an exam author."})
+    firestore_service.put("custom-prompts", CUSTOM_PROMPT_ID, {"content": "Write multiple choice questions."})
+
+
+def create_pending_job() -> str:
+    """Create a job record directly, as Cloud Tasks would find it for /jobs/execute"""
+    job_id = str(uuid.uuid4())
+    firestore_service.create_job(job_id, {
+        "job_id": job_id,
+        "doc_id": DOC_ID,
+        "system_prompt_id": SYSTEM_PROMPT_ID,
+        "custom_prompt_id": CUSTOM_PROMPT_ID,
+        "status": "pending",
+        "attempt": 0,
+        "max_attempts": settings.max_retry_attempts,
+        "created_at": int(time.time()),
+    })
+    return job_id
+
+
+def start_server(port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def _percentiles(values: list[float]) -> dict:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None}
+    ordered = sorted(values)
+
+    def pick(pct):
+        return round(ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))], 4)
+
+    return {"p50": pick(50), "p95": pick(95), "p99": pick(99)}
+
+
+class Step:
+    """Collects results for one target rate"""
+
+    def __init__(self, target_rps: float):
+        self.target_rps = target_rps
+        self.latencies: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.completed = 0
+
+    def summary(self, elapsed: float) -> dict:
+        all_latencies = [l for values in self.latencies.values() for l in values]
+        achieved = self.completed / elapsed if elapsed else 0.0
+        mean_latency = statistics.mean(all_latencies) if all_latencies else 0.0
+        return {
+            "target_rps": self.target_rps,
+            "achieved_rps": round(achieved, 2),
+            "requests": self.completed,
+            "errors": self.errors,
+            "latency": _percentiles(all_latencies),
+            "latency_by_endpoint": {name: _percentiles(v) for name, v in self.latencies.items()},
+            "max_in_flight": self.max_in_flight,
+            # Little's law: average concurrency the instance sustained
+            "mean_concurrency": round(achieved * mean_latency, 2),
+        }
+
+
+async def _send(client: httpx.AsyncClient, step: Step, endpoint: str, job_ids: list[str]):
+    step.in_flight += 1
+    step.max_in_flight = max(step.max_in_flight, step.in_flight)
+    start = time.perf_counter()
+    try:
+        if endpoint == "process":
+            response = await client.post("/jobs/process", json={
+                "doc_id": DOC_ID,
+                "system_prompt_id": SYSTEM_PROMPT_ID,
+                "custom_prompt_id": CUSTOM_PROMPT_ID,
+            })
+            if response.status_code == 200:
+                job_ids.append(response.json()["job_id"])
+        elif endpoint == "execute":
+            response = await client.post("/jobs/execute", json={"job_id": create_pending_job()})
+        else:
+            job_id = random.choice(job_ids) if job_ids else create_pending_job()
+            response = await client.get(f"/jobs/{job_id}")
+
+        if response.status_code >= 400:
+            key = f"{endpoint}:{response.status_code}"
+            step.errors[key] = step.errors.get(key, 0) + 1
+    except Exception as e:
+        key = f"{endpoint}:{type(e).__name__}"
+        step.errors[key] = step.errors.get(key, 0) + 1
+    finally:
+        step.latencies.setdefault(endpoint, []).append(time.perf_counter() - start)
+        step.in_flight -= 1
+        step.completed += 1
+
+
+async def run_step(base_url: str, rps: float, duration: float, mix: dict[str, float], job_ids: list[str], timeout: float) -> dict:
+    step = Step(rps)
+    endpoints = list(mix)
+    weights = [mix[e] for e in endpoints]
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=httpx.Limits(max_connections=None)) as client:
+        tasks = []
+        start = time.perf_counter()
+        next_send = start
+        while next_send - start < duration:
+            await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+            endpoint = random.choices(endpoints, weights)[0]
+            tasks.append(asyncio.create_task(_send(client, step, endpoint, job_ids)))
+            # Open-loop arrivals: slow responses do not slow the sender
+            next_send += 1.0 / rps
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+    return step.summary(elapsed)
+
+
+def find_saturation(steps: list[dict], rate_tolerance: float, latency_factor: float) -> dict | None:
+    if not steps:
+        return None
+    baseline_p95 = steps[0]["latency"]["p95"] or 0.0
+    for step in steps:
+        missed_rate = step["achieved_rps"] < step["target_rps"] * (1 - rate_tolerance)
+        blown_latency = baseline_p95 and step["latency"]["p95"] > baseline_p95 * latency_factor
+        if missed_rate or blown_latency:
+            return {
+                "target_rps": step["target_rps"],
+                "max_in_flight": step["max_in_flight"],
+                "mean_concurrency": step["mean_concurrency"],
+                "reason": "throughput" if missed_rate else "latency",
+            }
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the processing service on in-memory backends")
+    parser.add_argument("--rates", default="1,2,5,10", help="Comma-separated target requests/second")
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds per rate step")
+    parser.add_argument("--mix", default="process=1,execute=1,status=8", help="Endpoint weights")
+    parser.add_argument("--pages", type=int, default=50, help="Pages in the seeded synthetic PDF")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--rate-tolerance", type=float, default=0.10, help="Allowed shortfall vs target rate")
+    parser.add_argument("--latency-factor", type=float, default=3.0, help="p95 multiple of the first step that counts as saturated")
+    parser.add_argument("--output", default="load-test-results.json")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+    if settings.backend != "memory":
+        raise SystemExit("Load tests must run with BACKEND=memory")
+
+    mix = {k: float(v) for k, v in (item.split("=") for item in args.mix.split(","))}
+    seed_fixtures(args.pages)
+    server = start_server(args.port)
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    job_ids: list[str] = []
+    steps = []
+    try:
+        for rate in (float(r) for r in args.rates.split(",") if r):
+            result = asyncio.run(run_step(base_url, rate, args.duration, mix, job_ids, args.timeout))
+            steps.append(result)
+            print(
+                f"target {rate:>6.1f} rps | achieved {result['achieved_rps']:>6.2f} rps | "
+                f"p50 {result['latency']['p50']}s p95 {result['latency']['p95']}s p99 {result['latency']['p99']}s | "
+                f"max in-flight {result['max_in_flight']} | errors {sum(result['errors'].values())}"
+            )
+    finally:
+        server.should_exit = True
+
+    report = {
+        "config": {
+            "mix": mix,
+            "duration": args.duration,
+            "pages": args.pages,
+            "fake_gemini_latency": settings.fake_gemini_latency,
+            "fake_gemini_profile": settings.fake_gemini_profile,
+        },
+        "steps": steps,
+        "saturation": find_saturation(steps, args.rate_tolerance, args.latency_factor),
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaturation: {report['saturation'] or 'not reached'}")
+    print(f"Wrote results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
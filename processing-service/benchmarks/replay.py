@@ -0,0 +1,128 @@
+"""
+Replay recorded Gemini cassettes through the pipeline.
+
+Record cassettes in production with RECORD_GEMINI=true (see README), then
+run from processing-service/:
+
+    # Responses only: parse + transform each recorded batch
+    python -m benchmarks.replay --cassette cassettes/<job_id>.jsonl --timing none
+
+    # End to end: re-extract the original PDF and answer Gemini calls from the cassette
+    python -m benchmarks.replay --cassette gs://bucket/cassettes/<job_id>.jsonl \
+        --pdf doc.pdf --system-prompt system.txt --custom-prompt custom.txt --time-scale 0.1
+
+Results use the run_benchmarks JSON format, so --compare works the same way.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import time
+
+from app.services.cassette import ReplayGeminiClient, load_cassette
+from app.services.gemini_service import GeminiService
+from app.services.metrics import JobStats
+from benchmarks.run_benchmarks import _git_commit, _result, compare
+
+
+def replay_responses(entries: list[dict], timing: str, time_scale: float) -> float:
+    """Feed recorded responses through parse + transform, honoring recorded latency"""
+    service = GeminiService(client=ReplayGeminiClient(entries, timing="none"))
+    start = time.perf_counter()
+    raw_questions = []
+    for entry in entries:
+        if timing == "original":
+            time.sleep(entry["latency"] * time_scale)
+        raw_questions.extend(service._parse_gemini_response(entry["response_text"]))
+    service._transform_questions(raw_questions)
+    return time.perf_counter() - start
+
+
+def replay_end_to_end(entries: list[dict], pdf_buffer: bytes, system_prompt: str, custom_prompt: str,
+                      timing: str, time_scale: float) -> tuple[float, dict]:
+    """Run generate_questions with Gemini answered from the cassette"""
+    client = ReplayGeminiClient(entries, timing=timing, time_scale=time_scale)
+    service = GeminiService(client=client)
+    stats = JobStats()
+    start = time.perf_counter()
+    questions = service.generate_questions(pdf_buffer, system_prompt, custom_prompt, stats=stats)
+    elapsed = time.perf_counter() - start
+    return elapsed, {
+        "questions": len(questions),
+        "hash_hits": client.hash_hits,
+        "order_hits": client.order_hits,
+        "recorded_models": client.recorded_models,
+        "stages": stats.summary()["stages"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a Gemini cassette through the pipeline")
+    parser.add_argument("--cassette", required=True, help="Local path or gs:// URI")
+    parser.add_argument("--pdf", help="Original PDF for an end-to-end replay")
+    parser.add_argument("--system-prompt", help="File with the original system prompt")
+    parser.add_argument("--custom-prompt", help="File with the original custom prompt")
+    parser.add_argument("--timing", choices=["original", "none"], default="original")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Multiplier on recorded latencies")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--output", default="benchmark-results-replay.json")
+    parser.add_argument("--compare", help="Baseline results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    header, entries = load_cassette(args.cassette)
+    params = {
+        "cassette": os.path.basename(args.cassette),
+        "timing": args.timing,
+        "time_scale": args.time_scale,
+    }
+    models = sorted({str(e["model"]) for e in entries})
+    print(f"Loaded {len(entries)} batches recorded from job {header.get('job_id')} ({', '.join(models)})")
+
+    results = []
+    if args.pdf:
+        with open(args.pdf, "rb") as f:
+            pdf_buffer = f.read()
+        system_prompt = open(args.system_prompt).read() if args.system_prompt else ""
+        custom_prompt = open(args.custom_prompt).read() if args.custom_prompt else ""
+
+        runs, details = [], {}
+        for _ in range(args.repeat):
+            elapsed, details = replay_end_to_end(
+                entries, pdf_buffer, system_prompt, custom_prompt, args.timing, args.time_scale
+            )
+            runs.append(elapsed)
+        result = _result("replay_end_to_end", params, runs)
+        result["details"] = details
+        results.append(result)
+        print(f"Prompt hash matches: {details['hash_hits']}, order fallbacks: {details['order_hits']}")
+    else:
+        runs = [replay_responses(entries, args.timing, args.time_scale) for _ in range(args.repeat)]
+        results.append(_result("replay_responses", params, runs))
+
+    report = {
+        "meta": {
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": int(time.time()),
+            "repeat": args.repeat,
+            "cassette_job_id": header.get("job_id"),
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote results to {args.output}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Micro-benchmarks for the processing pipeline.
+
+Run from processing-service/:
+
+    python -m benchmarks.run_benchmarks --output bench.json
+    python -m benchmarks.run_benchmarks --output new.json --compare bench.json
+
+Gemini is replaced by FakeGeminiClient, so no API calls are made.
+"""
+import argparse
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Callable
+
+from testing.fakes import FakeGeminiClient, make_questions_payload
+from app.services.gemini_service import GeminiService, PAGES_PER_BATCH
+from app.services.pdf_service import pdf_service
+from benchmarks.synthetic_pdf import make_pdf
+
+DEFAULT_PAGE_COUNTS = [10, 100, 1000, 5000]
+DEFAULT_QUESTION_COUNTS = [1000, 10000]
+
+
+def _time(func: Callable[[], object], repeat: int) -> list[float]:
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - start)
+    return runs
+
+
+def _result(name: str, params: dict, runs: list[float]) -> dict:
+    result = {
+        "name": name,
+        "params": params,
+        "runs": [round(r, 6) for r in runs],
+        "min": round(min(runs), 6),
+        "median": round(statistics.median(runs), 6),
+        "mean": round(statistics.mean(runs), 6),
+    }
+    print(f"{name:<22} {json.dumps(params):<32} median {result['median']:.4f}s  min {result['min']:.4f}s")
+    return result
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def run(page_counts: list[int], question_counts: list[int], repeat: int, fake_latency: float) -> list[dict]:
+    service = GeminiService(client=FakeGeminiClient(latency=fake_latency))
+    results = []
+
+    for pages in page_counts:
+        pdf_buffer = make_pdf(pages)
+        params = {"pages": pages}
+
+        results.append(_result("extract_text", params, _time(lambda: pdf_service.extract_text(pdf_buffer), repeat)))
+
+        pdf_text = pdf_service.extract_text(pdf_buffer)
+        results.append(_result(
+            "split_text_by_pages", params,
+            _time(lambda: service._split_text_by_pages(pdf_text, PAGES_PER_BATCH), repeat),
+        ))
+
+        results.append(_result(
+            "generate_questions", {**params, "fake_latency": fake_latency},
+            _time(lambda: service.generate_questions(pdf_buffer, "system", "custom"), repeat),
+        ))
+
+    for count in question_counts:
+        payload = make_questions_payload(count)
+        params = {"questions": count}
+
+        results.append(_result("parse_response", params, _time(lambda: service._parse_gemini_response(payload), repeat)))
+
+        raw_questions = service._parse_gemini_response(payload)
+        results.append(_result("transform_questions", params, _time(lambda: service._transform_questions(raw_questions), repeat)))
+
+    return results
+
+
+def compare(results: list[dict], baseline_path: str, threshold: float) -> bool:
+    """Print median ratios against a baseline file; return True if any regression exceeds threshold"""
+    with open(baseline_path) as f:
+        baseline = {
+            (r["name"], json.dumps(r["params"], sort_keys=True)): r
+            for r in json.load(f)["results"]
+        }
+
+    regressed = False
+    print(f"\nComparison against {baseline_path} (median, new/old):")
+    for r in results:
+        old = baseline.get((r["name"], json.dumps(r["params"], sort_keys=True)))
+        if not old or not old["median"]:
+            continue
+        ratio = r["median"] / old["median"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressed = True
+        print(f"{r['name']:<22} {json.dumps(r['params']):<32} {ratio:.2f}x{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the processing pipeline")
+    parser.add_argument("--pages", default=",".join(map(str, DEFAULT_PAGE_COUNTS)), help="Comma-separated page counts")
+    parser.add_argument("--questions", default=",".join(map(str, DEFAULT_QUESTION_COUNTS)), help="Comma-separated question counts")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--fake-latency", type=float, default=0.0, help="Seconds per fake Gemini call")
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--compare", help="Baseline results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown before flagging (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    # The services log every page and batch at INFO
+    logging.basicConfig(level=logging.WARNING)
+
+    results = run(
+        page_counts=[int(p) for p in args.pages.split(",") if p],
+        question_counts=[int(q) for q in args.questions.split(",") if q],
+        repeat=args.repeat,
+        fake_latency=args.fake_latency,
+    )
+
+    report = {
+        "meta": {
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": int(time.time()),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {len(results)} results to {args.output}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Generate synthetic text PDFs for benchmarks using only pypdf.
+
+Pages carry a running header and footer plus a body of varied sentences,
+which roughly matches the shape of the course material we process.
+"""
+import io
+import random
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+WORDS = (
+    "network protocol latency throughput cache memory process thread kernel "
+    "storage replica consensus partition index query transaction isolation "
+    "schema encryption certificate routing gateway balancer container cluster"
+).split()
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _page_lines(rng: random.Random, page_num: int, lines_per_page: int) -> list[str]:
+    lines = [f"Synthetic Course Handbook - Chapter {page_num // 20 + 1}"]
+    for _ in range(lines_per_page):
+        lines.append(" ".join(rng.choice(WORDS) for _ in range(12)).capitalize() + ".")
+    lines.append(f"Copyright 2025 SuperExam. Page {page_num}")
+    return lines
+
+
+def make_pdf(pages: int, lines_per_page: int = 40, seed: int = 0) -> bytes:
+    """Build a PDF with `pages` pages of extractable text"""
+    rng = random.Random(seed)
+    writer = PdfWriter()
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    })
+    font_ref = writer._add_object(font)
+    resources = DictionaryObject({
+        NameObject("/Font"): DictionaryObject({NameObject("/F1"): font_ref})
+    })
+
+    for page_num in range(1, pages + 1):
+        page = writer.add_blank_page(width=612, height=792)
+        ops = ["BT", "/F1 9 Tf", "11 TL", "40 760 Td"]
+        for line in _page_lines(rng, page_num, lines_per_page):
+            ops.append(f"({_escape(line)}) Tj T*")
+        ops.append("ET")
+
+        stream = DecodedStreamObject()
+        stream.set_data("\n".join(ops).encode("latin-1"))
+        page[NameObject("/Resources")] = resources
+        page[NameObject("/Contents")] = writer._add_object(stream)
+
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
@@ -0,0 +1,9 @@
+"""
+Test doubles for the memory backend (BACKEND=memory), used by the tests,
+benchmarks and load tests. Kept out of the app package so they are not
+shipped in the service image.
+"""
+# app.services builds its singletons on import, and with BACKEND=memory those
+# import testing.fakes, which itself imports app.services modules. Loading the
+# package first keeps that cycle in one order whichever side is imported first.
+import app.services  # noqa: F401
@@ -0,0 +1,388 @@
+import copy
+import json
+import time
+import random
+import logging
+import threading
+from typing import Callable, Optional
+from google.genai import errors
+from app.services.canned_response import CannedResponse
+from app.services.job_keys import is_joinable
+from app.services.lifecycle import add_counts, cancel_updates, expire_at, is_compactable, job_expire_at, rollup_jobs
+
+logger = logging.getLogger(__name__)
+
+# Named failure/latency profiles for FakeGeminiClient
+FAILURE_PROFILES = {
+    "none": {},
+    "flaky": {"failure_rate": 0.1, "failure_kind": "429"},
+    "overloaded": {"failure_rate": 0.3, "failure_kind": "503"},
+    "timeouts": {"failure_rate": 0.1, "failure_kind": "timeout"},
+    "slow_tail": {"tail_probability": 0.05, "tail_multiplier": 10.0},
+}
+
+
+def make_questions_payload(count: int, start: int = 0) -> str:
+    """Build a QuestionsResponse-shaped JSON payload with `count` questions"""
+    questions = []
+    for i in range(start, start + count):
+        questions.append({
+            "questionText": f"Synthetic question {i}: which option describes concept {i}?",
+            "options": [
+                {"index": letter, "text": f"Option {letter} for concept {i}"}
+                for letter in ("A", "B", "C", "D")
+            ],
+            "correctAnswer": ["ABCD"[i % 4]],
+        })
+    return json.dumps({"questions": questions})
+
+
+class FakeGeminiClient:
+    """
+    In-memory stand-in for genai.Client used by benchmarks and load tests.
+
+    Exposes client.models.generate_content(...) like the real SDK and
+    answers with canned questions after a configurable latency. Failures
+    are raised as the SDK's own error types so retry handling sees the
+    same exceptions it would in production. model_latency and
+    model_failure_rate override latency and failure_rate per model name,
+    to exercise model routing.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        questions_per_call: int = 20,
+        latency_jitter: float = 0.0,
+        failure_rate: float = 0.0,
+        failure_kind: str = "429",
+        tail_probability: float = 0.0,
+        tail_multiplier: float = 1.0,
+        seed: Optional[int] = None,
+        model_latency: Optional[dict[str, float]] = None,
+        model_failure_rate: Optional[dict[str, float]] = None,
+    ):
+        self.latency = latency
+        self.questions_per_call = questions_per_call
+        self.latency_jitter = latency_jitter
+        self.failure_rate = failure_rate
+        self.failure_kind = failure_kind
+        self.tail_probability = tail_probability
+        self.tail_multiplier = tail_multiplier
+        self.model_latency = model_latency or {}
+        self.model_failure_rate = model_failure_rate or {}
+        self.calls_by_model: dict[str, int] = {}
+        self.calls = 0
+        self.failures = 0
+        self.models = self
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_profile(cls, profile: str, latency: float = 0.0, **overrides) -> "FakeGeminiClient":
+        """Build a client from a named entry in FAILURE_PROFILES"""
+        if profile not in FAILURE_PROFILES:
+            raise ValueError(f"Unknown fake Gemini profile '{profile}'. Options: {', '.join(FAILURE_PROFILES)}")
+        return cls(latency=latency, **{**FAILURE_PROFILES[profile], **overrides})
+
+    def _raise_failure(self):
+        if self.failure_kind == "timeout":
+            raise TimeoutError("Fake Gemini request timed out")
+        if self.failure_kind == "503":
+            raise errors.ServerError(503, {"error": {"message": "The model is overloaded.", "status": "UNAVAILABLE"}})
+        raise errors.ClientError(429, {"error": {"message": "Resource has been exhausted.", "status": "RESOURCE_EXHAUSTED"}})
+
+    def generate_content(self, model: str, contents: str, config: Optional[dict] = None) -> CannedResponse:
+        with self._lock:
+            self.calls += 1
+            self.calls_by_model[model] = self.calls_by_model.get(model, 0) + 1
+            call_num = self.calls
+            delay = self.model_latency.get(model, self.latency)
+            failure_rate = self.model_failure_rate.get(model, self.failure_rate)
+            if self.latency_jitter:
+                delay = max(0.0, delay + self._rng.uniform(-self.latency_jitter, self.latency_jitter))
+            if self.tail_probability and self._rng.random() < self.tail_probability:
+                delay *= self.tail_multiplier
+            fail = failure_rate and self._rng.random() < failure_rate
+            if fail:
+                self.failures += 1
+
+        if delay:
+            time.sleep(delay)
+        if fail:
+            self._raise_failure()
+
+        text = make_questions_payload(self.questions_per_call, start=call_num * self.questions_per_call)
+        return CannedResponse(text, prompt_chars=len(contents))
+
+
+class InMemoryStorageService:
+    """Dict-backed replacement for StorageService"""
+
+    def __init__(self, bucket_name: str = "memory"):
+        self.bucket_name = bucket_name
+        self.objects: dict[str, bytes] = {}
+
+    def exists(self, path: str) -> bool:
+        return path in self.objects
+
+    def download_bytes(self, path: str) -> bytes:
+        if path not in self.objects:
+            raise FileNotFoundError(f"File not found in memory bucket {self.bucket_name}: {path}")
+        return self.objects[path]
+
+    def upload_bytes(self, path: str, data: bytes, content_type: str = "application/octet-stream") -> str:
+        self.objects[path] = data
+        return f"memory://{self.bucket_name}/{path}"
+
+    def delete(self, path: str):
+        self.objects.pop(path, None)
+
+
+class InMemoryFirestoreService:
+    """
+    Dict-backed replacement for FirestoreService with the same public methods.
+
+    Collections are keyed by their unprefixed name; subcollections use
+    "parent/doc_id/child" keys. Rate limits are not enforced by default so
+    load tests measure the service rather than the limiter's rejections.
+    """
+
+    def __init__(self, enforce_rate_limits: bool = False):
+        self.collections: dict[str, dict[str, dict]] = {}
+        self.enforce_rate_limits = enforce_rate_limits
+        self.prefix = ""
+        self.job_write_listeners: list[Callable[[str], None]] = []
+        self._lock = threading.Lock()
+
+    def _job_written(self, job_ids: list[str]):
+        for job_id in job_ids:
+            for listener in self.job_write_listeners:
+                listener(job_id)
+
+    def _coll(self, name: str) -> dict[str, dict]:
+        return self.collections.setdefault(name, {})
+
+    def put(self, collection: str, doc_id: str, data: dict):
+        """Seed a document directly (test and load-test fixtures)"""
+        with self._lock:
+            self._coll(collection)[doc_id] = copy.deepcopy(data)
+
+    def check_rate_limit(self, key: str, limit: int, window_seconds: int) -> bool:
+        if not self.enforce_rate_limits:
+            return True
+        with self._lock:
+            now = time.time()
+            entry = self._coll("rate_limits").get(key)
+            if not entry or now > entry["reset_at"]:
+                self._coll("rate_limits")[key] = {
+                    "count": 1, "reset_at": now + window_seconds, "expireAt": expire_at(window_seconds, now),
+                }
+                return True
+            if entry["count"] >= limit:
+                return False
+            entry["count"] += 1
+            return True
+
+    def get_document(self, doc_id: str) -> Optional[dict]:
+        with self._lock:
+            doc = self._coll("documents").get(doc_id)
+            return {"id": doc_id, **copy.deepcopy(doc)} if doc is not None else None
+
+    def get_prompt(self, collection: str, prompt_id: str) -> Optional[str]:
+        with self._lock:
+            prompt = self._coll(collection).get(prompt_id)
+            return prompt.get("content") if prompt else None
+
+    def update_status(
+        self,
+        doc_id: str,
+        status: str,
+        progress: Optional[int] = None,
+        current_step: Optional[str] = None,
+        error: Optional[str] = None
+    ):
+        with self._lock:
+            doc = self._coll("documents").setdefault(doc_id, {})
+            doc.update({"status": status, "updatedAt": int(time.time() * 1000)})
+            if progress is not None:
+                doc["progress"] = progress
+            if current_step is not None:
+                doc["currentStep"] = current_step
+            if error is not None:
+                doc["error"] = error
+            if status in ["ready", "failed"]:
+                doc.pop("progress", None)
+                doc.pop("currentStep", None)
+
+    def save_questions(self, doc_id: str, questions: list[dict]):
+        with self._lock:
+            doc = self._coll("documents").setdefault(doc_id, {})
+            doc.update({"status": "ready", "questionCount": len(questions), "updatedAt": int(time.time() * 1000)})
+            doc.pop("progress", None)
+            doc.pop("currentStep", None)
+            doc.pop("questionBank", None)
+            subcollection = self._coll(f"documents/{doc_id}/questions")
+            for q in questions:
+                subcollection[q["id"]] = copy.deepcopy(q)
+
+    def append_questions(self, doc_id: str, questions: list[dict], question_count: int, final: bool = False):
+        with self._lock:
+            doc = self._coll("documents").setdefault(doc_id, {})
+            doc.update({
+                "status": "ready" if final else "ready_partial",
+                "questionCount": question_count,
+                "updatedAt": int(time.time() * 1000),
+            })
+            if final:
+                doc.pop("progress", None)
+                doc.pop("currentStep", None)
+                doc.pop("questionBank", None)
+            subcollection = self._coll(f"documents/{doc_id}/questions")
+            for q in questions:
+                subcollection[q["id"]] = copy.deepcopy(q)
+
+    def save_question_bank(self, doc_id: str, shards: list[list[dict]], index: dict):
+        with self._lock:
+            bank = self._coll(f"documents/{doc_id}/question_bank")
+            bank.clear()
+            for entry, questions in zip(index["shards"], shards):
+                bank[entry["id"]] = {
+                    "version": index["version"],
+                    "start": entry["start"],
+                    "questions": copy.deepcopy(questions),
+                }
+            self._coll("documents").setdefault(doc_id, {})["questionBank"] = copy.deepcopy(index)
+
+    def set_page_index(self, doc_id: str, page_index: dict):
+        with self._lock:
+            self._coll("documents").setdefault(doc_id, {})["pageIndex"] = copy.deepcopy(page_index)
+
+    def create_job(self, job_id: str, job_data: dict):
+        job_data['createdAt'] = int(time.time() * 1000)
+        job_data['expireAt'] = job_expire_at()
+        self.put("jobs", job_id, job_data)
+        self._job_written([job_id])
+
+    def find_active_job(self, request_key: str) -> Optional[str]:
+        with self._lock:
+            key_doc = self._coll("job_keys").get(request_key)
+            if not key_doc:
+                return None
+            job = self._coll("jobs").get(key_doc["job_id"])
+            return key_doc["job_id"] if job and is_joinable(job) else None
+
+    def create_job_once(self, request_key: str, job_id: str, job_data: dict) -> str:
+        with self._lock:
+            key_doc = self._coll("job_keys").get(request_key)
+            if key_doc:
+                existing = self._coll("jobs").get(key_doc["job_id"])
+                if existing and is_joinable(existing):
+                    return key_doc["job_id"]
+            now_ms = int(time.time() * 1000)
+            expiry = job_expire_at()
+            self._coll("jobs")[job_id] = {
+                **copy.deepcopy(job_data), "request_key": request_key, "createdAt": now_ms, "expireAt": expiry,
+            }
+            self._coll("job_keys")[request_key] = {"job_id": job_id, "createdAt": now_ms, "expireAt": expiry}
+            return job_id
+
+    def create_job_group(self, group_id: str, group_data: dict, jobs: list[tuple[str, str, dict]]) -> dict[str, str]:
+        with self._lock:
+            now_ms = int(time.time() * 1000)
+            expiry = job_expire_at()
+            winners = {}
+            for key, job_id, job_data in jobs:
+                key_doc = self._coll("job_keys").get(key)
+                existing = self._coll("jobs").get(key_doc["job_id"]) if key_doc else None
+                if existing and is_joinable(existing):
+                    winners[key] = key_doc["job_id"]
+                    continue
+                self._coll("jobs")[job_id] = {
+                    **copy.deepcopy(job_data), "request_key": key, "createdAt": now_ms, "expireAt": expiry,
+                }
+                self._coll("job_keys")[key] = {"job_id": job_id, "createdAt": now_ms, "expireAt": expiry}
+                winners[key] = job_id
+            self._coll("job_groups")[group_id] = {
+                **copy.deepcopy(group_data), "job_ids": list(winners.values()), "createdAt": now_ms, "expireAt": expiry,
+            }
+            return winners
+
+    def get_job_group(self, group_id: str) -> Optional[dict]:
+        with self._lock:
+            group = self._coll("job_groups").get(group_id)
+            return copy.deepcopy(group) if group is not None else None
+
+    def get_job(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._coll("jobs").get(job_id)
+            return copy.deepcopy(job) if job is not None else None
+
+    def get_jobs(self, job_ids: list[str]) -> dict[str, dict]:
+        with self._lock:
+            jobs = self._coll("jobs")
+            return {job_id: copy.deepcopy(jobs[job_id]) for job_id in job_ids if job_id in jobs}
+
+    def list_recent_jobs(self, limit: int = 50) -> list[dict]:
+        with self._lock:
+            jobs = sorted(self._coll("jobs").values(), key=lambda j: j.get("createdAt", 0), reverse=True)
+            return copy.deepcopy(jobs[:limit])
+
+    def update_job(self, job_id: str, updates: dict):
+        with self._lock:
+            job = self._coll("jobs").get(job_id)
+            if job is None:
+                raise KeyError(f"Job {job_id} not found")
+            job.update(copy.deepcopy(updates))
+            job['updatedAt'] = int(time.time() * 1000)
+        self._job_written([job_id])
+
+    def start_job(self, job_id: str, updates: dict) -> bool:
+        with self._lock:
+            job = self._coll("jobs").get(job_id)
+            if job is None or job.get("status") == "cancelled":
+                return False
+            job.update(copy.deepcopy(updates))
+            job['updatedAt'] = int(time.time() * 1000)
+        self._job_written([job_id])
+        return True
+
+    def cancel_job(self, job_id: str, keep_partial: bool = False) -> Optional[dict]:
+        with self._lock:
+            job = self._coll("jobs").get(job_id)
+            if job is None:
+                return None
+            before = copy.deepcopy(job)
+            updates = cancel_updates(job, keep_partial)
+            if updates:
+                job.update(updates)
+                job['updatedAt'] = int(time.time() * 1000)
+        self._job_written([job_id])
+        return before
+
+    def list_compactable_jobs(self, completed_before: int, limit: int) -> list[str]:
+        with self._lock:
+            finished = [
+                (job["completed_at"], job_id) for job_id, job in self._coll("jobs").items()
+                if job.get("completed_at") and job["completed_at"] < completed_before
+            ]
+            return [job_id for _, job_id in sorted(finished)[:limit]]
+
+    def compact_jobs(self, job_ids: list[str], completed_before: int) -> int:
+        with self._lock:
+            jobs = self._coll("jobs")
+            compacted = [job_id for job_id in job_ids if job_id in jobs and is_compactable(jobs[job_id], completed_before)]
+            summaries = self._coll("job_summaries")
+            for day, increments in rollup_jobs([jobs[job_id] for job_id in compacted]).items():
+                summary = summaries.setdefault(day, {})
+                add_counts(summary, increments)
+                summary.update({"day": day, "updatedAt": int(time.time() * 1000)})
+            for job_id in compacted:
+                del jobs[job_id]
+        self._job_written(compacted)
+        return len(compacted)
+
+    def list_job_summaries(self, days: int = 30) -> list[dict]:
+        with self._lock:
+            summaries = self._coll("job_summaries")
+            return [copy.deepcopy(summaries[day]) for day in sorted(summaries, reverse=True)[:days]]
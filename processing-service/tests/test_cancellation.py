@@ -0,0 +1,58 @@
+import unittest
+import threading
+import time
+import sys
+import os
+
+# Add processing-service to path so we can import app
+sys.path.append(os.path.abspath('processing-service'))
+
+from app.services.cancellation import CancellationToken, JobCancelled
+from testing.fakes import FakeGeminiClient
+from app.services.gemini_service import GeminiService
+from benchmarks.synthetic_pdf import make_pdf
+
+
+class TestCancellation(unittest.TestCase):
+    def _token(self):
+        # Large poll interval keeps the token local (no Firestore reads)
+        return CancellationToken("job-1", poll_interval=3600)
+
+    def test_wait_raises_promptly(self):
+        token = self._token()
+        threading.Timer(0.1, token.cancel).start()
+
+        start = time.monotonic()
+        with self.assertRaises(JobCancelled):
+            token.wait(30)
+        self.assertLess(time.monotonic() - start, 2)
+
+    def test_in_flight_call_is_abandoned_with_partial_results(self):
+        token = self._token()
+        fake = FakeGeminiClient(questions_per_call=5)
+        release = threading.Event()
+
+        class HangingSecondCall:
+            """First batch answers, second batch hangs until released"""
+            models = None
+
+            def generate_content(self, **request):
+                if fake.calls >= 1:
+                    token.cancel()
+                    release.wait(30)
+                return fake.generate_content(**request)
+
+        client = HangingSecondCall()
+        client.models = client
+        service = GeminiService(client=client)
+
+        start = time.monotonic()
+        with self.assertRaises(JobCancelled) as cm:
+            service.generate_questions(make_pdf(250), "system", "custom", cancel_token=token)
+        release.set()
+
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertEqual(len(cm.exception.partial_questions), 5)
+
+if __name__ == '__main__':
+    unittest.main()
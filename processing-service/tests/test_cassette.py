@@ -0,0 +1,74 @@
+import unittest
+from unittest.mock import patch
+import tempfile
+import sys
+import os
+
+# Add processing-service to path so we can import app
+sys.path.append(os.path.abspath('processing-service'))
+
+from app.config import settings
+from app.services.cassette import CassetteRecorder, ReplayGeminiClient, load_cassette
+from app.services.generation_cache import GenerationCache
+from testing.fakes import FakeGeminiClient, make_questions_payload
+from app.services.gemini_service import GeminiService
+from benchmarks.synthetic_pdf import make_pdf
+
+
+class TestCassette(unittest.TestCase):
+    def _record(self, cassette_dir):
+        recorder = CassetteRecorder("job-1", "doc-1")
+        recorder.record(2, (101, 200), "prompt two", make_questions_payload(3, start=3), "STOP", 0.5, {}, "flash")
+        recorder.record(1, (1, 100), "prompt one", make_questions_payload(3), "MAX_TOKENS", 1.5, {}, "pro")
+        with patch('app.services.cassette.settings') as mock_settings:
+            mock_settings.cassette_dir = cassette_dir
+            return recorder.save()
+
+    def test_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = self._record(tmp)
+            raw = open(path).read()
+            header, entries = load_cassette(path)
+
+        self.assertEqual(header["job_id"], "job-1")
+        self.assertEqual([e["batch"] for e in entries], [1, 2])
+        self.assertEqual(entries[0]["start_page"], 1)
+        self.assertEqual(entries[0]["finish_reason"], "MAX_TOKENS")
+        self.assertEqual([e["model"] for e in entries], ["pro", "flash"])
+        # Only the prompt hash is stored, never the document text
+        self.assertNotIn("prompt one", raw)
+
+    def test_replay_matches_by_hash_then_order(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            _, entries = load_cassette(self._record(tmp))
+
+        client = ReplayGeminiClient(entries, timing="none")
+        self.assertEqual(client.models.generate_content("m", "prompt two").text, entries[1]["response_text"])
+        # Unknown prompt falls back to recording order (second call -> second entry)
+        self.assertEqual(client.models.generate_content("m", "changed prompt").text, entries[1]["response_text"])
+        self.assertEqual((client.hash_hits, client.order_hits), (1, 1))
+        self.assertEqual(client.recorded_models, {"flash": 2})
+
+    def test_replayed_responses_parse(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            _, entries = load_cassette(self._record(tmp))
+
+        service = GeminiService(client=ReplayGeminiClient(entries, timing="none"))
+        text = service._call_gemini_with_retry("prompt one", 1, 1)
+        self.assertEqual(len(service._parse_gemini_response(text)), 3)
+
+    def test_recording_bypasses_the_generation_cache(self):
+        client = FakeGeminiClient()
+        service = GeminiService(client=client, cache=GenerationCache(ttl_seconds=60, max_bytes=10_000_000))
+        pdf_buffer = make_pdf(250)
+        service.generate_questions(pdf_buffer, "system", "custom")
+
+        recorder = CassetteRecorder("job-2", "doc-1")
+        service.generate_questions(pdf_buffer, "system", "custom", recorder=recorder)
+        self.assertEqual(client.calls, 6)
+        self.assertEqual([e["batch"] for e in sorted(recorder.entries, key=lambda e: e["batch"])], [1, 2, 3])
+        self.assertEqual({e["model"] for e in recorder.entries}, {settings.gemini_model})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+import threading
+import time
+import sys
+import os
+
+# Add processing-service to path so we can import app
+sys.path.append(os.path.abspath('processing-service'))
+
+from app.services.cancellation import CancellationToken, JobCancelled
+from app.services.concurrency_limiter import AdaptiveLimiter
+
+
+class TestAdaptiveLimiter(unittest.TestCase):
+    def test_additive_increase_multiplicative_decrease(self):
+        limiter = AdaptiveLimiter(initial=4, min_limit=1, max_limit=8)
+        for _ in range(20):
+            limiter.acquire("job")
+            limiter.release("success", 1.0)
+        self.assertGreater(limiter.limit, 4)
+
+        before = limiter.limit
+        limiter.acquire("job")
+        limiter.release("overload")
+        self.assertEqual(limiter.limit, max(1, int(before * 0.5)))
+
+        # A second 429 from the same congestion event is not counted again
+        limiter.acquire("job")
+        limiter.release("overload")
+        self.assertEqual(limiter.limit, max(1, int(before * 0.5)))
+
+    def test_slow_success_counts_as_congestion(self):
+        limiter = AdaptiveLimiter(initial=8, min_limit=1, max_limit=8, latency_tolerance=2.0)
+        for _ in range(5):
+            limiter.acquire("job")
+            limiter.release("success", 1.0)
+        limiter.acquire("job")
+        limiter.release("success", 5.0)
+        self.assertEqual(limiter.limit, 4)
+
+    def test_latency_is_compared_per_prompt_token(self):
+        limiter = AdaptiveLimiter(initial=4, min_limit=1, max_limit=8, latency_tolerance=2.0)
+        for tokens in (1000, 2000, 4000, 8000, 16000):
+            limiter.acquire("job")
+            limiter.release("success", tokens / 1000, tokens)
+        # Prompts grew 16x and latency with them, which is not congestion
+        self.assertGreater(limiter.limit, 4)
+
+    def test_baseline_follows_a_lasting_slowdown(self):
+        limiter = AdaptiveLimiter(initial=8, min_limit=1, max_limit=8, latency_tolerance=2.0)
+        limiter.acquire("job")
+        limiter.release("success", 1.0)
+        for _ in range(20):
+            limiter.acquire("job")
+            limiter.release("success", 3.0)
+        low = limiter.limit
+        for _ in range(10):
+            limiter.acquire("job")
+            limiter.release("success", 3.0)
+        # The baseline caught up with 3s calls, so the limit recovers instead of pinning at min_limit
+        self.assertGreater(limiter.limit, low)
+
+    def test_queued_calls_are_served_round_robin_across_jobs(self):
+        limiter = AdaptiveLimiter(initial=1, min_limit=1, max_limit=1)
+        limiter.acquire("holder")
+        order = []
+
+        def call(job):
+            limiter.acquire(job)
+            order.append(job)
+            limiter.release("error")
+
+        threads = []
+        for job in ["big", "big", "big", "small"]:
+            thread = threading.Thread(target=call, args=(job,))
+            thread.start()
+            threads.append(thread)
+            time.sleep(0.05)
+        self.assertEqual(limiter.queue_depth, 4)
+
+        limiter.release("error")
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(order, ["big", "small", "big", "big"])
+        self.assertEqual(limiter.in_flight, 0)
+
+    def test_cancel_while_queued_frees_the_place(self):
+        limiter = AdaptiveLimiter(initial=1, min_limit=1, max_limit=1)
+        limiter.acquire("holder")
+        token = CancellationToken("job-1", poll_interval=3600)
+        threading.Timer(0.1, token.cancel).start()
+
+        with self.assertRaises(JobCancelled):
+            limiter.acquire("job-1", token)
+        self.assertEqual(limiter.queue_depth, 0)
+        limiter.release("error")
+        self.assertEqual(limiter.in_flight, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+import sys
+import os
+
+# Add processing-service to path so we can import app
+sys.path.append(os.path.abspath('processing-service'))
+
+from app.services.dedup import NearDuplicateFilter, lsh_bands
+
+
+def _question(text: str, choices: list[str]) -> dict:
+    return {
+        "questionText": text,
+        "options": [{"index": "ABCD"[i], "text": c} for i, c in enumerate(choices)],
+        "correctAnswer": ["A"],
+    }
+
+
+CHOICES = ["Routing table", "ARP cache", "MAC table", "DNS resolver"]
+
+
+class TestNearDuplicateFilter(unittest.TestCase):
+    def test_drops_rewordings_across_batches(self):
+        dedup = NearDuplicateFilter(threshold=0.7)
+        first = dedup.filter([
+            _question("Which table does a router consult to choose the next hop for a packet?", CHOICES),
+            _question("What does a switch use to forward frames within a VLAN?", CHOICES),
+        ])
+        second = dedup.filter([
+            # Same stem, different case and punctuation, choices reordered
+            _question("which table does a router consult to choose the next hop for a packet", list(reversed(CHOICES))),
+            # One word changed
+            _question("Which table does a router consult to choose the next hop for a datagram?", CHOICES),
+            _question("Which protocol maps IP addresses to MAC addresses on a LAN?", CHOICES),
+        ])
+
+        self.assertEqual(len(first), 2)
+        self.assertEqual([q["questionText"] for q in second], ["Which protocol maps IP addresses to MAC addresses on a LAN?"])
+        self.assertEqual(dedup.report(), {
+            "threshold": 0.7, "questions_before": 5, "questions_after": 3, "dropped": 2,
+        })
+
+    def test_threshold_controls_what_counts_as_duplicate(self):
+        base = _question("Which layer of the OSI model handles routing between networks?", CHOICES)
+        variant = _question("Which layer of the OSI model handles addressing between networks?", CHOICES)
+        self.assertEqual(len(NearDuplicateFilter(threshold=0.6).filter([base, variant])), 1)
+        self.assertEqual(len(NearDuplicateFilter(threshold=0.95).filter([base, variant])), 2)
+
+    def test_lsh_split_does_not_miss_pairs_at_threshold(self):
+        for threshold in (0.5, 0.7, 0.8, 0.9):
+            bands, rows = lsh_bands(threshold)
+            self.assertEqual(bands * rows, 128)
+            self.assertGreaterEqual(1 - (1 - threshold ** rows) ** bands, 0.95)
+
+
+if __name__ == '__main__':
+    unittest.main()
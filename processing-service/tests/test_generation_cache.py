@@ -0,0 +1,112 @@
+import json
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+# Add processing-service to path so we can import app
+sys.path.append(os.path.abspath('processing-service'))
+
+from app.config import settings
+from app.services.canned_response import CannedResponse
+from app.services.generation_cache import GenerationCache
+from app.services.metrics import JobStats
+from testing.fakes import FakeGeminiClient, InMemoryStorageService, make_questions_payload
+from app.services.gemini_service import GeminiService
+from benchmarks.synthetic_pdf import make_pdf
+
+
+def _questions(n):
+    return [{"questionText": f"Q{i}", "options": [], "correctAnswer": ["A"]} for i in range(n)]
+
+
+class TestGenerationCache(unittest.TestCase):
+    def test_key_depends_on_every_part(self):
+        base = GenerationCache.key("m", "sys", "custom", "pages")
+        self.assertEqual(base, GenerationCache.key("m", "sys", "custom", "pages"))
+        self.assertNotEqual(base, GenerationCache.key("m2", "sys", "custom", "pages"))
+        self.assertNotEqual(base, GenerationCache.key("m", "sys", "custom2", "pages"))
+        self.assertNotEqual(base, GenerationCache.key("m", "sys", "custom", "pages2"))
+
+    def test_local_tier_evicts_least_recently_used(self):
+        cache = GenerationCache(ttl_seconds=60, max_bytes=400)
+        cache.put("a", _questions(2))
+        cache.put("b", _questions(2))
+        cache.get("a")
+        cache.put("c", _questions(2))
+
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+
+    def test_ttl_expiry(self):
+        cache = GenerationCache(ttl_seconds=60, max_bytes=10_000)
+        with patch('app.services.generation_cache.time.time', return_value=1000.0):
+            cache.put("a", _questions(1))
+        with patch('app.services.generation_cache.time.time', return_value=1061.0):
+            self.assertIsNone(cache.get("a"))
+
+    def test_remote_tier_is_shared(self):
+        remote = InMemoryStorageService()
+        GenerationCache(ttl_seconds=60, max_bytes=10_000, remote=remote).put("a", _questions(3))
+
+        other_instance = GenerationCache(ttl_seconds=60, max_bytes=10_000, remote=remote)
+        self.assertEqual(len(other_instance.get("a")), 3)
+
+    def test_expired_and_corrupt_remote_entries_are_misses_and_deleted(self):
+        remote = InMemoryStorageService()
+        with patch('app.services.generation_cache.time.time', return_value=1000.0):
+            GenerationCache(ttl_seconds=60, max_bytes=10_000, remote=remote).put("old", _questions(1))
+        remote.upload_bytes("generation-cache/torn.json", b'{"stored_at": 10')
+        remote.upload_bytes("generation-cache/bad.json", b'{"questions": []}')
+
+        cache = GenerationCache(ttl_seconds=60, max_bytes=10_000, remote=remote)
+        for key in ("old", "torn", "bad"):
+            self.assertIsNone(cache.get(key))
+        self.assertEqual(remote.objects, {})
+
+    def test_identical_rerun_skips_gemini(self):
+        client = FakeGeminiClient()
+        service = GeminiService(client=client, cache=GenerationCache(ttl_seconds=60, max_bytes=10_000_000))
+        pdf_buffer = make_pdf(250)
+
+        first = service.generate_questions(pdf_buffer, "system", "custom")
+        calls_after_first = client.calls
+        second = service.generate_questions(pdf_buffer, "system", "custom")
+
+        self.assertEqual(calls_after_first, 3)
+        self.assertEqual(client.calls, 3)
+        self.assertEqual(len(first), len(second))
+
+    def test_local_hits_are_copies(self):
+        cache = GenerationCache(ttl_seconds=60, max_bytes=10_000)
+        questions = _questions(2)
+        cache.put("a", questions)
+        questions[0]["questionText"] = "edited after put"
+
+        hit = cache.get("a")
+        hit[0]["questionText"] = "edited by caller"
+        hit.pop()
+        self.assertEqual(cache.get("a"), _questions(2))
+
+    def test_truncated_and_fallback_parsed_responses_are_not_cached(self):
+        cases = {
+            "truncated": CannedResponse(make_questions_payload(2), finish_reason="MAX_TOKENS"),
+            "fallback": CannedResponse(json.dumps({"questions": [{"questionText": "no options"}]})),
+        }
+        for name, response in cases.items():
+            with self.subTest(name):
+                client = FakeGeminiClient()
+                client.generate_content = lambda **request: response
+                cache = GenerationCache(ttl_seconds=60, max_bytes=10_000_000)
+                service = GeminiService(client=client, cache=cache)
+
+                questions = service._generate_batch(
+                    ("system", "custom", "pages"), JobStats(), "prompt", batch_num=1, total_batches=1
+                )
+                self.assertTrue(questions)
+                self.assertIsNone(cache.get(cache.key(settings.gemini_model, "system", "custom", "pages")))
+
+
+if __name__ == '__main__':
+    unittest.main()
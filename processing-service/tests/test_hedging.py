@@ -0,0 +1,80 @@
+import unittest
+import threading
+import time
+import sys
+import os
+
+# Add processing-service to path so we can import app
+sys.path.append(os.path.abspath('processing-service'))
+
+from app.config import settings
+from testing.fakes import FakeGeminiClient
+from app.services.gemini_service import GeminiService
+from app.services.hedging import HedgePolicy
+from app.services.metrics import JobStats
+
+
+class TestHedging(unittest.TestCase):
+    def _policy(self, max_fraction=1.0):
+        policy = HedgePolicy(percentile=95, max_fraction=max_fraction, min_samples=5)
+        for _ in range(10):
+            policy.observe(settings.gemini_model, 0.1)
+        return policy
+
+    def test_slow_call_is_hedged_and_hedge_wins(self):
+        fake = FakeGeminiClient(latency=0, questions_per_call=2)
+        release = threading.Event()
+        calls = []
+
+        class SlowFirstCall:
+            def generate_content(self, **request):
+                calls.append(time.monotonic())
+                if len(calls) == 1:
+                    release.wait(30)
+                return fake.generate_content(**request)
+
+        client = SlowFirstCall()
+        client.models = client
+        service = GeminiService(client=client, hedger=self._policy())
+
+        stats = JobStats()
+        start = time.monotonic()
+        text = service._call_gemini_with_retry("prompt", 1, 1, stats=stats)
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(len(service._parse_gemini_response(text)), 2)
+
+        # The losing request is billed once it finishes
+        release.set()
+        deadline = time.monotonic() + 5
+        while len(stats.attempts) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        usage = stats.usage_summary()
+        self.assertEqual([a["outcome"] for a in usage["batches"]], ["success", "hedge_lost"])
+        self.assertEqual(usage["failed_attempt_tokens"], usage["batches"][1]["total_tokens"])
+        self.assertGreater(usage["failed_attempt_tokens"], 0)
+
+    def test_budget_caps_hedges(self):
+        policy = self._policy(max_fraction=0.1)
+        for _ in range(10):
+            policy.record_call()
+        self.assertTrue(policy.try_hedge())
+        self.assertFalse(policy.try_hedge())
+
+    def test_no_hedging_before_enough_samples(self):
+        policy = HedgePolicy(percentile=95, max_fraction=1.0, min_samples=5)
+        policy.observe("pro", 0.1)
+        self.assertIsNone(policy.hedge_delay("pro"))
+
+    def test_latency_windows_are_per_model(self):
+        policy = HedgePolicy(percentile=95, max_fraction=1.0, min_samples=5)
+        for _ in range(10):
+            policy.observe("pro", 20.0)
+            policy.observe("flash", 1.0)
+        self.assertEqual(policy.hedge_delay("pro"), 20.0)
+        self.assertEqual(policy.hedge_delay("flash"), 1.0)
+        self.assertIsNone(policy.hedge_delay("fallback"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import unittest
+import json
+from unittest.mock import patch
+import sys
+import os
+
+# Add processing-service to path so we can import app
+sys.path.append(os.path.abspath('processing-service'))
+
+from google.genai import errors
+from pydantic import ValidationError
+from app.config import Settings
+from app.models import JobStatus
+from app.services.retry_policy import classify
+from testing.fakes import FakeGeminiClient, InMemoryFirestoreService, InMemoryStorageService
+
+
+class TestInMemoryStorage(unittest.TestCase):
+    def test_round_trip_and_delete(self):
+        storage = InMemoryStorageService("bucket")
+        self.assertEqual(storage.upload_bytes("a/b.pdf", b"data"), "memory://bucket/a/b.pdf")
+        self.assertTrue(storage.exists("a/b.pdf"))
+        self.assertEqual(storage.download_bytes("a/b.pdf"), b"data")
+
+        storage.delete("a/b.pdf")
+        storage.delete("a/b.pdf")
+        with self.assertRaises(FileNotFoundError):
+            storage.download_bytes("a/b.pdf")
+
+
+class TestInMemoryFirestore(unittest.TestCase):
+    def setUp(self):
+        self.store = InMemoryFirestoreService()
+
+    def test_reads_are_copies(self):
+        self.store.create_job("job", {"status": JobStatus.PENDING, "usage": {"total_tokens": 1}})
+        self.store.get_job("job")["usage"]["total_tokens"] = 99
+        self.assertEqual(self.store.get_job("job")["usage"]["total_tokens"], 1)
+        self.assertIn("expireAt", self.store.get_job("job"))
+
+        with self.assertRaises(KeyError):
+            self.store.update_job("missing", {"status": JobStatus.FAILED})
+
+    def test_document_status_updates_clear_progress_when_done(self):
+        self.store.update_status("doc", "processing", progress=50, current_step="Generating...")
+        self.assertEqual(self.store.get_document("doc")["progress"], 50)
+        self.store.update_status("doc", "failed", error="boom")
+        doc = self.store.get_document("doc")
+        self.assertEqual((doc["status"], doc["error"]), ("failed", "boom"))
+        self.assertNotIn("progress", doc)
+        self.assertNotIn("currentStep", doc)
+
+    def test_rate_limits_only_when_enforced(self):
+        self.assertTrue(all(self.store.check_rate_limit("key", limit=1, window_seconds=60) for _ in range(3)))
+        enforcing = InMemoryFirestoreService(enforce_rate_limits=True)
+        self.assertTrue(enforcing.check_rate_limit("key", limit=2, window_seconds=60))
+        self.assertTrue(enforcing.check_rate_limit("key", limit=2, window_seconds=60))
+        self.assertFalse(enforcing.check_rate_limit("key", limit=2, window_seconds=60))
+
+    def test_job_group_joins_active_jobs(self):
+        self.store.create_job_once("key-a", "running", {"status": JobStatus.PROCESSING})
+        winners = self.store.create_job_group("group", {"doc_ids": ["a", "b"]}, [
+            ("key-a", "new-a", {"status": JobStatus.PENDING}),
+            ("key-b", "new-b", {"status": JobStatus.PENDING}),
+        ])
+        self.assertEqual(winners, {"key-a": "running", "key-b": "new-b"})
+        self.assertEqual(self.store.get_job_group("group")["job_ids"], ["running", "new-b"])
+        self.assertIsNone(self.store.get_job("new-a"))
+
+    def test_job_writes_notify_listeners(self):
+        written = []
+        self.store.job_write_listeners.append(written.append)
+        self.store.create_job("job", {"status": JobStatus.PENDING})
+        self.store.update_job("job", {"status": JobStatus.COMPLETED, "completed_at": 1})
+        self.store.compact_jobs(["job"], completed_before=2)
+        self.assertEqual(written, ["job", "job", "job"])
+
+
+class TestFakeGeminiClient(unittest.TestCase):
+    def test_answers_with_canned_questions_and_usage(self):
+        client = FakeGeminiClient(questions_per_call=3)
+        response = client.models.generate_content(model="pro", contents="x" * 400)
+        self.assertEqual(len(json.loads(response.text)["questions"]), 3)
+        self.assertEqual(response.usage_metadata.prompt_token_count, 100)
+        self.assertEqual(client.calls_by_model, {"pro": 1})
+
+    def test_failures_use_the_sdk_error_types(self):
+        for kind, expected in (("429", errors.ClientError), ("503", errors.ServerError), ("timeout", TimeoutError)):
+            client = FakeGeminiClient(failure_rate=1.0, failure_kind=kind)
+            with self.assertRaises(expected) as raised:
+                client.models.generate_content(model="pro", contents="prompt")
+            self.assertTrue(classify(raised.exception).retryable)
+            self.assertEqual(client.failures, 1)
+
+    def test_profiles_and_seeded_failures(self):
+        with self.assertRaises(ValueError):
+            FakeGeminiClient.from_profile("unknown")
+
+        def failures(seed):
+            client = FakeGeminiClient.from_profile("overloaded", seed=seed)
+            outcomes = []
+            for _ in range(30):
+                try:
+                    client.models.generate_content(model="pro", contents="prompt")
+                    outcomes.append(True)
+                except errors.ServerError:
+                    outcomes.append(False)
+            return outcomes
+
+        self.assertEqual(failures(7), failures(7))
+        self.assertIn(False, failures(7))
+
+
+class TestMemoryBackendConfig(unittest.TestCase):
+    def test_memory_backend_outside_the_source_tree_is_a_config_error(self):
+        self.assertEqual(Settings(backend="memory", gemini_api_key="x").backend, "memory")
+        with patch('app.config.importlib.util.find_spec', return_value=None):
+            with self.assertRaises(ValidationError) as raised:
+                Settings(backend="memory", gemini_api_key="x")
+        self.assertIn("not shipped in the service image", str(raised.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+import time
+import sys
+import os
+
+# Add processing-service to path so we can import app
+sys.path.append(os.path.abspath('processing-service'))
+
+from testing.fakes import InMemoryFirestoreService
+from app.services.job_cache import JobCache, etag_for, etag_matches
+
+
+class CountingStore(InMemoryFirestoreService):
+    def __init__(self):
+        super().__init__()
+        self.reads = []
+
+    def get_job(self, job_id):
+        self.reads.append([job_id])
+        return super().get_job(job_id)
+
+    def get_jobs(self, job_ids):
+        self.reads.append(list(job_ids))
+        return super().get_jobs(job_ids)
+
+
+class TestJobCache(unittest.TestCase):
+    def setUp(self):
+        self.store = CountingStore()
+        for job_id in ("a", "b", "c"):
+            self.store.put("jobs", job_id, {"job_id": job_id, "status": "pending"})
+
+    def test_misses_are_read_in_one_batch_then_served_from_cache(self):
+        cache = JobCache(self.store, ttl_seconds=60, max_entries=100)
+
+        jobs = cache.get_many(["a", "b", "missing"])
+        self.assertEqual(jobs["a"]["job_id"], "a")
+        self.assertIsNone(jobs["missing"])
+        self.assertEqual(self.store.reads, [["a", "b", "missing"]])
+
+        cache.get_many(["a", "b", "missing"])
+        cache.get("c")
+        self.assertEqual(self.store.reads, [["a", "b", "missing"], ["c"]])
+
+    def test_entries_expire_and_can_be_invalidated(self):
+        cache = JobCache(self.store, ttl_seconds=0.05, max_entries=100)
+        cache.get("a")
+        time.sleep(0.1)
+        cache.get("a")
+        self.assertEqual(len(self.store.reads), 2)
+
+        cache.ttl_seconds = 60
+        cache.get("a")
+        self.store.put("jobs", "a", {"job_id": "a", "status": "processing"})
+        cache.invalidate("a")
+        self.assertEqual(cache.get("a")["status"], "processing")
+
+    def test_job_writes_through_the_store_invalidate(self):
+        cache = JobCache(self.store, ttl_seconds=60, max_entries=100)
+        cache.get("a")
+        self.store.update_job("a", {"status": "completed", "completed_at": 1})
+        self.assertEqual(cache.get("a")["status"], "completed")
+
+        self.store.compact_jobs(["a"], completed_before=2)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(self.store.reads), 3)
+
+    def test_read_racing_a_write_is_not_cached(self):
+        cache = JobCache(self.store, ttl_seconds=60, max_entries=100)
+        read_job = self.store.get_job
+
+        def read_then_write(job_id):
+            # The write (and its invalidation) lands after the read took its snapshot
+            job = read_job(job_id)
+            self.store.update_job(job_id, {"status": "completed"})
+            return job
+
+        self.store.get_job = read_then_write
+        self.assertEqual(cache.get("a")["status"], "pending")
+        del self.store.get_job
+        self.assertEqual(cache.get("a")["status"], "completed")
+        self.assertEqual((cache._in_flight, cache._invalidations), ({}, {}))
+
+    def test_etag_matching(self):
+        etag = etag_for({"status": "pending"})
+        self.assertEqual(etag, etag_for({"status": "pending"}))
+        self.assertNotEqual(etag, etag_for({"status": "completed"}))
+        self.assertTrue(etag_matches(f'"other", W/{etag}', etag))
+        self.assertTrue(etag_matches("*", etag))
+        self.assertFalse(etag_matches(None, etag))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import time
+
+# Add processing-service to path so we can import app
+sys.path.append(os.path.abspath('processing-service'))
+
+from fastapi.testclient import TestClient
+from app.main import app
+from app.config import settings
+from app.models import JobStatus
+from testing.fakes import FakeGeminiClient, InMemoryFirestoreService, InMemoryStorageService
+from app.services.gemini_service import GeminiService
+from app.services.generation_cache import GenerationCache
+from app.services.metrics import JOBS_FINISHED
+from app.services.retry_policy import JobDeadlineExceeded, RetryPolicy
+from benchmarks.synthetic_pdf import make_pdf
+
+
+def _failed_total() -> float:
+    return JOBS_FINISHED.labels(status=JobStatus.FAILED.value)._value.get()
+
+
+class TestJobExecution(unittest.TestCase):
+    def setUp(self):
+        self.store = InMemoryFirestoreService()
+        self.storage = InMemoryStorageService()
+        self.storage.upload_bytes("doc.pdf", make_pdf(3))
+        self.store.put("documents", "doc", {"filePath": "doc.pdf", "status": "uploaded"})
+        self.store.put("system-prompts", "sys", {"content": "You are an exam author."})
+        self.store.put("custom-prompts", "custom", {"content": "Write multiple choice questions."})
+        self.store.create_job("job", {
+            "job_id": "job", "doc_id": "doc", "system_prompt_id": "sys", "custom_prompt_id": "custom",
+            "status": JobStatus.PENDING, "attempt": 0, "max_attempts": 2, "created_at": 0,
+        })
+
+        for p in [
+            patch('app.main.firestore_service', self.store),
+            patch('app.services.processor.firestore_service', self.store),
+            patch('app.services.processor.storage_service', self.storage),
+        ]:
+            p.start()
+            self.addCleanup(p.stop)
+        self.client = TestClient(app)
+
+    def _execute(self):
+        return self.client.post("/jobs/execute", json={"job_id": "job"})
+
+    def test_failure_before_the_outcome_is_recorded_is_redelivered(self):
+        with patch.object(self.store, 'start_job', side_effect=RuntimeError("Firestore unavailable")):
+            response = self._execute()
+        self.assertEqual(response.status_code, 500)
+
+    def test_only_the_final_failure_counts_as_finished(self):
+        before = _failed_total()
+        with patch('app.services.processor.gemini_service.generate_questions', side_effect=TimeoutError("slow")):
+            first = self._execute()
+            self.assertEqual(first.status_code, 500)
+            self.assertTrue(self.store.get_job("job")["retryable"])
+            self.assertEqual(_failed_total(), before)
+
+            second = self._execute()
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()["status"], "failed")
+        self.assertFalse(self.store.get_job("job")["retryable"])
+        self.assertEqual(_failed_total(), before + 1)
+
+    def test_redelivery_while_an_attempt_is_running_is_refused_without_writes(self):
+        self.store.update_job("job", {"status": JobStatus.PROCESSING, "attempt": 1, "started_at": int(time.time())})
+        before = self.store.get_job("job")
+        with patch.object(self.store, 'update_job') as update_job:
+            response = self._execute()
+        self.assertEqual(response.status_code, 500)
+        update_job.assert_not_called()
+        self.assertEqual(self.store.get_job("job"), before)
+
+        # Past its budget the earlier attempt is presumed dead and the job is taken over
+        self.store.update_job("job", {"started_at": int(time.time()) - settings.job_deadline_seconds - 1})
+        with patch('app.services.processor.gemini_service.generate_questions', return_value=[]):
+            self.assertEqual(self._execute().status_code, 200)
+        self.assertEqual(self.store.get_job("job")["status"], JobStatus.COMPLETED)
+
+    def test_late_redelivery_leaves_a_completed_job_alone(self):
+        self.store.update_job("job", {"status": JobStatus.COMPLETED, "attempt": 2, "question_count": 5})
+        response = self._execute()
+        self.assertEqual(response.status_code, 200)
+        job = self.store.get_job("job")
+        self.assertEqual((job["status"], job["question_count"]), (JobStatus.COMPLETED, 5))
+        self.assertNotIn("retryable", job)
+
+    def test_deadline_stops_new_batches_and_the_redelivery_resumes(self):
+        client = FakeGeminiClient(latency=0.05)
+        service = GeminiService(client=client, cache=GenerationCache(ttl_seconds=60, max_bytes=10_000_000))
+        pdf_buffer = make_pdf(250)
+        spent = RetryPolicy(max_attempts=1, base_delay=0, max_delay=0, deadline_seconds=0.01)
+
+        with self.assertRaises(JobDeadlineExceeded):
+            service.generate_questions(pdf_buffer, "system", "custom", retry_policy=spent)
+        self.assertEqual(client.calls, 1)
+
+        service.generate_questions(pdf_buffer, "system", "custom")
+        self.assertEqual(client.calls, 3)
+
+    def test_cancel_landing_just_before_the_attempt_starts_wins(self):
+        start_job = self.store.start_job
+
+        def cancel_then_start(job_id, updates):
+            self.client.delete(f"/jobs/{job_id}")
+            return start_job(job_id, updates)
+
+        with patch.object(self.store, 'start_job', side_effect=cancel_then_start), \
+                patch('app.services.processor.gemini_service.generate_questions') as generate:
+            self.assertEqual(self._execute().status_code, 200)
+        generate.assert_not_called()
+        self.assertEqual(self.store.get_job("job")["status"], JobStatus.CANCELLED)
+
+    def test_failed_job_waiting_for_redelivery_can_be_cancelled(self):
+        self.store.update_job("job", {"status": JobStatus.FAILED, "retryable": True, "attempt": 1})
+        self.assertEqual(self.client.delete("/jobs/job").status_code, 200)
+        with patch('app.services.processor.gemini_service.generate_questions') as generate:
+            self.assertEqual(self._execute().status_code, 200)
+        generate.assert_not_called()
+        job = self.store.get_job("job")
+        self.assertEqual((job["status"], job["retryable"]), (JobStatus.CANCELLED, False))
+
+        self.store.update_job("job", {"status": JobStatus.FAILED, "retryable": False})
+        self.assertEqual(self.client.delete("/jobs/job").status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+# Add processing-service to path so we can import app
+sys.path.append(os.path.abspath('processing-service'))
+
+from fastapi.testclient import TestClient
+from app.main import app
+from testing.fakes import FakeGeminiClient, InMemoryFirestoreService, InMemoryStorageService
+from app.services.gemini_service import GeminiService
+from app.services.job_cache import JobCache
+from benchmarks.synthetic_pdf import make_pdf
+
+BATCH = {"system_prompt_id": "sys", "custom_prompt_id": "custom"}
+
+
+async def _run_nothing(job_ids):
+    return []
+
+
+class TestJobGroups(unittest.TestCase):
+    def setUp(self):
+        self.store = InMemoryFirestoreService()
+        self.storage = InMemoryStorageService()
+        self.store.put("system-prompts", "sys", {"content": "You are an exam author."})
+        self.store.put("custom-prompts", "custom", {"content": "Write multiple choice questions."})
+        for doc_id in ("doc-a", "doc-b"):
+            self.storage.upload_bytes(f"{doc_id}.pdf", make_pdf(5))
+            self.store.put("documents", doc_id, {"filePath": f"{doc_id}.pdf", "status": "uploaded"})
+        # Uploaded record whose file never made it: its job fails without a retry
+        self.store.put("documents", "doc-broken", {"status": "uploaded"})
+
+        patches = [
+            patch('app.main.firestore_service', self.store),
+            patch('app.main.job_cache', JobCache(self.store, ttl_seconds=0, max_entries=100)),
+            patch('app.services.processor.firestore_service', self.store),
+            patch('app.services.processor.storage_service', self.storage),
+            patch('app.services.processor.gemini_service', GeminiService(client=FakeGeminiClient(), cache=None)),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.client = TestClient(app)
+
+    def _submit(self, doc_ids):
+        response = self.client.post("/jobs/process-batch", json={**BATCH, "doc_ids": doc_ids})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_group_runs_every_document_and_aggregates_partial_failure(self):
+        submitted = self._submit(["doc-a", "doc-b", "doc-broken", "doc-a"])
+        self.assertEqual(sorted(submitted["jobs"]), ["doc-a", "doc-b", "doc-broken"])
+        self.assertEqual(submitted["deduplicated"], [])
+
+        group = self.client.get(f"/jobs/groups/{submitted['group_id']}").json()
+        self.assertEqual(group["job_count"], 3)
+        self.assertEqual(group["status_counts"], {"completed": 2, "failed": 1})
+        self.assertEqual((group["finished"], group["progress"]), (3, 100.0))
+        self.assertGreater(group["question_count"], 0)
+        by_id = {job["job_id"]: job for job in group["jobs"]}
+        self.assertEqual(by_id[submitted["jobs"]["doc-broken"]]["status"], "failed")
+        self.assertEqual(
+            group["question_count"],
+            sum(by_id[submitted["jobs"][doc_id]]["question_count"] for doc_id in ("doc-a", "doc-b")),
+        )
+
+        # The failure stays with its own document
+        self.assertEqual(self.store.get_document("doc-a")["status"], "ready")
+        self.assertEqual(self.store.get_document("doc-broken")["status"], "failed")
+
+    def test_documents_with_an_active_job_join_it(self):
+        with patch('app.services.processor.run_group_locally', _run_nothing):
+            first = self._submit(["doc-a"])
+            second = self._submit(["doc-a", "doc-b"])
+
+        self.assertEqual(second["deduplicated"], ["doc-a"])
+        self.assertEqual(second["jobs"]["doc-a"], first["jobs"]["doc-a"])
+        self.assertEqual(
+            self.store.get_job_group(second["group_id"])["job_ids"],
+            [second["jobs"]["doc-a"], second["jobs"]["doc-b"]],
+        )
+
+        group = self.client.get(f"/jobs/groups/{second['group_id']}").json()
+        self.assertEqual(group["status_counts"], {"pending": 2})
+        self.assertEqual((group["finished"], group["progress"]), (0, 0.0))
+
+    def test_failed_jobs_awaiting_redelivery_are_not_finished(self):
+        with patch('app.services.processor.run_group_locally', _run_nothing):
+            submitted = self._submit(["doc-a", "doc-b"])
+        self.store.update_job(submitted["jobs"]["doc-a"], {"status": "failed", "retryable": True})
+        self.store.update_job(submitted["jobs"]["doc-b"], {"status": "failed", "retryable": False})
+
+        group = self.client.get(f"/jobs/groups/{submitted['group_id']}").json()
+        self.assertEqual(group["status_counts"], {"failed": 2})
+        self.assertEqual((group["finished"], group["progress"]), (1, 50.0))
+
+    def test_unknown_group_is_not_found(self):
+        self.assertEqual(self.client.get("/jobs/groups/missing").status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
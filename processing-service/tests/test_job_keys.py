@@ -0,0 +1,106 @@
+import unittest
+import threading
+from unittest.mock import patch
+import sys
+import os
+
+# Add processing-service to path so we can import app
+sys.path.append(os.path.abspath('processing-service'))
+
+from fastapi.testclient import TestClient
+from app.main import app
+from app.models import JobStatus
+from testing.fakes import InMemoryFirestoreService
+from app.services.job_keys import request_key
+
+
+def _key(**overrides):
+    options = dict(
+        doc_id="doc-1",
+        system_prompt_id="sys",
+        custom_prompt_id="custom",
+        system_prompt="You write exam questions.",
+        custom_prompt="Focus on chapter 2.",
+    )
+    options.update(overrides)
+    return request_key(**options)
+
+
+class TestRequestKey(unittest.TestCase):
+    def test_options_that_change_the_output_change_the_key(self):
+        base = _key()
+        self.assertEqual(base, _key())
+        self.assertNotEqual(base, _key(custom_prompt="Focus on chapter 3."))
+        self.assertNotEqual(base, _key(target_questions=50))
+        self.assertNotEqual(_key(target_questions=50), _key(target_questions=50, sampling="spread"))
+        self.assertNotEqual(base, _key(progressive=True))
+
+
+class TestJobCoalescing(unittest.TestCase):
+    def setUp(self):
+        self.store = InMemoryFirestoreService()
+        self.key = _key()
+
+    def test_concurrent_identical_submissions_create_one_job(self):
+        winners = []
+        start = threading.Barrier(8)
+
+        def submit(n):
+            start.wait()
+            winners.append(self.store.create_job_once(self.key, f"job-{n}", {"status": JobStatus.PENDING}))
+
+        threads = [threading.Thread(target=submit, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(set(winners)), 1)
+        self.assertEqual(len(self.store.get_jobs([f"job-{n}" for n in range(8)])), 1)
+        self.assertEqual(self.store.find_active_job(self.key), winners[0])
+
+    def test_joins_an_active_job(self):
+        self.store.create_job_once(self.key, "first", {"status": JobStatus.PENDING})
+        self.store.update_job("first", {"status": JobStatus.PROCESSING})
+
+        self.assertEqual(self.store.find_active_job(self.key), "first")
+        self.assertEqual(self.store.create_job_once(self.key, "second", {"status": JobStatus.PENDING}), "first")
+        self.assertIsNone(self.store.get_job("second"))
+
+    def test_terminal_or_cancelling_job_is_not_joined(self):
+        self.store.create_job_once(self.key, "first", {"status": JobStatus.PENDING})
+        self.store.update_job("first", {"status": JobStatus.COMPLETED})
+
+        self.assertIsNone(self.store.find_active_job(self.key))
+        self.assertEqual(self.store.create_job_once(self.key, "second", {"status": JobStatus.PENDING}), "second")
+        self.assertEqual(self.store.find_active_job(self.key), "second")
+
+        self.store.update_job("second", {"cancel_requested": True})
+        self.assertEqual(self.store.create_job_once(self.key, "third", {"status": JobStatus.PENDING}), "third")
+
+    def test_duplicate_request_joins_the_running_job_instead_of_hitting_the_rate_limit(self):
+        self.store.enforce_rate_limits = True
+        self.store.put("system-prompts", "sys", {"content": "You write exam questions."})
+        self.store.put("custom-prompts", "custom", {"content": "Focus on chapter 2."})
+        body = {"doc_id": "doc-1", "system_prompt_id": "sys", "custom_prompt_id": "custom"}
+
+        async def _run_nothing(job_id):
+            pass
+
+        with patch('app.main.firestore_service', self.store), \
+                patch('app.services.processor.run_job_locally', _run_nothing):
+            client = TestClient(app)
+            first = client.post("/jobs/process", json=body)
+            second = client.post("/jobs/process", json=body)
+            # A different request is a new job, so it is charged and rejected
+            other = client.post("/jobs/process", json={**body, "target_questions": 50})
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()["job_id"], first.json()["job_id"])
+        self.assertTrue(second.json()["deduplicated"])
+        self.assertEqual(other.status_code, 429)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+import sys
+import os
+
+# Add processing-service to path so we can import app
+sys.path.append(os.path.abspath('processing-service'))
+
+from app.models import JobStatus
+from app.services.compactor import JobCompactor
+from testing.fakes import InMemoryFirestoreService
+from app.services.lifecycle import rollup_jobs
+
+DAY_ONE = 1_700_000_000  # 2023-11-14 UTC
+DAY = 86400
+
+
+def _job(completed_at: int, status: str = "completed", seconds: int = 45) -> dict:
+    return {
+        "status": status,
+        "started_at": completed_at - seconds,
+        "completed_at": completed_at,
+        "question_count": 10 if status == "completed" else 0,
+        "usage": {"prompt_tokens": 100, "output_tokens": 50, "total_tokens": 150},
+    }
+
+
+class TestLifecycle(unittest.TestCase):
+    def setUp(self):
+        self.store = InMemoryFirestoreService()
+        for i in range(7):
+            self.store.put("jobs", f"old-{i}", _job(DAY_ONE + i, "failed" if i == 0 else "completed"))
+        self.store.put("jobs", "next-day", _job(DAY_ONE + DAY, seconds=900))
+        self.store.put("jobs", "recent", _job(DAY_ONE + 10 * DAY))
+        self.store.put("jobs", "running", {"status": "processing", "started_at": DAY_ONE})
+        # Re-delivered after failing: completed_at is stale but the job is running again
+        self.store.put("jobs", "retrying", {**_job(DAY_ONE), "status": JobStatus.PROCESSING})
+
+    def test_compacts_old_finished_jobs_into_daily_summaries(self):
+        compactor = JobCompactor(self.store, retention_seconds=DAY, batch_size=3, max_batches=10)
+        report = compactor.run_once(now=DAY_ONE + 10 * DAY)
+
+        self.assertEqual(report["compacted"], 8)
+        self.assertEqual(sorted(self.store.get_jobs(["recent", "running", "retrying", "old-0"])), ["recent", "retrying", "running"])
+
+        newest, oldest = self.store.list_job_summaries()
+        self.assertEqual((oldest["day"], newest["day"]), ("2023-11-14", "2023-11-15"))
+        self.assertEqual(oldest["job_count"], 7)
+        self.assertEqual(oldest["status_counts"], {"completed": 6, "failed": 1})
+        self.assertEqual(oldest["question_count"], 60)
+        self.assertEqual(oldest["duration"], {"count": 7, "total_seconds": 315, "buckets": {"le_60": 7}})
+        self.assertEqual(oldest["tokens"]["total_tokens"], 1050)
+        self.assertEqual(newest["duration"]["buckets"], {"le_1200": 1})
+
+        # Nothing left to do, and summaries are not counted twice
+        self.assertEqual(compactor.run_once(now=DAY_ONE + 10 * DAY)["compacted"], 0)
+        self.assertEqual(self.store.list_job_summaries()[1]["job_count"], 7)
+
+    def test_rollups_of_separate_runs_add_up(self):
+        jobs = [_job(DAY_ONE + i) for i in range(4)]
+        whole = rollup_jobs(jobs)["2023-11-14"]
+        first, second = rollup_jobs(jobs[:1])["2023-11-14"], rollup_jobs(jobs[1:])["2023-11-14"]
+        self.assertEqual(whole["job_count"], first["job_count"] + second["job_count"])
+        self.assertEqual(whole["tokens"]["prompt_tokens"], 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
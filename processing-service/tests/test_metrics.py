@@ -0,0 +1,64 @@
+import unittest
+import sys
+import os
+
+# Add processing-service to path so we can import app
+sys.path.append(os.path.abspath('processing-service'))
+
+from app.services.metrics import JobStats, STAGE_DURATION, summarize_jobs
+
+
+class TestJobStats(unittest.TestCase):
+    def test_stage_accumulates_and_feeds_histogram(self):
+        before = STAGE_DURATION.labels(stage="unit_test_stage")._sum.get()
+
+        stats = JobStats()
+        with stats.stage("unit_test_stage"):
+            pass
+        stats.observe("unit_test_stage", 1.5)
+
+        summary = stats.summary()
+        self.assertEqual(summary["stages"]["unit_test_stage"]["count"], 2)
+        self.assertGreaterEqual(summary["stages"]["unit_test_stage"]["seconds"], 1.5)
+        self.assertGreaterEqual(STAGE_DURATION.labels(stage="unit_test_stage")._sum.get() - before, 1.5)
+
+    def test_counters(self):
+        stats = JobStats()
+        stats.incr("retries")
+        stats.incr("retries")
+        stats.incr("questions", 40)
+
+        self.assertEqual(stats.summary()["counters"], {"retries": 2, "questions": 40})
+
+    def test_usage_summary_includes_failed_attempts(self):
+        stats = JobStats()
+        stats.record_usage(1, 1, {"prompt_tokens": 1000, "total_tokens": 1000}, 2.0, "error")
+        stats.record_usage(1, 2, {"prompt_tokens": 1000, "output_tokens": 400, "total_tokens": 1400}, 4.0, "success")
+
+        usage = stats.usage_summary()
+        self.assertEqual(usage["prompt_tokens"], 2000)
+        self.assertEqual(usage["total_tokens"], 2400)
+        self.assertEqual(usage["failed_attempts"], 1)
+        self.assertEqual(usage["failed_attempt_tokens"], 1000)
+        self.assertEqual(usage["tokens_per_second"], round(400 / 6.0, 2))
+        self.assertEqual(usage["batches"][1]["tokens_per_second"], 100.0)
+
+    def test_summarize_jobs(self):
+        jobs = [
+            {"status": "completed", "started_at": 100, "completed_at": 160,
+             "usage": {"total_tokens": 500, "failed_attempt_tokens": 100, "tokens_per_second": 50.0}},
+            {"status": "failed", "started_at": 100, "completed_at": 120},
+            {"status": "pending"},
+        ]
+
+        summary = summarize_jobs(jobs)
+        self.assertEqual(summary["job_count"], 3)
+        self.assertEqual(summary["status_counts"], {"completed": 1, "failed": 1, "pending": 1})
+        self.assertEqual(summary["duration_seconds"]["max"], 60)
+        self.assertEqual(summary["tokens"]["total_tokens"], 500)
+        self.assertEqual(summary["tokens"]["failed_attempt_tokens"], 100)
+        self.assertEqual(summary["avg_tokens_per_second"], 50.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+import sys
+import os
+
+# Add processing-service to path so we can import app
+sys.path.append(os.path.abspath('processing-service'))
+
+from testing.fakes import FakeGeminiClient
+from app.services.gemini_service import GeminiService
+from app.services.generation_cache import GenerationCache
+from app.services.metrics import JobStats
+from app.services.model_router import ModelRouter
+from app.services.retry_policy import RetryPolicy
+
+
+def _router(**overrides):
+    options = dict(
+        primary="pro",
+        fast_model="flash",
+        fallback_model="backup",
+        fast_max_chars=100,
+        failure_threshold=2,
+        cooldown_seconds=60,
+    )
+    options.update(overrides)
+    return ModelRouter(**options)
+
+
+class TestModelRouter(unittest.TestCase):
+    def test_small_prompts_use_fast_tier(self):
+        router = _router()
+        self.assertEqual(router.choose(50), "flash")
+        self.assertEqual(router.choose(5000), "pro")
+        self.assertEqual(_router(fast_model="").choose(50), "pro")
+
+    def test_repeated_overload_falls_back(self):
+        router = _router()
+        router.record("pro", "overload")
+        self.assertEqual(router.choose(5000), "pro")
+        router.record("pro", "overload")
+        self.assertEqual(router.choose(5000), "backup")
+        # Other tiers are unaffected
+        self.assertEqual(router.choose(50), "flash")
+
+    def test_slow_p95_falls_back(self):
+        router = _router(latency_p95_limit=1.0, min_samples=3)
+        for latency in (0.5, 0.5, 3.0):
+            router.record("pro", "success", latency)
+        self.assertTrue(router.is_degraded("pro"))
+
+    def test_fake_client_timeouts_move_batch_to_fallback(self):
+        client = FakeGeminiClient(model_failure_rate={"pro": 1.0}, failure_kind="timeout", seed=0)
+        service = GeminiService(client=client, router=_router(fast_model=""))
+        stats = JobStats()
+
+        service._call_gemini_with_retry(
+            "x" * 500, 1, 1, stats=stats,
+            retry_policy=RetryPolicy(max_attempts=3, base_delay=0, max_delay=0),
+        )
+        self.assertEqual(client.calls_by_model, {"pro": 2, "backup": 1})
+        self.assertEqual(stats.usage_summary()["batch_models"], {"1": "backup"})
+
+    def test_cached_questions_are_keyed_by_the_routed_model(self):
+        client = FakeGeminiClient(model_failure_rate={"pro": 1.0}, failure_kind="timeout", seed=0)
+        router = _router(fast_model="")
+        cache = GenerationCache(ttl_seconds=60, max_bytes=1_000_000)
+        service = GeminiService(client=client, router=router, cache=cache)
+        parts = ("system", "custom", "page text")
+        call = dict(
+            prompt="x" * 500, batch_num=1, total_batches=1,
+            retry_policy=RetryPolicy(max_attempts=3, base_delay=0, max_delay=0),
+        )
+
+        questions = service._generate_batch(parts, JobStats(), **call)
+        self.assertIsNone(cache.get(cache.key("pro", *parts)))
+        self.assertEqual(cache.get(cache.key("backup", *parts)), questions)
+
+        # While pro is degraded the batch is routed to backup and served from the cache
+        service._generate_batch(parts, JobStats(), **call)
+        self.assertEqual(client.calls_by_model, {"pro": 2, "backup": 1})
+
+        # Once pro recovers, backup's questions are not reused for it
+        router._degraded_until.clear()
+        client.model_failure_rate = {}
+        service._generate_batch(parts, JobStats(), **call)
+        self.assertEqual(client.calls_by_model, {"pro": 3, "backup": 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+import sys
+import os
+
+# Add processing-service to path so we can import app
+sys.path.append(os.path.abspath('processing-service'))
+
+from app.services.page_index import (
+    build_page_index,
+    decode_page_index,
+    encode_page_index,
+    page_index_path,
+    page_text,
+)
+from app.services.text_preprocessor import join_pages
+
+
+def _body(num: int) -> str:
+    return f"ACME Study Guide\nChapter {num} covers topic {num} in enough words to be real content.\n{num}"
+
+
+class TestPageIndex(unittest.TestCase):
+    def setUp(self):
+        # Page 3 yielded no text, page 2 is a table of contents
+        toc = "Contents\n" + "\n".join(f"Chapter {i} ........ {i * 10}" for i in range(1, 7))
+        self.pages = [(1, _body(1)), (2, toc)] + [(n, _body(n)) for n in range(4, 9)]
+        self.text = join_pages(self.pages)
+        self.index = build_page_index(self.text, page_count=8, extraction={"backend": "pypdf"})
+
+    def test_offsets_recover_each_page(self):
+        for num, body in self.pages:
+            self.assertEqual(page_text(self.index, num), body)
+        self.assertEqual(page_text(self.index, 3), "")
+        self.assertEqual(self.index["pageTokens"][0], len(_body(1)) // 4)
+
+    def test_flags_blank_and_boilerplate_pages(self):
+        self.assertEqual(self.index["blankPages"], [3])
+        self.assertEqual(self.index["boilerplatePages"], [2])
+
+    def test_round_trip_and_format_check(self):
+        encoded = encode_page_index(self.index)
+        self.assertLess(len(encoded), len(self.text))
+        self.assertEqual(decode_page_index(encoded), self.index)
+        self.assertEqual(page_index_path("123-book.pdf"), "123-book.pdf.pages.json.gz")
+
+        with self.assertRaises(ValueError):
+            decode_page_index(b"not gzip")
+        with self.assertRaises(ValueError):
+            decode_page_index(encode_page_index({**self.index, "format": 99}))
+
+
+if __name__ == '__main__':
+    unittest.main()
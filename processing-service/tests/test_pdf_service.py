@@ -0,0 +1,115 @@
+import unittest
+import io
+import time
+import subprocess
+import sys
+import os
+from unittest.mock import patch
+
+# Add processing-service to path so we can import app
+sys.path.append(os.path.abspath('processing-service'))
+
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+from app.config import settings
+from app.services.metrics import JobStats
+from app.extraction_worker import available_backends
+from app.services.pdf_service import PDFService, pdf_service
+from benchmarks.synthetic_pdf import make_pdf
+
+
+def _pdf_with_slow_page(slow_page: int, pages: int = 3, vector_ops: int = 100000) -> bytes:
+    """Pages of one text line each; slow_page (1-indexed) also carries a huge vector drawing"""
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    }))
+    resources = DictionaryObject({NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})})
+    for page_num in range(1, pages + 1):
+        page = writer.add_blank_page(width=612, height=792)
+        ops = ["BT", "/F1 9 Tf", "40 760 Td", f"(Page {page_num} covers routing tables) Tj", "ET"]
+        if page_num == slow_page:
+            ops += ["0 0 m 1 1 l S"] * vector_ops
+        stream = DecodedStreamObject()
+        stream.set_data("\n".join(ops).encode("latin-1"))
+        page[NameObject("/Resources")] = resources
+        page[NameObject("/Contents")] = writer._add_object(stream)
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+class TestPageExtractionBudget(unittest.TestCase):
+    def setUp(self):
+        self._timeout, self._backend = settings.page_extract_timeout, settings.pdf_backend
+        settings.page_extract_timeout = 0.5
+        # Native backends shrug off the slow page; pin the one that chokes on it
+        settings.pdf_backend = "pypdf"
+
+    def tearDown(self):
+        settings.page_extract_timeout, settings.pdf_backend = self._timeout, self._backend
+
+    def test_slow_page_is_recovered_with_fast_mode(self):
+        stats = JobStats()
+        start = time.monotonic()
+        text = pdf_service.extract_text(_pdf_with_slow_page(2), stats=stats)
+
+        self.assertLess(time.monotonic() - start, 2.5)
+        for page_num in (1, 2, 3):
+            self.assertIn(f"Page {page_num} covers routing tables", text)
+        self.assertEqual(stats.info["extraction"]["slow_pages"], [2])
+        self.assertEqual(stats.info["extraction"]["skipped_pages"], [])
+
+
+    def test_budgeted_extraction_never_runs_pages_in_the_service_process(self):
+        with patch("app.services.pdf_service.open_document", side_effect=AssertionError("extracted in-process")), \
+                patch("app.services.pdf_service.subprocess.Popen", wraps=subprocess.Popen) as popen:
+            text = pdf_service.extract_text(_pdf_with_slow_page(0))
+            PDFService().calibrate(make_pdf(4))
+        self.assertIn("Page 3 covers routing tables", text)
+        self.assertEqual(popen.call_count, 1 + len(available_backends()))
+
+    def test_worker_startup_is_not_charged_to_a_page(self):
+        # Interpreter startup alone takes longer than this budget: no page is blamed
+        settings.page_extract_timeout = 0.05
+        run = PDFService()._run_worker(_pdf_with_slow_page(0), [0, 1, 2], "fast", "pypdf", None)
+        self.assertEqual((run.outcome, run.opened, run.texts), ("error", False, {}))
+
+        settings.page_extract_timeout = 5
+        run = PDFService()._run_worker(_pdf_with_slow_page(0), [0, 1, 2], "full", "pypdf", None)
+        self.assertEqual((run.outcome, run.opened, sorted(run.texts)), ("done", True, [0, 1, 2]))
+
+
+class TestExtractionBackends(unittest.TestCase):
+    def test_calibration_selects_a_usable_installed_backend(self):
+        service = PDFService()
+        results = service.calibrate(make_pdf(12))
+
+        self.assertIn(results["selected"], available_backends())
+        self.assertTrue(results[results["selected"]]["usable"])
+        self.assertEqual(service._backend_chain(b"", 12)[0], results["selected"])
+
+    def test_textless_calibration_is_not_kept_and_calibrations_expire(self):
+        service = PDFService()
+        service.calibrate(_pdf_with_slow_page(0, pages=1))  # One short line: too little text to trust
+        self.assertIsNone(service._calibrated_backend)
+
+        service.calibrate(make_pdf(12))
+        self.assertIsNotNone(service._calibrated_backend)
+        service._calibrated_backend = "stale"
+        service._calibrated_at -= settings.extraction_calibration_ttl + 1
+        self.assertIn(service._backend_chain(make_pdf(12), 12)[0], available_backends())
+
+    def test_unknown_backend_falls_back_to_installed_ones(self):
+        backend = settings.pdf_backend
+        settings.pdf_backend = "missing"
+        try:
+            self.assertEqual(PDFService()._backend_chain(b"", 1), available_backends())
+        finally:
+            settings.pdf_backend = backend
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+import sys
+import os
+
+# Add processing-service to path so we can import app
+sys.path.append(os.path.abspath('processing-service'))
+
+from testing.fakes import InMemoryFirestoreService
+from app.services.profiling import follow, run_profiled
+
+
+def spin_on_helper_thread(seconds: float) -> str:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sum(range(1000))
+    return "done"
+
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        self.store = InMemoryFirestoreService()
+        self.store.put("jobs", "job-1", {"status": "processing"})
+        self.saved = {}
+
+        def save(job_id, html):
+            self.saved[job_id] = html
+            return f"memory://profiles/{job_id}.html"
+
+        for p in [
+            patch('app.services.firestore_service', self.store),
+            patch('app.services.profiling.save_profile', save),
+        ]:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_follow_is_a_no_op_without_a_profile(self):
+        self.assertIs(follow(spin_on_helper_thread), spin_on_helper_thread)
+
+    def test_work_on_other_threads_is_merged_into_the_job_profile(self):
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            def pipeline():
+                return executor.submit(follow(spin_on_helper_thread), 0.2).result()
+
+            self.assertEqual(run_profiled("job-1", pipeline), "done")
+
+        self.assertIn("spin_on_helper_thread", self.saved["job-1"])
+        self.assertEqual(self.store.get_job("job-1")["profile_path"], "memory://profiles/job-1.html")
+        # The wrapper only applies while the job runs
+        self.assertIs(follow(spin_on_helper_thread), spin_on_helper_thread)
+
+    def test_profile_is_saved_when_the_job_fails(self):
+        def pipeline():
+            raise RuntimeError("boom")
+
+        with self.assertRaises(RuntimeError):
+            run_profiled("job-1", pipeline)
+        self.assertIn("job-1", self.saved)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+import sys
+import os
+
+# Add processing-service to path so we can import app
+sys.path.append(os.path.abspath('processing-service'))
+
+from testing.fakes import FakeGeminiClient, InMemoryFirestoreService
+from app.services.gemini_service import GeminiService
+from benchmarks.synthetic_pdf import make_pdf
+
+
+class TestProgressiveCommits(unittest.TestCase):
+    def setUp(self):
+        self.service = GeminiService(client=FakeGeminiClient(questions_per_call=20), cache=None)
+        self.pdf = make_pdf(250)  # three batches
+
+    def test_each_batch_is_committed_as_it_finishes(self):
+        firestore = InMemoryFirestoreService()
+        committed = []
+
+        def commit(batch):
+            committed.append(batch)
+            firestore.append_questions("doc-1", batch, sum(len(b) for b in committed))
+            doc = firestore.get_document("doc-1")
+            self.assertEqual(doc["status"], "ready_partial")
+            self.assertEqual(doc["questionCount"], sum(len(b) for b in committed))
+
+        questions = self.service.generate_questions(
+            self.pdf, "system", "custom", batch_callback=commit, id_stamp=1700000000
+        )
+
+        self.assertEqual([len(b) for b in committed], [20, 20, 20])
+        self.assertEqual(questions, [q for b in committed for q in b])
+        self.assertEqual(len({q["id"] for q in questions}), 60)
+        self.assertEqual(questions[-1]["id"], "q-1700000000-59")
+
+        firestore.append_questions("doc-1", [], len(questions), final=True)
+        self.assertEqual(firestore.get_document("doc-1")["status"], "ready")
+
+    def test_target_is_enforced_per_batch(self):
+        committed = []
+        questions = self.service.generate_questions(
+            self.pdf, "system", "custom", target_questions=30, batch_callback=committed.append
+        )
+
+        self.assertEqual([len(b) for b in committed], [20, 10])
+        self.assertEqual(len(questions), 30)
+
+
+if __name__ == '__main__':
+    unittest.main()
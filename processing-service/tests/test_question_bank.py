@@ -0,0 +1,98 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+
+# Add processing-service to path so we can import app
+sys.path.append(os.path.abspath('processing-service'))
+
+from testing.fakes import InMemoryFirestoreService
+from app.services.firestore_service import FirestoreService
+from app.services.question_bank import build_index, pack_questions
+
+
+def _questions(n: int) -> list[dict]:
+    return [
+        {"id": f"q-1-{i}", "questionText": f"Question {i} " + "x" * 200, "correctAnswers": ["A"], "choices": []}
+        for i in range(n)
+    ]
+
+
+class TestQuestionBank(unittest.TestCase):
+    def test_packs_into_bounded_shards_with_positions(self):
+        questions = _questions(2000)
+        shards = pack_questions(questions, max_shard_bytes=64 * 1024)
+        index = build_index(shards, version=7)
+
+        self.assertLess(len(shards), 20)
+        self.assertEqual([q for shard in shards for q in shard], questions)
+        self.assertEqual(index["questionCount"], 2000)
+        self.assertEqual(index["shards"][0]["id"], "v7-0")
+        for entry, shard in zip(index["shards"], shards):
+            self.assertEqual(questions[entry["start"]], shard[0])
+
+    def test_new_version_replaces_old_shards(self):
+        firestore = InMemoryFirestoreService()
+        old = pack_questions(_questions(10), 1024)
+        firestore.save_question_bank("doc-1", old, build_index(old, version=1))
+        new = pack_questions(_questions(3), 1024)
+        firestore.save_question_bank("doc-1", new, build_index(new, version=2))
+
+        doc = firestore.get_document("doc-1")
+        self.assertEqual(doc["questionBank"]["version"], 2)
+        self.assertEqual(doc["questionBank"]["questionCount"], 3)
+        shard_ids = set(firestore._coll("documents/doc-1/question_bank"))
+        self.assertEqual(shard_ids, {entry["id"] for entry in doc["questionBank"]["shards"]})
+
+    def test_ready_flip_drops_the_previous_bank(self):
+        firestore = InMemoryFirestoreService()
+        old = pack_questions(_questions(10), 1024)
+        firestore.save_question_bank("doc-1", old, build_index(old, version=1))
+
+        # A re-run's questions are ready before its bank is written; the old bank must not be served meanwhile
+        firestore.save_questions("doc-1", _questions(3))
+        self.assertNotIn("questionBank", firestore.get_document("doc-1"))
+
+        firestore.save_question_bank("doc-2", old, build_index(old, version=1))
+        firestore.append_questions("doc-2", _questions(3), 3)
+        self.assertIn("questionBank", firestore.get_document("doc-2"))
+        firestore.append_questions("doc-2", [], 3, final=True)
+        self.assertNotIn("questionBank", firestore.get_document("doc-2"))
+
+    def test_large_bank_is_committed_in_chunks_before_the_index(self):
+        events = []
+
+        class RecordingBatch:
+            def __init__(self):
+                self.writes = 0
+
+            def set(self, ref, data):
+                self.writes += 1
+
+            def delete(self, ref):
+                self.writes += 1
+
+            def commit(self):
+                events.append(("commit", self.writes))
+
+        service = FirestoreService.__new__(FirestoreService)
+        service.db, service.prefix = MagicMock(), ""
+        service.db.batch.side_effect = RecordingBatch
+        doc_ref = service.db.collection.return_value.document.return_value
+        doc_ref.update.side_effect = lambda data: events.append(("index", data["questionBank"]["version"]))
+        stale = MagicMock()
+        stale.id = "v1-0"
+        doc_ref.collection.return_value.list_documents.return_value = [stale]
+
+        shards = pack_questions(_questions(400), 4 * 1024)
+        with patch('app.services.firestore_service.MAX_BATCH_BYTES', 32 * 1024):
+            service.save_question_bank("doc-1", shards, build_index(shards, version=2))
+
+        shard_commits = [writes for kind, writes in events[:-2]]
+        self.assertGreater(len(shard_commits), 1)
+        self.assertEqual(sum(shard_commits), len(shards))
+        self.assertEqual(events[-2:], [("index", 2), ("commit", 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
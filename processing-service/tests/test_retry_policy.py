@@ -0,0 +1,98 @@
+import unittest
+import random
+import sys
+import os
+
+# Add processing-service to path so we can import app
+sys.path.append(os.path.abspath('processing-service'))
+
+from google.genai import errors
+from app.services.gemini_service import GeminiService
+from app.services.retry_policy import (
+    RetryPolicy,
+    GeminiBlockedError,
+    JobDeadlineExceeded,
+    classify,
+)
+
+
+def _quota_error(delay: str = "7s"):
+    return errors.ClientError(429, {"error": {
+        "message": "quota exceeded",
+        "status": "RESOURCE_EXHAUSTED",
+        "details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": delay}],
+    }})
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_classification(self):
+        self.assertTrue(classify(errors.ServerError(503, {"error": {"message": "overloaded"}})).retryable)
+        self.assertTrue(classify(TimeoutError()).retryable)
+        self.assertFalse(classify(errors.ClientError(400, {"error": {"message": "bad schema"}})).retryable)
+        self.assertFalse(classify(GeminiBlockedError("blocked")).retryable)
+
+        quota = classify(_quota_error())
+        self.assertTrue(quota.retryable)
+        self.assertEqual(quota.retry_after, 7.0)
+
+    def test_backoff_jitter_hint_and_limits(self):
+        policy = RetryPolicy(max_attempts=3, base_delay=2, max_delay=60, rng=random.Random(0))
+        delays = [policy.next_delay(2, TimeoutError()) for _ in range(50)]
+        self.assertTrue(all(0 <= d <= 4 for d in delays))
+        self.assertGreater(len(set(delays)), 1)
+
+        self.assertGreaterEqual(policy.next_delay(1, _quota_error("7s")), 7.0)
+        self.assertIsNone(policy.next_delay(3, TimeoutError()))
+        self.assertIsNone(policy.next_delay(1, GeminiBlockedError("blocked")))
+
+        tight = RetryPolicy(max_attempts=3, base_delay=2, max_delay=60, deadline_seconds=5)
+        self.assertIsNone(tight.next_delay(1, _quota_error("30s")))
+
+    def test_fatal_errors_are_not_retried(self):
+        class BadRequest:
+            calls = 0
+
+            def generate_content(self, **request):
+                BadRequest.calls += 1
+                raise errors.ClientError(400, {"error": {"message": "invalid schema"}})
+
+        client = BadRequest()
+        client.models = client
+        service = GeminiService(client=client)
+        with self.assertRaises(errors.ClientError):
+            service._call_gemini_with_retry(
+                "prompt", 1, 1,
+                retry_policy=RetryPolicy(max_attempts=3, base_delay=0, max_delay=0),
+            )
+        self.assertEqual(BadRequest.calls, 1)
+
+    def test_deadline_stops_new_attempts(self):
+        policy = RetryPolicy(max_attempts=3, base_delay=0, max_delay=0, deadline_seconds=-1)
+        with self.assertRaises(JobDeadlineExceeded):
+            policy.check_deadline()
+        # Redelivery resumes the job
+        self.assertTrue(classify(JobDeadlineExceeded("spent")).retryable)
+        self.assertIsNone(RetryPolicy.from_settings().remaining())
+
+    def test_deadline_only_stops_retries(self):
+        class Flaky:
+            calls = 0
+
+            def generate_content(self, **request):
+                Flaky.calls += 1
+                raise TimeoutError("slow")
+
+        client = Flaky()
+        client.models = client
+        service = GeminiService(client=client)
+        # The spent budget refuses the retry; the first attempt still ran
+        with self.assertRaises(TimeoutError):
+            service._call_gemini_with_retry(
+                "prompt", 1, 1,
+                retry_policy=RetryPolicy(max_attempts=3, base_delay=0, max_delay=0, deadline_seconds=-1),
+            )
+        self.assertEqual(Flaky.calls, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+import sys
+import os
+
+# Add processing-service to path so we can import app
+sys.path.append(os.path.abspath('processing-service'))
+
+from app.models import SamplingStrategy
+from app.services.sampling import batch_order, trim_questions
+
+
+class TestSampling(unittest.TestCase):
+    def test_sequential_order_is_front_to_back(self):
+        self.assertEqual(batch_order(5, SamplingStrategy.SEQUENTIAL), [0, 1, 2, 3, 4])
+
+    def test_spread_order_covers_document_evenly(self):
+        order = batch_order(8, SamplingStrategy.SPREAD)
+        self.assertEqual(sorted(order), list(range(8)))
+        self.assertEqual(order[:3], [4, 2, 6])
+        # Any prefix of two or more batches reaches both halves of the document
+        self.assertTrue(min(order[:3]) < 4 <= max(order[:3]))
+        self.assertEqual(batch_order(1, SamplingStrategy.SPREAD), [0])
+
+    def test_trim_to_target(self):
+        questions = list(range(100))
+        self.assertEqual(trim_questions(questions, None, SamplingStrategy.SEQUENTIAL), questions)
+        self.assertEqual(trim_questions(questions, 5, SamplingStrategy.SEQUENTIAL), [0, 1, 2, 3, 4])
+        self.assertEqual(trim_questions(questions, 5, SamplingStrategy.SPREAD), [10, 30, 50, 70, 90])
+        self.assertEqual(trim_questions(questions[:3], 5, SamplingStrategy.SPREAD), [0, 1, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
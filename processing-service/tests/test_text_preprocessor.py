@@ -0,0 +1,58 @@
+import unittest
+import sys
+import os
+
+# Add processing-service to path so we can import app
+sys.path.append(os.path.abspath('processing-service'))
+
+from app.services.text_preprocessor import preprocess_text, split_pages
+
+
+def _page(num: int, body: str) -> str:
+    return (
+        f"--- Page {num} ---\n"
+        f"ACME Networking Guide   Chapter {num // 10 + 1}\n"
+        f"{body}\n"
+        f"© 2025 ACME Press. All rights reserved. Page {num} of 12"
+    )
+
+
+BODY = "Routers forward packets between networks using the destination address."
+
+
+class TestTextPreprocessor(unittest.TestCase):
+    def test_strips_boilerplate_and_reports_savings(self):
+        toc = "\n".join(
+            ["Table of Contents"] + [f"Chapter {i} Topic {i} ........ {i * 10}" for i in range(1, 8)]
+        )
+        pages = [_page(1, toc), _page(2, "   \n  ")]
+        pages += [_page(n, f"{BODY}   Detail  {n}.\n\n\n\nSection {n} covers static routes.") for n in range(3, 13)]
+        cleaned, report = preprocess_text("\n\n".join(pages))
+
+        kept = split_pages(cleaned)
+        self.assertEqual([num for num, _ in kept], list(range(3, 13)))
+        self.assertEqual(report["toc_pages_dropped"], [1])
+        self.assertEqual(report["empty_pages_dropped"], [2])
+        self.assertNotIn("ACME Press", cleaned)
+        self.assertNotIn("Networking Guide", cleaned)
+        self.assertNotIn("\n\n\n", cleaned)
+        self.assertIn(f"{BODY} Detail 3.", cleaned)
+        self.assertGreater(report["tokens_saved"], 0)
+        self.assertEqual(report["chars_before"] - report["chars_after"], report["chars_saved"])
+
+    def test_repeated_body_lines_are_kept(self):
+        # Lines repeated in the middle of pages are content (e.g. "Explanation:"), not boilerplate
+        body = "Question about routing tables and next hops.\nExplanation:\nThe answer follows from the table.\nMore detail on the route selection."
+        pages = [f"--- Page {n} ---\nUnique heading {n} words\n{body}\nUnique footer {n} text" for n in range(1, 8)]
+        cleaned, _ = preprocess_text("\n\n".join(pages))
+        self.assertEqual(cleaned.count("Explanation:"), 7)
+
+    def test_never_drops_everything(self):
+        text = "--- Page 1 ---\nshort\n\n--- Page 2 ---\ntiny"
+        cleaned, report = preprocess_text(text)
+        self.assertEqual(cleaned, text)
+        self.assertEqual(report["pages_after"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,6 +6,7 @@ import { Separator } from "@/components/ui/separator"
 import { ArrowLeft, Play, FileText } from "lucide-react"
 import Link from "next/link"
 import { ExamConfigForm } from "@/components/exams/exam-config-form"
+import { EXAM_READY_STATUSES } from "@/lib/types"
 
 interface PageProps {
   params: Promise<{
@@ -23,7 +24,7 @@ export default async function ExamConfigurePage({ params }: PageProps) {
 
   const { document, questions } = result
 
-  if (document.status !== 'ready' || !questions || questions.length === 0) {
+  if (!EXAM_READY_STATUSES.includes(document.status) || !questions || questions.length === 0) {
     redirect('/exams')
   }
 
@@ -8,12 +8,13 @@ import { FileText, Play, Clock, CheckCircle2, AlertCircle, Eye } from "lucide-re
 import Link from "next/link"
 import { formatDistanceToNow } from "date-fns"
 import { RefreshButton } from "@/components/refresh-button"
+import { EXAM_READY_STATUSES } from "@/lib/types"
 
 export const dynamic = "force-dynamic";
 
 export default async function ExamsPage() {
   const documents = await getDocuments()
-  const readyDocuments = documents.filter(doc => doc.status === 'ready' && doc.questionCount > 0)
+  const readyDocuments = documents.filter(doc => EXAM_READY_STATUSES.includes(doc.status) && doc.questionCount > 0)
 
   const sessionsResult = await getExamSessions()
   const allSessions = sessionsResult.sessions || []
@@ -7,6 +7,7 @@ import { Storage } from "@google-cloud/storage";
 import { generateQuestionsFromPDF } from "@/lib/services/ai";
 import { GoogleAuth } from "google-auth-library";
 import { withRateLimit, RateLimitPresets } from "@/lib/utils/server-action-limiter";
+import { loadAllQuestions } from "@/lib/db/question-bank";
 
 // Initialize GCS
 const storage = new Storage();
@@ -15,6 +16,27 @@ const bucketName = process.env.GCS_BUCKET_NAME || 'superexam-uploads';
 // Initialize Google Auth
 const auth = new GoogleAuth();
 
+// Ask the processing service to extract the PDF now, so a later job starts generating right away
+async function requestPreparation(docId: string) {
+  const processingServiceUrl = process.env.PROCESSING_SERVICE_URL || 'http://localhost:8000';
+  const url = `${processingServiceUrl}/documents/${docId}/prepare`;
+
+  try {
+    if (processingServiceUrl.includes('localhost')) {
+      const response = await fetch(url, { method: 'POST' });
+      if (!response.ok) {
+        throw new Error(`Processing service returned ${response.status}`);
+      }
+    } else {
+      const client = await auth.getIdTokenClient(processingServiceUrl);
+      await client.request({ url, method: 'POST' });
+    }
+  } catch (error) {
+    // Not fatal: jobs read the PDF themselves when no page index exists
+    console.error(`Failed to request preparation for document ${docId}:`, error);
+  }
+}
+
 // Internal implementation (not exported)
 async function uploadDocumentInternal(formData: FormData) {
   unstable_noStore();
@@ -60,6 +82,9 @@ async function uploadDocumentInternal(formData: FormData) {
 
     await docRef.set(newDoc);
 
+    // 3. Start text extraction ahead of processing
+    await requestPreparation(docId);
+
     revalidatePath('/documents');
     return { success: true, message: 'Document uploaded successfully', docId };
 
@@ -212,23 +237,25 @@ async function deleteDocumentInternal(docId: string) {
     const docSnap = await docRef.get();
 
     if (docSnap.exists) {
-      const docData = docSnap.data() as Document & { filePath?: string };
+      const docData = docSnap.data() as Document & { filePath?: string; pageIndex?: { path: string } };
 
-      // 2. Delete the file from GCS
-      if (docData.filePath) {
+      // 2. Delete the file (and its prepared page index) from GCS
+      const filePaths = [docData.filePath, docData.pageIndex?.path].filter((path): path is string => !!path);
+      for (const filePath of filePaths) {
         try {
-          await storage.bucket(bucketName).file(docData.filePath).delete();
-          console.log(`Deleted GCS file: ${docData.filePath}`);
+          await storage.bucket(bucketName).file(filePath).delete();
+          console.log(`Deleted GCS file: ${filePath}`);
         } catch (gcsError) {
           console.error('Failed to delete GCS file:', gcsError);
           // Continue with document deletion even if file deletion fails
         }
       }
 
-      // 3. Delete questions subcollection
+      // 3. Delete questions subcollection and packed question bank shards
       const questionsSnapshot = await docRef.collection('questions').get();
+      const bankSnapshot = await docRef.collection('question_bank').get();
       const batch = db.batch();
-      questionsSnapshot.docs.forEach((doc) => {
+      [...questionsSnapshot.docs, ...bankSnapshot.docs].forEach((doc) => {
         batch.delete(doc.ref);
       });
       await batch.commit();
@@ -298,12 +325,8 @@ export async function getDocumentDetails(docId: string) {
       }
     }
 
-    // Fetch questions
-    const questionsSnapshot = await docRef.collection('questions').get();
-    const questions = questionsSnapshot.docs.map(doc => ({
-      id: doc.id,
-      ...doc.data()
-    }));
+    // Fetch questions (a few shard reads when the packed question bank is available)
+    const questions = await loadAllQuestions(docRef, docSnap.data());
 
     return { 
       success: true,
@@ -2,6 +2,7 @@
 
 import { db, collection } from "@/lib/db/firebase";
 import { revalidatePath } from "next/cache";
+import { loadQuestionsByIds, pickQuestions } from "@/lib/db/question-bank";
 import { withRateLimit, RateLimitPresets } from "@/lib/utils/server-action-limiter";
 
 interface CreateExamSessionParams {
@@ -25,20 +26,8 @@ async function createExamSessionInternal(params: CreateExamSessionParams) {
       return { error: 'Document not found' };
     }
 
-    // Get questions
-    const questionsSnapshot = await docRef.collection('questions').get();
-    let questions = questionsSnapshot.docs.map(doc => ({
-      id: doc.id,
-      ...doc.data()
-    }));
-
-    // Randomize if requested
-    if (randomize) {
-      questions = questions.sort(() => Math.random() - 0.5);
-    }
-
-    // Limit to requested count
-    questions = questions.slice(0, questionCount);
+    // Pick the requested number of questions, randomized if requested
+    const questions = await pickQuestions(docRef, docSnap.data(), questionCount, randomize);
 
     if (questions.length === 0) {
       return { error: 'No questions available' };
@@ -172,9 +161,10 @@ async function submitExamInternal(sessionId: string) {
 
     // Get document questions
     const docRef = db.collection(collection('documents')).doc(session.documentId);
-    const questionsSnapshot = await docRef.collection('questions').get();
+    const docSnap = await docRef.get();
+    const sessionQuestions = await loadQuestionsByIds(docRef, docSnap.data(), session.questionIds);
     const questionsMap = new Map(
-      questionsSnapshot.docs.map(doc => [doc.id, doc.data()])
+      sessionQuestions.map(q => [q.id, q])
     );
 
     // Calculate score
@@ -249,17 +239,8 @@ export const submitExam = withRateLimit(
 export async function getExamQuestions(documentId: string, questionIds: string[]) {
   try {
     const docRef = db.collection(collection('documents')).doc(documentId);
-    const questions = [];
-
-    for (const questionId of questionIds) {
-      const questionSnap = await docRef.collection('questions').doc(questionId).get();
-      if (questionSnap.exists) {
-        questions.push({
-          id: questionSnap.id,
-          ...questionSnap.data()
-        });
-      }
-    }
+    const docSnap = await docRef.get();
+    const questions = await loadQuestionsByIds(docRef, docSnap.data(), questionIds);
 
     return { success: true, questions };
   } catch (error) {
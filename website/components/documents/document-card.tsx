@@ -1,6 +1,6 @@
 "use client"
 
-import { Document } from "@/lib/types"
+import { Document, EXAM_READY_STATUSES } from "@/lib/types"
 import { Card, CardContent, CardDescription, CardFooter, CardHeader, CardTitle } from "@/components/ui/card"
 import { Badge } from "@/components/ui/badge"
 import { Button } from "@/components/ui/button"
@@ -22,9 +22,9 @@ export function DocumentCard({ doc: initialDoc }: DocumentCardProps) {
   const [isPending, startTransition] = useTransition()
   const [doc, setDoc] = useState<Document>(initialDoc)
 
-  // Poll for status updates when processing
+  // Poll for status updates while questions are still being generated
   useEffect(() => {
-    if (doc.status !== 'processing') {
+    if (doc.status !== 'processing' && doc.status !== 'ready_partial') {
       return
     }
 
@@ -48,8 +48,8 @@ export function DocumentCard({ doc: initialDoc }: DocumentCardProps) {
         if (result.document) {
           setDoc(result.document)
 
-          // Stop polling if no longer processing
-          if (result.document.status !== 'processing') {
+          // Stop polling once generation has finished
+          if (result.document.status !== 'processing' && result.document.status !== 'ready_partial') {
             clearInterval(pollInterval)
             router.refresh() // Sync parent page state
 
@@ -94,6 +94,7 @@ export function DocumentCard({ doc: initialDoc }: DocumentCardProps) {
   const getStatusColor = (status: Document['status']) => {
     switch (status) {
       case 'ready': return 'bg-success/10 text-success hover:bg-success/20 border border-success/20'
+      case 'ready_partial': return 'bg-success/10 text-success hover:bg-success/20 border border-success/20'
       case 'processing': return 'bg-primary/10 text-primary hover:bg-primary/20 border border-primary/20'
       case 'uploaded': return 'bg-warning/10 text-warning hover:bg-warning/20 border border-warning/20'
       case 'failed': return 'bg-destructive/10 text-destructive hover:bg-destructive/20 border border-destructive/20'
@@ -109,8 +110,8 @@ export function DocumentCard({ doc: initialDoc }: DocumentCardProps) {
             <FileText className="h-6 w-6" />
           </div>
           <Badge variant="secondary" className={`capitalize ${getStatusColor(doc.status)}`}>
-            {doc.status === 'processing' && <Loader2 className="mr-1 h-3 w-3 animate-spin" />}
-            {doc.status}
+            {(doc.status === 'processing' || doc.status === 'ready_partial') && <Loader2 className="mr-1 h-3 w-3 animate-spin" />}
+            {doc.status === 'ready_partial' ? 'partial' : doc.status}
           </Badge>
         </div>
         <CardTitle className="mt-4 line-clamp-1 text-base font-semibold" title={doc.title}>
@@ -128,6 +129,10 @@ export function DocumentCard({ doc: initialDoc }: DocumentCardProps) {
               <span className="flex items-center gap-1">
                 <span className="font-medium text-foreground">{doc.questionCount}</span> questions generated
               </span>
+            ) : doc.status === 'ready_partial' ? (
+              <span className="flex items-center gap-1">
+                <span className="font-medium text-foreground">{doc.questionCount}</span> questions so far, generating more...
+              </span>
             ) : doc.status === 'failed' ? (
               <span className="flex items-center gap-1 text-destructive" title={doc.error || 'Processing failed'}>
                 <AlertCircle className="h-3 w-3 flex-shrink-0" />
@@ -171,8 +176,8 @@ export function DocumentCard({ doc: initialDoc }: DocumentCardProps) {
             </div>
           )}
 
-          {/* Take Exam button - only shown when ready */}
-          {doc.status === 'ready' && (
+          {/* Take Exam button - shown once questions are available */}
+          {EXAM_READY_STATUSES.includes(doc.status) && (
             <Button className="flex-1" asChild>
               <Link href={`/exams/${doc.id}/configure`}>
                 <Play className="mr-2 h-4 w-4" />
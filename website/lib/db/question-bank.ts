@@ -0,0 +1,134 @@
+import { db } from "@/lib/db/firebase";
+import type { DocumentReference, DocumentData } from "firebase-admin/firestore";
+
+// Index the processing service stores on a document as `questionBank`
+export interface QuestionBankIndex {
+  format: number;
+  version: number;
+  questionCount: number;
+  shards: { id: string; start: number; count: number }[];
+}
+
+type StoredQuestion = { id: string } & DocumentData;
+
+/**
+ * The packed question bank of a document, when it can be trusted.
+ *
+ * The bank is written when a job finishes, so while a progressive job is
+ * still adding questions (status `ready_partial`) it may be stale. The
+ * update that marks a document `ready` removes the previous bank, so a
+ * finished re-run is read from the question documents until its own bank
+ * is saved.
+ */
+function usableBank(data: DocumentData | undefined): QuestionBankIndex | null {
+  const bank = data?.questionBank as QuestionBankIndex | undefined;
+  if (!bank || data?.status !== 'ready' || bank.format !== 1) {
+    return null;
+  }
+  return bank;
+}
+
+/**
+ * Read questions at the given bank positions, fetching only the shards that hold them.
+ * Returns questions in the order of `positions`.
+ */
+async function readBankPositions(
+  docRef: DocumentReference,
+  bank: QuestionBankIndex,
+  positions: number[]
+): Promise<StoredQuestion[]> {
+  const shards = bank.shards.filter(shard =>
+    positions.some(p => p >= shard.start && p < shard.start + shard.count)
+  );
+  if (shards.length === 0) {
+    return [];
+  }
+
+  const snapshots = await db.getAll(...shards.map(shard => docRef.collection('question_bank').doc(shard.id)));
+  const byPosition = new Map<number, StoredQuestion>();
+  snapshots.forEach((snap, i) => {
+    const shard = shards[i];
+    const questions = (snap.data()?.questions || []) as StoredQuestion[];
+    questions.forEach((q, offset) => byPosition.set(shard.start + offset, q));
+  });
+
+  return positions.map(p => byPosition.get(p)).filter((q): q is StoredQuestion => q !== undefined);
+}
+
+async function readSubcollection(docRef: DocumentReference): Promise<StoredQuestion[]> {
+  const snapshot = await docRef.collection('questions').get();
+  return snapshot.docs.map(doc => ({ id: doc.id, ...doc.data() }));
+}
+
+/**
+ * All questions of a document: a few shard reads from the packed bank,
+ * or one read per question for documents without a usable bank.
+ */
+export async function loadAllQuestions(docRef: DocumentReference, data: DocumentData | undefined): Promise<StoredQuestion[]> {
+  const bank = usableBank(data);
+  if (!bank) {
+    return readSubcollection(docRef);
+  }
+  return readBankPositions(docRef, bank, Array.from({ length: bank.questionCount }, (_, i) => i));
+}
+
+/**
+ * Questions with the given IDs, in that order. Served from the packed bank
+ * when possible; IDs the bank does not hold (for example, sessions started
+ * before the document was reprocessed) are read from the per-question
+ * documents in one batched call.
+ */
+export async function loadQuestionsByIds(
+  docRef: DocumentReference,
+  data: DocumentData | undefined,
+  ids: string[]
+): Promise<StoredQuestion[]> {
+  const found = new Map<string, StoredQuestion>();
+  if (usableBank(data)) {
+    for (const q of await loadAllQuestions(docRef, data)) {
+      found.set(q.id, q);
+    }
+  }
+
+  const missing = ids.filter(id => !found.has(id));
+  if (missing.length > 0) {
+    const snapshots = await db.getAll(...missing.map(id => docRef.collection('questions').doc(id)));
+    for (const snap of snapshots) {
+      if (snap.exists) {
+        found.set(snap.id, { id: snap.id, ...snap.data() });
+      }
+    }
+  }
+
+  return ids.map(id => found.get(id)).filter((q): q is StoredQuestion => q !== undefined);
+}
+
+/**
+ * Pick `count` questions for an exam, in document order or at random,
+ * reading only the bank shards that hold the picked questions.
+ */
+export async function pickQuestions(
+  docRef: DocumentReference,
+  data: DocumentData | undefined,
+  count: number,
+  randomize: boolean
+): Promise<StoredQuestion[]> {
+  const bank = usableBank(data);
+  if (!bank) {
+    let questions = await readSubcollection(docRef);
+    if (randomize) {
+      questions = questions.sort(() => Math.random() - 0.5);
+    }
+    return questions.slice(0, count);
+  }
+
+  const positions = Array.from({ length: bank.questionCount }, (_, i) => i);
+  if (randomize) {
+    // Fisher-Yates, stopping once the first `count` slots are drawn
+    for (let i = 0; i < Math.min(count, positions.length); i++) {
+      const j = i + Math.floor(Math.random() * (positions.length - i));
+      [positions[i], positions[j]] = [positions[j], positions[i]];
+    }
+  }
+  return readBankPositions(docRef, bank, positions.slice(0, count));
+}
@@ -20,7 +20,10 @@ export interface Question {
   explanation?: QuestionExplanation;
 }
 
-export type DocumentStatus = 'uploaded' | 'processing' | 'ready' | 'failed';
+export type DocumentStatus = 'uploaded' | 'processing' | 'ready_partial' | 'ready' | 'failed';
+
+// Documents with questions that can be used in exams (ready_partial is still generating more)
+export const EXAM_READY_STATUSES: DocumentStatus[] = ['ready', 'ready_partial'];
 
 export interface Document {
   id: string;